@@ -34,6 +34,10 @@ def create_app(config_name='default'):
     # 使用 ProxyFix 中间件处理反向代理头部
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
+    # 按 Accept-Encoding 压缩 HTML/JSON 等响应（没有 nginx 在前面时，如 Vercel）
+    from app.services.response_compression import CompressionMiddleware
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
     # 记录项目根目录，方便路径转换
     project_root = os.path.abspath(os.getenv('PROJECT_ROOT', os.getcwd()))
     app.config['PROJECT_ROOT'] = project_root
@@ -89,6 +93,18 @@ def create_app(config_name='default'):
     app.register_blueprint(admin.bp, url_prefix='/admin')
     app.register_blueprint(api.bp, url_prefix='/api')
     
+    # 静态资源清单（模板中的 asset_url），插件注册资源时即按清单解析地址
+    from app.services.static_assets import static_assets
+    static_assets.init_app(app)
+
+    # 预加载提示（HTML 响应的 Link 头与 103 Early Hints）
+    from app.services.resource_hints import resource_hints
+    resource_hints.init_app(app)
+
+    # 主题页面 HTML 压缩（HTML_MINIFY 开启时）
+    from app.services.html_minifier import html_minifier
+    html_minifier.init_app(app)
+    
     # 初始化插件系统
     from app.services.plugin_manager import plugin_manager
     # 某些初始化流程（例如首次运行创建数据库表）在插件表尚不存在时
@@ -102,6 +118,18 @@ def create_app(config_name='default'):
     if os.getenv('SKIP_PLUGIN_INIT', '0') != '1':
         theme_manager.init_app(app)
 
+    # 初始化搜索服务（注册文章写入钩子以同步索引）
+    from app.services.search_service import search_service
+    from app.services.pinyin_index import pinyin_index
+    from app.services.related_posts import related_posts_service
+    search_service.init_app(app)
+    pinyin_index.init_app(app)
+    related_posts_service.init_app(app)
+
+    # API 读接口的 ETag：内容相关的表提交修改后更换代标记
+    from app.services.api_etags import api_etags
+    api_etags.init_app(app)
+
     # 注册请求处理钩子
     @app.before_request
     def before_request_handler():
@@ -126,12 +154,8 @@ def create_app(config_name='default'):
         try:
             from app.services.plugin_manager import plugin_manager
 
-            # 获取插件钩子内容
-            plugin_hooks = {
-                'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom')
-            }
-
-            return {'plugin_hooks': plugin_hooks}
+            # 与视图共用同一个按需求值的映射，模板用到的钩子每个请求只执行一次
+            return {'plugin_hooks': plugin_manager.get_request_template_hooks()}
         except Exception:
             # 如果插件管理器不可用，返回空字典
             return {}
@@ -167,7 +191,12 @@ def create_app(config_name='default'):
         # 返回带有 data-format 属性的 time 标签，便于 JS 处理
         return Markup(f'<time datetime="{iso_time}" data-localtime data-format="{format}">{display_time}</time>')
 
+    # 注册搜索高亮过滤器：{{ text|highlight(query) }}
+    from app.services.search_service import highlight
+    app.add_template_filter(highlight, 'highlight')
+
     # 提供主题静态文件（/themes/<theme>/static/...）的路由，便于主题资源加载
+    # 带内容哈希的地址（build-assets 生成）从构建目录返回预压缩版本并永久缓存
     from app.utils import path_utils
 
     @app.route('/themes/<theme_name>/static/<path:filename>')
@@ -175,7 +204,7 @@ def create_app(config_name='default'):
         themes_dir = path_utils.project_path('themes')
         static_dir = os.path.join(themes_dir, theme_name, 'static')
         # send_from_directory 会处理路径安全性
-        return send_from_directory(static_dir, filename)
+        return static_assets.send(static_dir, filename)
     
     # 提供插件静态文件（/static/plugins/<plugin>/...）的路由，便于插件资源加载
     @app.route('/static/plugins/<plugin_name>/<path:filename>')
@@ -183,7 +212,7 @@ def create_app(config_name='default'):
         plugins_dir = path_utils.project_path('plugins')
         static_dir = os.path.join(plugins_dir, plugin_name, 'static')
         # send_from_directory 会处理路径安全性
-        return send_from_directory(static_dir, filename)
+        return static_assets.send(static_dir, filename)
 
     # 提供上传文件访问路由（/uploads/...）
     @app.route('/uploads/<path:filename>')
@@ -7,5 +7,7 @@ from .comment import Comment
 from .plugin import Plugin
 from .theme import Theme
 from .setting import Setting
+from .search import SearchTerm, SearchDocument, PostPlainText
+from .related import PostTerm, PostVector, RelatedPost
 
-__all__ = ['User', 'Post', 'Category', 'Tag', 'Comment', 'Plugin', 'Theme', 'Setting']
+__all__ = ['User', 'Post', 'Category', 'Tag', 'Comment', 'Plugin', 'Theme', 'Setting', 'SearchTerm', 'SearchDocument', 'PostPlainText', 'PostVector', 'PostTerm', 'RelatedPost']
@@ -0,0 +1,58 @@
+"""
+相关文章模型
+"""
+from datetime import datetime, timezone
+from app import db
+
+
+class PostVector(db.Model):
+    """文章的词频向量（已截断），用于增量计算 TF-IDF 相似度"""
+    __tablename__ = 'post_vectors'
+
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    term_freqs = db.Column(db.Text, nullable=False, default='{}')  # JSON: {term: tf}
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, post_id, term_freqs='{}'):
+        self.post_id = post_id
+        self.term_freqs = term_freqs
+
+    def __repr__(self):
+        return f'<PostVector post_id={self.post_id}>'
+
+
+class PostTerm(db.Model):
+    """相关文章的词项倒排表，weight 为写入时归一化的 TF-IDF 权重"""
+    __tablename__ = 'post_terms'
+
+    term = db.Column(db.String(64), primary_key=True)
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False, index=True)
+    weight = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __init__(self, term, post_id, weight=0.0):
+        self.term = term
+        self.post_id = post_id
+        self.weight = weight
+
+    def __repr__(self):
+        return f'<PostTerm {self.term} post_id={self.post_id}>'
+
+
+class RelatedPost(db.Model):
+    """预计算的相关文章（每篇文章保留相似度最高的前 K 篇）"""
+    __tablename__ = 'related_posts'
+
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # 删除文章、反查引用它的文章时按 related_id 查询，不是主键的首列，需要单独的索引
+    related_id = db.Column(db.Integer, primary_key=True, autoincrement=False, index=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    rank = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, post_id, related_id, score=0.0, rank=0):
+        self.post_id = post_id
+        self.related_id = related_id
+        self.score = score
+        self.rank = rank
+
+    def __repr__(self):
+        return f'<RelatedPost {self.post_id} -> {self.related_id}>'
@@ -0,0 +1,61 @@
+"""
+搜索索引模型
+"""
+from datetime import datetime, timezone
+from app import db
+
+
+class SearchTerm(db.Model):
+    """倒排索引词项，postings 为差分编码的 (文章ID增量, 词频) 变长整数序列"""
+    __tablename__ = 'search_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    doc_freq = db.Column(db.Integer, default=0, nullable=False)  # 包含该词的文章数
+    postings = db.Column(db.LargeBinary(length=2 ** 24), nullable=False, default=b'')
+    # 乐观锁版本号：读出后被其它事务改写过的行在 flush 时抛出 StaleDataError
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    def __init__(self, term, **kwargs):
+        self.term = term
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return f'<SearchTerm {self.term}>'
+
+
+class SearchDocument(db.Model):
+    """已收录文章的词频向量与长度，用于增量更新和 BM25 长度归一化"""
+    __tablename__ = 'search_documents'
+
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    length = db.Column(db.Integer, default=0, nullable=False)  # 文档词项总数
+    term_freqs = db.Column(db.Text, nullable=False, default='{}')  # JSON: {term: tf}
+    indexed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, post_id, **kwargs):
+        self.post_id = post_id
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return f'<SearchDocument post_id={self.post_id}>'
+
+
+class PostPlainText(db.Model):
+    """文章去除 Markdown 语法后的纯文本，用于生成搜索片段和高亮摘要"""
+    __tablename__ = 'post_plain_texts'
+
+    post_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    plain_text = db.Column(db.Text, nullable=False, default='')
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, post_id, plain_text=''):
+        self.post_id = post_id
+        self.plain_text = plain_text
+
+    def __repr__(self):
+        return f'<PostPlainText post_id={self.post_id}>'
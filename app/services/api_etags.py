@@ -0,0 +1,92 @@
+"""
+API 读接口的条件请求（ETag / 304）
+
+前端会轮询 /api/posts、/api/categories 等接口，大多数时候数据并没有变化。
+各接口先用一次聚合查询取得 (行数, 最大 updated_at)，与请求参数和内容代标记一起算出 ETag，
+与 If-None-Match 匹配时直接返回 304，不再查询关联数据、调用 to_dict 和序列化。
+
+- 聚合查询覆盖接口自身表中行的增删改（包括浏览数、点赞数这类只改计数的更新）；
+- 内容代标记覆盖关联数据的变化（作者、分类名称、标签、评论数、文章与标签的关联等）：
+  CONTENT_TABLES 中的表提交修改后更换，只改 COUNTER_COLUMNS 的更新不更换，
+  避免每次浏览文章都写一次代标记。其它 worker 最多延迟 GenerationCounter.check_interval 秒可见。
+"""
+import hashlib
+
+from flask import current_app, request
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.services.cache_service import GenerationCounter
+
+# API 返回的数据涉及的表
+CONTENT_TABLES = frozenset({'posts', 'categories', 'tags', 'comments', 'users', 'settings'})
+# 这些列的变化已由各接口的 (行数, 最大 updated_at) 反映，不需要更换代标记
+COUNTER_COLUMNS = frozenset({'view_count', 'like_count', 'updated_at', 'last_login'})
+
+
+class ApiEtags:
+    """为 API 读接口计算 ETag，并在内容变化时更换代标记"""
+
+    def __init__(self):
+        self.generation = GenerationCounter('api_content')
+
+    def init_app(self, app):
+        event.listen(Session, 'after_flush', self._collect_changes)
+        event.listen(Session, 'after_commit', self._bump_on_commit)
+        event.listen(Session, 'after_rollback', self._discard_changes)
+
+    # -------- 请求 --------
+    def etag(self, *parts) -> str:
+        """由请求参数和聚合值算出 ETag（不依赖序列化后的数据）"""
+        payload = repr((self.generation.value, request.path, request.query_string) + parts)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=12).hexdigest()
+
+    def not_modified(self, etag: str):
+        """If-None-Match 与 ETag 匹配（弱比较，压缩后的弱 ETag 同样匹配）时返回 304 响应，否则返回 None"""
+        if not request.if_none_match.contains_weak(etag):
+            return None
+        response = current_app.response_class(status=304)
+        return self.apply(response, etag)
+
+    @staticmethod
+    def apply(response, etag: str):
+        """给响应加上 ETag；no-cache 让浏览器每次都带 If-None-Match 重新验证"""
+        if isinstance(response, tuple):
+            response = current_app.make_response(response)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response
+
+    # -------- 代标记 --------
+    def _collect_changes(self, session, flush_context):
+        if session.info.get('_api_content_changed'):
+            return
+        for instance in list(session.new) + list(session.deleted):
+            if getattr(instance, '__tablename__', None) in CONTENT_TABLES:
+                session.info['_api_content_changed'] = True
+                return
+        for instance in session.dirty:
+            if getattr(instance, '__tablename__', None) in CONTENT_TABLES and self._content_changed(instance):
+                session.info['_api_content_changed'] = True
+                return
+
+    @staticmethod
+    def _content_changed(instance) -> bool:
+        """除计数列以外是否有列或关系发生了变化"""
+        state = sa_inspect(instance)
+        for attr in state.attrs:
+            if attr.key not in COUNTER_COLUMNS and attr.history.has_changes():
+                return True
+        return False
+
+    def _bump_on_commit(self, session):
+        if session.info.pop('_api_content_changed', None):
+            self.generation.bump()
+
+    @staticmethod
+    def _discard_changes(session):
+        session.info.pop('_api_content_changed', None)
+
+
+# 创建全局 API ETag 实例
+api_etags = ApiEtags()
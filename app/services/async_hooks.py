@@ -0,0 +1,304 @@
+"""
+异步动作钩子
+
+register_hook(..., mode='async') 或 @hook(..., async_=True) 注册的动作钩子不在请求中执行，
+而是放入有界队列，由进程内的后台线程在独立的应用上下文中执行：
+
+- 参数在入队时做快照：模型实例记录为 (模型类, 主键, 列值)，执行时在工作线程的会话中按主键重新加载
+  （已删除的记录用列值构造一个游离对象），其它参数尽量深拷贝，避免跨线程共享请求中的可变对象；
+- 执行失败按指数退避重试；重试用尽后计为该 (插件, 钩子) 的一次失败，连续失败达到阈值后熔断，
+  熔断期间不再入队（见 hook_guard）；
+- 进程退出时等待队列中的任务执行完毕（最多 PLUGIN_ASYNC_DRAIN_TIMEOUT 秒）；
+- 队列已满时在当前线程同步执行，不丢弃任务。
+
+环境变量：
+    PLUGIN_ASYNC_WORKERS=2          后台线程数，0 表示全部同步执行
+    PLUGIN_ASYNC_QUEUE_SIZE=1000    队列容量
+    PLUGIN_ASYNC_RETRIES=3          失败后最多重试次数
+    PLUGIN_ASYNC_BACKOFF=0.5        首次重试的等待时间（秒），之后每次翻倍
+    PLUGIN_ASYNC_DRAIN_TIMEOUT=10   退出时等待队列清空的最长时间（秒）
+"""
+import atexit
+import copy
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.exc import NoInspectionAvailable
+from werkzeug.local import LocalProxy
+
+from app import db
+from app.services.hook_guard import hook_guard
+
+
+class ModelSnapshot:
+    """模型实例的快照：执行时按主键重新加载"""
+
+    __slots__ = ('model', 'identity', 'values')
+
+    def __init__(self, instance):
+        state = sa_inspect(instance)
+        self.model = state.mapper.class_
+        self.identity = state.identity
+        keys = [attr.key for attr in state.mapper.column_attrs]
+        try:
+            self.values = {key: getattr(instance, key) for key in keys}
+        except Exception:
+            # 已删除并提交的记录无法刷新过期属性，只保留已加载的值
+            self.values = {key: state.dict[key] for key in keys if key in state.dict}
+
+    def restore(self):
+        instance = None
+        if self.identity is not None:
+            instance = db.session.get(self.model, self.identity if len(self.identity) > 1 else self.identity[0])
+        if instance is None:
+            # 记录已被删除（如 after_post_delete）：用快照中的列值构造游离对象
+            instance = sa_inspect(self.model).class_manager.new_instance()
+            for key, value in self.values.items():
+                setattr(instance, key, value)
+        return instance
+
+
+def _snapshot(value):
+    if isinstance(value, LocalProxy):
+        value = value._get_current_object()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_snapshot(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _snapshot(item) for key, item in value.items()}
+    try:
+        sa_inspect(value).mapper
+    except (NoInspectionAvailable, AttributeError):
+        pass
+    else:
+        return ModelSnapshot(value)
+    try:
+        return copy.deepcopy(value)
+    except Exception:
+        return value
+
+
+def _restore(value):
+    if isinstance(value, ModelSnapshot):
+        return value.restore()
+    if isinstance(value, (list, tuple)):
+        return type(value)(_restore(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _restore(item) for key, item in value.items()}
+    return value
+
+
+class AsyncTask:
+    __slots__ = ('callback', 'args', 'kwargs', 'plugin_name', 'hook_name', 'breaker_key', 'attempt')
+
+    def __init__(self, callback, args, kwargs, plugin_name, hook_name, breaker_key=None):
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.plugin_name = plugin_name
+        self.hook_name = hook_name
+        self.breaker_key = breaker_key
+        self.attempt = 0
+
+
+class AsyncHookRunner:
+    """有界队列 + 后台线程池，执行异步动作钩子"""
+
+    def __init__(self):
+        self.app = None
+        self.workers = 2
+        self.retries = 3
+        self.backoff = 0.5
+        self.drain_timeout = 10.0
+        self._queue = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._retry_timers = set()
+        self._closed = False
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'inline': 0}
+        self._inflight = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = max(0, int(os.getenv('PLUGIN_ASYNC_WORKERS', 2)))
+        self.retries = max(0, int(os.getenv('PLUGIN_ASYNC_RETRIES', 3)))
+        self.backoff = float(os.getenv('PLUGIN_ASYNC_BACKOFF', 0.5))
+        self.drain_timeout = float(os.getenv('PLUGIN_ASYNC_DRAIN_TIMEOUT', 10))
+        self._queue = queue.Queue(maxsize=max(1, int(os.getenv('PLUGIN_ASYNC_QUEUE_SIZE', 1000))))
+        atexit.register(self.shutdown)
+
+    # -------- 提交 --------
+    def wrap(self, callback: Callable, plugin_name: str, hook_name: str, breaker_key=None) -> Callable:
+        """
+        返回一个把调用放入队列的回调（分发表中使用）
+
+        breaker_key 不为空时由执行器负责熔断：熔断中不入队，执行结果（而不是入队）计为成功或失败
+        """
+        def enqueue_callback(*args, **kwargs):
+            if breaker_key:
+                state = hook_guard.states.get(breaker_key)
+                if state is not None and not hook_guard.allow(state):
+                    return
+            self.submit(callback, args, kwargs, plugin_name, hook_name, breaker_key)
+        enqueue_callback.__name__ = getattr(callback, '__name__', 'enqueue_callback')
+        return enqueue_callback
+
+    def submit(self, callback: Callable, args=(), kwargs=None, plugin_name: str = None, hook_name: str = '',
+               breaker_key=None):
+        task = AsyncTask(
+            callback,
+            tuple(_snapshot(arg) for arg in args),
+            {key: _snapshot(value) for key, value in (kwargs or {}).items()},
+            plugin_name, hook_name, breaker_key
+        )
+        self.stats['submitted'] += 1
+        if self.workers == 0 or self._queue is None or self._closed:
+            self._run_inline(task)
+            return
+        self._start_workers()
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            current_app.logger.warning(f"异步钩子队列已满，{hook_name} (插件: {plugin_name}) 改为同步执行")
+            self._run_inline(task)
+
+    def _run_inline(self, task: AsyncTask):
+        self.stats['inline'] += 1
+        try:
+            self._execute(task)
+            self._completed(task)
+        except Exception as e:
+            self._failed(task, e)
+            current_app.logger.error(f"执行钩子 {task.hook_name} (插件: {task.plugin_name}) 失败: {e}")
+
+    # -------- 执行 --------
+    def _start_workers(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f'plugin-async-{len(self._threads)}', daemon=True
+                )
+                self._threads.append(thread)
+                thread.start()
+
+    @staticmethod
+    def _execute(task: AsyncTask):
+        args = tuple(_restore(arg) for arg in task.args)
+        kwargs = {key: _restore(value) for key, value in task.kwargs.items()}
+        task.callback(*args, **kwargs)
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                with self._lock:
+                    self._inflight += 1
+                try:
+                    with self.app.app_context():
+                        try:
+                            self._execute(task)
+                            self._completed(task)
+                        except Exception as e:
+                            db.session.rollback()
+                            self._retry_or_fail(task, e)
+                        finally:
+                            db.session.remove()
+                finally:
+                    # 重试调度、会话清理或应用上下文出错时也要归还计数，否则 inflight 指标一直偏高
+                    with self._lock:
+                        self._inflight -= 1
+            finally:
+                self._queue.task_done()
+
+    def _retry_or_fail(self, task: AsyncTask, error: Exception):
+        if task.attempt >= self.retries or self._closed:
+            self._failed(task, error)
+            current_app.logger.error(
+                f"异步钩子 {task.hook_name} (插件: {task.plugin_name}) 执行失败，已重试 {task.attempt} 次: {error}"
+            )
+            return
+        delay = self.backoff * (2 ** task.attempt)
+        task.attempt += 1
+        self.stats['retried'] += 1
+        current_app.logger.warning(
+            f"异步钩子 {task.hook_name} (插件: {task.plugin_name}) 执行失败，{delay:g}s 后第 {task.attempt} 次重试: {error}"
+        )
+        timer = threading.Timer(delay, self._requeue, args=(task,))
+        timer.daemon = True
+        with self._lock:
+            self._retry_timers.add(timer)
+        timer.start()
+
+    def _completed(self, task: AsyncTask):
+        self.stats['completed'] += 1
+        if task.breaker_key:
+            state = hook_guard.states.get(task.breaker_key)
+            if state is not None:
+                hook_guard.record_success(task.breaker_key, state)
+
+    def _failed(self, task: AsyncTask, error: Exception):
+        """重试用尽：计一次失败，并计入该钩子的熔断状态"""
+        self.stats['failed'] += 1
+        if task.breaker_key:
+            hook_guard.record_failure(task.breaker_key, 'action', f'异常: {error}')
+
+    def _requeue(self, task: AsyncTask):
+        with self._lock:
+            self._retry_timers = {timer for timer in self._retry_timers if timer.is_alive()
+                                  and timer is not threading.current_thread()}
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            with self.app.app_context():
+                self._retry_or_fail(task, RuntimeError('队列已满'))
+
+    # -------- 关闭与指标 --------
+    def drain(self, timeout: float = None) -> bool:
+        """等待队列中的任务（包括等待重试的任务）全部完成，返回是否在时限内完成"""
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + (self.drain_timeout if timeout is None else timeout)
+        while time.monotonic() < deadline:
+            with self._lock:
+                pending_retries = any(timer.is_alive() for timer in self._retry_timers)
+            if not pending_retries and self._queue.unfinished_tasks == 0:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def shutdown(self, timeout: float = None):
+        """进程退出时调用：停止接收新任务并等待已入队的任务执行完"""
+        if self._closed or self._queue is None:
+            return
+        drained = self.drain(timeout)
+        self._closed = True
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if not drained and self.app is not None:
+            self.app.logger.warning(f"退出时仍有 {self._queue.qsize()} 个异步钩子任务未执行")
+
+    def metrics(self) -> dict:
+        return {
+            'workers': self.workers,
+            'alive_workers': sum(1 for thread in self._threads if thread.is_alive()),
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'queue_capacity': self._queue.maxsize if self._queue is not None else 0,
+            'inflight': self._inflight,
+            'pending_retries': sum(1 for timer in list(self._retry_timers) if timer.is_alive()),
+            **self.stats,
+        }
+
+
+# 创建全局异步钩子执行器实例
+async_hook_runner = AsyncHookRunner()
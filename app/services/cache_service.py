@@ -0,0 +1,138 @@
+"""
+缓存工具
+
+- LRUCache: 进程内 LRU + TTL 缓存，线程安全
+- GenerationCounter: 保存在设置表中的"代"标记，写操作时更换，
+  各 worker 据此判断缓存是否失效（本地只做短时间缓存，避免每次请求都查库）
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Hashable, Optional
+
+from flask import current_app
+
+from app import db
+
+_MISSING = object()
+
+
+class LRUCache:
+    """容量有限、条目带过期时间的进程内缓存"""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，过期或不存在时返回 default"""
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expires_at, value = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+class GenerationCounter:
+    """
+    跨进程的失效标记
+
+    值保存在 settings 表（分类 system，不可编辑）中，每次 bump() 换成新的随机标记；
+    读取时在本进程内缓存 check_interval 秒，因此其它 worker 的写入最多延迟这么久可见。
+    """
+
+    def __init__(self, name: str, check_interval: float = 2.0):
+        self.name = name
+        self.key = f'cache_generation.{name}'
+        self.check_interval = check_interval
+        self._value: Optional[str] = None
+        self._checked_at = 0.0
+
+    @property
+    def value(self) -> str:
+        now = time.monotonic()
+        if self._value is not None and now - self._checked_at < self.check_interval:
+            return self._value
+
+        # 与 bump() 一样使用独立连接：读取失败时不能回滚调用方会话中尚未提交的修改
+        from app.models.setting import Setting
+        table = Setting.__table__
+        try:
+            with db.engine.connect() as connection:
+                value = connection.execute(
+                    db.select(table.c.value).where(table.c.key == self.key)
+                ).scalar()
+        except Exception as exc:
+            current_app.logger.warning(f"读取缓存代标记 {self.key} 失败: {exc}")
+            value = None
+        self._value = value or '0'
+        self._checked_at = now
+        return self._value
+
+    def bump(self) -> str:
+        """
+        更换标记，使依赖它的缓存全部失效
+
+        使用独立连接写入，不会提交调用方会话中未完成的修改，也可以在会话的 after_commit 事件中调用。
+        """
+        from app.models.setting import Setting
+        token = uuid.uuid4().hex[:12]
+        table = Setting.__table__
+        now = datetime.now(timezone.utc)
+        try:
+            with db.engine.begin() as connection:
+                updated = connection.execute(
+                    table.update().where(table.c.key == self.key).values(value=token, updated_at=now)
+                ).rowcount
+                if not updated:
+                    connection.execute(table.insert().values(
+                        key=self.key, value=token, value_type='string', category='system',
+                        description=f'{self.name} 缓存代标记', is_public=False, is_editable=False,
+                        created_at=now, updated_at=now
+                    ))
+        except Exception as exc:
+            current_app.logger.error(f"更新缓存代标记 {self.key} 失败: {exc}")
+        self._value = token
+        self._checked_at = time.monotonic()
+        return token
+
+
+# 文章内容的代标记：文章新建、更新、删除时更换
+post_generation = GenerationCounter('posts')
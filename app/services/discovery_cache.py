@@ -0,0 +1,100 @@
+"""
+插件/主题清单缓存
+
+启动时发现插件和主题需要读取每个目录下的 plugin.json / theme.json。
+解析结果按文件路径保存在实例目录的 discovery_cache.json 中，
+文件的修改时间和大小都未变化时直接复用，不再读取和解析。
+"""
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+
+CACHE_FILENAME = 'discovery_cache.json'
+CACHE_VERSION = 1
+
+
+class DiscoveryCache:
+    """以 (mtime, size) 为校验的清单解析缓存，进程内常驻，变化时写回实例目录"""
+
+    def __init__(self):
+        self._entries: Optional[Dict[str, dict]] = None
+        self._cache_path: Optional[str] = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._entries is not None:
+            return
+        self._cache_path = os.path.join(current_app.instance_path, CACHE_FILENAME)
+        entries = {}
+        try:
+            with open(self._cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                entries = data.get('entries') or {}
+        except (OSError, ValueError):
+            pass
+        self._entries = entries
+
+    def load(self, manifest_path: str) -> Optional[dict]:
+        """读取清单文件；文件不存在或解析失败时返回 None"""
+        try:
+            stat = os.stat(manifest_path)
+        except OSError:
+            return None
+        signature = [stat.st_mtime_ns, stat.st_size]
+
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(manifest_path)
+            if entry and entry.get('signature') == signature:
+                return entry['data']
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            current_app.logger.error(f"读取清单 {manifest_path} 失败: {exc}")
+            return None
+
+        with self._lock:
+            self._entries[manifest_path] = {'signature': signature, 'data': data}
+            self._dirty = True
+        return data
+
+    def scan(self, root_dir: str, manifest_name: str, skip=()) -> Dict[str, Tuple[str, dict]]:
+        """扫描目录下带清单文件的子目录，返回 {目录名: (目录路径, 清单)}；skip 中的目录不读取"""
+        found = {}
+        with os.scandir(root_dir) as iterator:
+            for entry in iterator:
+                if entry.name in skip or not entry.is_dir():
+                    continue
+                manifest = self.load(os.path.join(entry.path, manifest_name))
+                if manifest is not None:
+                    found[entry.name] = (entry.path, manifest)
+        return found
+
+    def save(self):
+        """有变化时写回缓存文件（先写临时文件再替换，避免并发启动的 worker 读到半个文件）"""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            # 清理已不存在的清单
+            entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            self._entries = entries
+            self._dirty = False
+            payload = {'version': CACHE_VERSION, 'entries': entries}
+        tmp_path = f'{self._cache_path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as exc:
+            current_app.logger.warning(f"写入发现缓存失败: {exc}")
+
+
+# 创建全局发现缓存实例
+discovery_cache = DiscoveryCache()
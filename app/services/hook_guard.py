@@ -0,0 +1,351 @@
+"""
+插件钩子时间预算与熔断
+
+- 模板钩子可以设置硬性时限：在有界线程池中执行，超时后页面不再等待，改用该钩子在同一页面上
+  最近一次成功的输出（没有时为空）；超时的调用仍在后台完成，完成后的结果同样记为最近一次输出；
+- 时限从回调实际开始执行时算起；线程池已满、调用未能执行时直接使用最近一次输出，
+  不计为该插件的失败（拖慢线程池的是别的插件）；
+- 过滤器和动作钩子无法中断，超出时限只计为一次失败；异步动作钩子按后台执行的最终结果计失败（见 async_hooks）；
+- 同一 (插件, 钩子) 的回调连续失败（抛出异常或自身运行超过时限）达到阈值后熔断，冷却期内直接跳过
+  （模板钩子输出最近一次的结果），冷却结束后放行一次试探调用，成功则恢复。
+
+环境变量：
+    PLUGIN_HOOK_TIMEOUT=0         插件钩子的默认时限（秒），默认 0 即不限制（时限需显式开启）；
+                                  register_template_hook(timeout=...) 可单独设置
+    PLUGIN_HOOK_WORKERS=4         执行带时限模板钩子的线程数
+    PLUGIN_BREAKER_THRESHOLD=5    连续失败多少次后熔断
+    PLUGIN_BREAKER_COOLDOWN=60    熔断冷却时间（秒）
+    PLUGIN_HOOK_FALLBACKS=1024    保留的模板钩子最近一次输出的条数（按插件、钩子和页面路径）
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Callable, Dict, List, Tuple
+
+from flask import copy_current_request_context, current_app, has_app_context, has_request_context, request
+
+from app.services.cache_service import LRUCache
+
+
+class HookBudgetExceeded(Exception):
+    """带时限的模板钩子未能在时限内完成"""
+
+
+class HookPoolSaturated(HookBudgetExceeded):
+    """线程池已满，回调没有执行（不计为该插件的失败）"""
+
+
+class GuardedCall:
+    """一次带时限调用的执行记录，调用方和工作线程据此判断是否已计过失败"""
+
+    __slots__ = ('started', 'counted')
+
+    def __init__(self):
+        self.started = None
+        self.counted = False
+
+
+class BreakerState:
+    """单个 (插件, 钩子) 的熔断状态"""
+
+    __slots__ = ('hook_type', 'failures', 'opened_until', 'trips', 'last_error', 'probing')
+
+    def __init__(self, hook_type: str):
+        self.hook_type = hook_type
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trips = 0
+        self.last_error = ''
+        self.probing = False
+
+
+class HookGuard:
+    """为插件钩子回调加上时间预算和熔断"""
+
+    def __init__(self):
+        self.default_timeout = 0.0
+        self.max_workers = 4
+        self.threshold = 5
+        self.cooldown = 60.0
+        # 尚未恢复（有连续失败或处于熔断中）的钩子；写入时整体替换，读取方无需加锁
+        self._states: Dict[Tuple[str, str], BreakerState] = {}
+        # 熔断过、已恢复的钩子，只用于 status() 展示历史
+        self._recovered: Dict[Tuple[str, str], BreakerState] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._inflight = 0
+        # 模板钩子最近一次成功的输出 {(插件, 钩子, 页面路径): 输出}
+        self._fallbacks = LRUCache(maxsize=1024, ttl=0)
+
+    @property
+    def states(self) -> Dict[Tuple[str, str], BreakerState]:
+        """尚未恢复的 (插件, 钩子)；钩子调用成功后即移出，为空时分发循环不需要检查熔断"""
+        return self._states
+
+    def budget(self, timeout: float = None) -> float:
+        return self.default_timeout if timeout is None else timeout
+
+    def init_app(self, app):
+        self.default_timeout = float(os.getenv('PLUGIN_HOOK_TIMEOUT', 0))
+        self.max_workers = max(1, int(os.getenv('PLUGIN_HOOK_WORKERS', 4)))
+        self.threshold = max(1, int(os.getenv('PLUGIN_BREAKER_THRESHOLD', 5)))
+        self.cooldown = float(os.getenv('PLUGIN_BREAKER_COOLDOWN', 60))
+        self._fallbacks = LRUCache(maxsize=max(1, int(os.getenv('PLUGIN_HOOK_FALLBACKS', 1024))), ttl=0)
+
+    # -------- 包装 --------
+    def wrap(self, callback: Callable, plugin_name: str, hook_name: str, hook_type: str,
+             timeout: float = None) -> Callable:
+        """
+        返回带熔断和时间预算（模板钩子为硬性时限）的回调
+
+        插件管理器只为设置了时限的钩子使用包装；没有时限的钩子直接存放在分发表中，
+        有失败记录时由 guard() 改写分发表，调用路径上不多一层函数。
+        """
+        key = (plugin_name, hook_name)
+        budget = self.budget(timeout)
+        hard_deadline = hook_type == 'template' and budget > 0
+
+        def guarded_callback(*args, **kwargs):
+            state = self._states.get(key)
+            if state is not None and not self.allow(state):
+                # 熔断中：过滤器原样返回值，模板钩子输出最近一次的结果，动作钩子跳过
+                if hook_type == 'filter':
+                    return args[0] if args else None
+                return self.fallback(key) if hook_type == 'template' else None
+
+            if hard_deadline:
+                try:
+                    return self._run_with_deadline(callback, key, budget, args, kwargs)
+                except HookPoolSaturated:
+                    current_app.logger.warning(
+                        f"插件钩子线程池已满，模板钩子 {hook_name} (插件: {plugin_name}) 本次使用最近一次的输出"
+                    )
+                except HookBudgetExceeded:
+                    current_app.logger.warning(
+                        f"模板钩子 {hook_name} (插件: {plugin_name}) 超过时限 {budget:g}s，本次使用最近一次的输出"
+                    )
+                return self.fallback(key)
+
+            started = time.perf_counter()
+            try:
+                result = callback(*args, **kwargs)
+            except Exception as e:
+                self.record_failure(key, hook_type, f'异常: {e}')
+                raise
+
+            if budget > 0 and time.perf_counter() - started > budget:
+                self.record_failure(key, hook_type, f'耗时超过 {budget:g}s')
+            elif state is not None:
+                self.record_success(key, state)
+            if hook_type == 'template' and state is not None:
+                self.remember(key, result)
+            return result
+
+        guarded_callback.__name__ = getattr(callback, '__name__', 'guarded_callback')
+        return guarded_callback
+
+    def guard(self, table: Tuple, hook_type: str) -> Tuple:
+        """
+        按熔断状态改写分发表 ((callable, plugin_name, breaker_key), ...)，只在 states 不为空时调用
+
+        熔断中的项跳过（模板钩子换成输出最近一次的结果），有失败记录的项换成成功后清除记录的版本；
+        回调抛出的异常仍由分发循环按 breaker_key 计为失败。表中没有未恢复的钩子时原样返回。
+        """
+        states = self._states
+        if not any(key in states for _, _, key in table if key):
+            return table
+        entries = []
+        for callback, plugin_name, key in table:
+            state = states.get(key) if key else None
+            if state is None:
+                entries.append((callback, plugin_name, key))
+            elif self.allow(state):
+                entries.append((self._recorded(callback, key, state, hook_type), plugin_name, key))
+            elif hook_type == 'template':
+                entries.append((partial(self.fallback, key), plugin_name, None))
+        return tuple(entries)
+
+    def _recorded(self, callback: Callable, key: Tuple[str, str], state: BreakerState, hook_type: str) -> Callable:
+        def recorded_callback(*args, **kwargs):
+            result = callback(*args, **kwargs)
+            self.record_success(key, state)
+            if hook_type == 'template':
+                self.remember(key, result)
+            return result
+        return recorded_callback
+
+    # -------- 最近一次输出 --------
+    # 有时限的模板钩子每次成功都记录；其它模板钩子只在有失败记录后记录，正常的钩子不产生额外开销
+    @staticmethod
+    def _fallback_key(key: Tuple[str, str]) -> tuple:
+        # 模板钩子的输出通常与页面有关（如文章详情），按页面路径区分
+        return key + (request.path if has_request_context() else '',)
+
+    def remember(self, key: Tuple[str, str], result):
+        if result is not None:
+            self._fallbacks.set(self._fallback_key(key), result)
+
+    def fallback(self, key: Tuple[str, str]):
+        return self._fallbacks.get(self._fallback_key(key))
+
+    # -------- 带时限的执行 --------
+    def _run_with_deadline(self, callback: Callable, key: Tuple[str, str], timeout: float, args, kwargs):
+        """
+        在线程池中执行，等待回调自身运行至多 timeout 秒
+
+        线程池已满或任务尚未开始执行时抛出 HookPoolSaturated（不计失败）；
+        回调已运行超过时限时计一次失败并抛出 HookBudgetExceeded。
+        回调的异常和超时完成由工作线程自己记录，同一次调用最多计一次失败。
+        """
+        with self._lock:
+            if self._inflight >= self.max_workers:
+                raise HookPoolSaturated()
+            self._inflight += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='plugin-hook')
+
+        call = GuardedCall()
+
+        def measured(*task_args, **task_kwargs):
+            call.started = time.perf_counter()
+            try:
+                result = callback(*task_args, **task_kwargs)
+            except Exception as e:
+                self._settle(call, key, f'异常: {e}')
+                raise
+            if time.perf_counter() - call.started > timeout:
+                self._settle(call, key, f'耗时超过 {timeout:g}s')
+            else:
+                state = self._states.get(key)
+                if state is not None:
+                    self.record_success(key, state)
+            # 超时后才完成的结果同样可以作为之后请求的输出
+            self.remember(key, result)
+            return result
+
+        if has_request_context():
+            task = copy_current_request_context(measured)
+        elif has_app_context():
+            app = current_app._get_current_object()
+
+            def task(*task_args, **task_kwargs):
+                with app.app_context():
+                    return measured(*task_args, **task_kwargs)
+        else:
+            task = measured
+
+        def run():
+            try:
+                return task(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._inflight -= 1
+
+        future = self._executor.submit(run)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            pass
+        if future.cancel():
+            # 仍在排队，回调没有执行
+            with self._lock:
+                self._inflight -= 1
+            raise HookPoolSaturated()
+        # 时限从回调开始执行时算起，减去排队的时间
+        remaining = timeout - (time.perf_counter() - (call.started or time.perf_counter()))
+        if remaining > 0:
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeoutError:
+                pass
+        self._settle(call, key, f'超时（>{timeout:g}s）')
+        raise HookBudgetExceeded()
+
+    def _settle(self, call: GuardedCall, key: Tuple[str, str], reason: str):
+        """一次调用只计一次失败（调用方超时与工作线程完成时都可能记录）"""
+        with self._lock:
+            if call.counted:
+                return
+            call.counted = True
+        self.record_failure(key, 'template', reason)
+
+    # -------- 熔断状态 --------
+    def allow(self, state: BreakerState) -> bool:
+        if state.opened_until == 0.0:
+            return True
+        if time.monotonic() < state.opened_until:
+            return False
+        # 冷却结束：只放行一次试探调用
+        with self._lock:
+            if state.probing:
+                return False
+            state.probing = True
+        return True
+
+    def record_failure(self, key: Tuple[str, str], hook_type: str, reason: str):
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._recovered.pop(key, None) or BreakerState(hook_type)
+                self._states = {**self._states, key: state}
+            state.failures += 1
+            state.last_error = reason[:200]
+            if state.probing or state.failures >= self.threshold:
+                state.opened_until = time.monotonic() + self.cooldown
+                state.trips += 1
+                state.probing = False
+                tripped = True
+            else:
+                tripped = False
+        if tripped:
+            current_app.logger.error(
+                f"插件 {key[0]} 的钩子 {key[1]} 连续失败 {state.failures} 次，熔断 {self.cooldown:g}s（{reason}）"
+            )
+
+    def record_success(self, key: Tuple[str, str], state: BreakerState):
+        """调用成功：清除失败记录并移出 states，之后的分发不再为该钩子改写分发表"""
+        with self._lock:
+            state.failures = 0
+            state.opened_until = 0.0
+            state.probing = False
+            if self._states.get(key) is state:
+                self._states = {other: value for other, value in self._states.items() if other != key}
+                if state.trips:
+                    self._recovered[key] = state
+
+    def reset(self, plugin_name: str = None):
+        """清除熔断状态（插件停用或重新激活时）"""
+        with self._lock:
+            if plugin_name is None:
+                self._states = {}
+                self._recovered = {}
+            else:
+                self._states = {key: state for key, state in self._states.items() if key[0] != plugin_name}
+                self._recovered = {key: state for key, state in self._recovered.items() if key[0] != plugin_name}
+
+    def status(self) -> List[dict]:
+        """有失败记录的钩子及其熔断状态"""
+        now = time.monotonic()
+        rows = []
+        for (plugin_name, hook_name), state in list(self._states.items()) + list(self._recovered.items()):
+            if not state.failures and not state.trips:
+                continue
+            is_open = now < state.opened_until
+            rows.append({
+                'plugin': plugin_name,
+                'hook': hook_name,
+                'type': state.hook_type,
+                'state': 'open' if is_open else ('half_open' if state.opened_until else 'closed'),
+                'failures': state.failures,
+                'trips': state.trips,
+                'retry_in': round(state.opened_until - now, 1) if is_open else 0,
+                'last_error': state.last_error,
+            })
+        rows.sort(key=lambda row: (row['state'] != 'open', -row['failures']))
+        return rows
+
+
+# 创建全局钩子保护实例
+hook_guard = HookGuard()
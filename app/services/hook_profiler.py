@@ -0,0 +1,145 @@
+"""
+插件钩子性能统计
+
+PluginManager 分发钩子时按 (插件, 钩子) 记录调用次数、总耗时、最大耗时，
+并保留最近若干次耗时用于计算 p50/p95。统计只在本 worker 进程内汇总。
+
+通过环境变量开启：
+    PLUGIN_PROFILING=1                  开启统计
+    PLUGIN_PROFILING_SAMPLE_RATE=0.05   只统计 5% 的分发（生产环境常开时使用）
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+# 每个钩子保留的最近耗时样本数
+DEFAULT_WINDOW = 512
+
+
+class HookStats:
+    """单个 (插件, 钩子) 的累计计数"""
+
+    __slots__ = ('hook_type', 'count', 'total', 'max', 'errors', 'samples')
+
+    def __init__(self, hook_type: str, window: int):
+        self.hook_type = hook_type
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.samples = deque(maxlen=window)
+
+
+def _percentile(ordered: List[float], ratio: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(ratio * (len(ordered) - 1))))]
+
+
+class HookProfiler:
+    """按 (插件, 钩子) 汇总的耗时统计，关闭时分发路径上只多一次布尔判断"""
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.window = DEFAULT_WINDOW
+        self.started_at = time.time()
+        self._stats: Dict[Tuple[str, str], HookStats] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """从环境变量读取开关和采样率"""
+        self.configure(
+            enabled=os.getenv('PLUGIN_PROFILING', '0').lower() in ('1', 'true', 'yes', 'on'),
+            sample_rate=float(os.getenv('PLUGIN_PROFILING_SAMPLE_RATE', 1.0)),
+        )
+
+    def configure(self, enabled: bool = None, sample_rate: float = None):
+        if enabled is not None:
+            self.enabled = enabled
+        if sample_rate is not None:
+            self.sample_rate = max(0.0, min(1.0, sample_rate))
+
+    def sampling(self) -> bool:
+        """本次分发是否计时（按采样率抽样）"""
+        if not self.enabled:
+            return False
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def instrument(self, table: Tuple, hook_name: str, hook_type: str) -> Tuple:
+        """把分发表中的回调换成计时版本（只在本次分发被抽中时调用，未抽中的分发没有额外开销）"""
+        return tuple(
+            (self._timed(callback, plugin_name, hook_name, hook_type), plugin_name, breaker_key)
+            for callback, plugin_name, breaker_key in table
+        )
+
+    def _timed(self, callback, plugin_name: str, hook_name: str, hook_type: str):
+        def timed_callback(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = callback(*args, **kwargs)
+            except Exception:
+                self.record(plugin_name, hook_name, hook_type, time.perf_counter() - started, failed=True)
+                raise
+            self.record(plugin_name, hook_name, hook_type, time.perf_counter() - started)
+            return result
+        return timed_callback
+
+    def record(self, plugin_name: str, hook_name: str, hook_type: str, elapsed: float, failed: bool = False):
+        key = (plugin_name, hook_name)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(key, HookStats(hook_type, self.window))
+        # 计数不加锁：并发下偶尔丢一次累加可以接受，换取分发路径上的低开销
+        stats.count += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        if failed:
+            stats.errors += 1
+        stats.samples.append(elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self.started_at = time.time()
+
+    def report(self) -> List[dict]:
+        """统计结果（毫秒），按总耗时降序"""
+        rows = []
+        for (plugin_name, hook_name), stats in list(self._stats.items()):
+            ordered = sorted(stats.samples)
+            count = stats.count
+            rows.append({
+                'plugin': plugin_name,
+                'hook': hook_name,
+                'type': stats.hook_type,
+                'count': count,
+                'estimated_calls': int(count / self.sample_rate) if self.sample_rate else count,
+                'errors': stats.errors,
+                'total_ms': round(stats.total * 1000, 3),
+                'avg_ms': round(stats.total / count * 1000, 3) if count else 0.0,
+                'p50_ms': round(_percentile(ordered, 0.5) * 1000, 3),
+                'p95_ms': round(_percentile(ordered, 0.95) * 1000, 3),
+                'max_ms': round(stats.max * 1000, 3),
+            })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def summary(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'window': self.window,
+            'pid': os.getpid(),
+            'since': self.started_at,
+            'hooks': self.report(),
+        }
+
+
+# 创建全局钩子性能统计实例
+hook_profiler = HookProfiler()
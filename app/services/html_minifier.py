@@ -0,0 +1,148 @@
+"""
+主题页面 HTML 压缩（可选）
+
+ThemeManager.render_template 渲染完成后去掉模板带来的缩进、空行和注释：
+
+- 文本中的连续空白合并为一个字符（包含换行时保留一个换行，否则为一个空格），
+  浏览器对普通文本中的空白本来就按一个空格处理，不影响显示；
+- 删除 HTML 注释，条件注释（<!--[if ...]>）保留；
+- <pre>、<code>、<textarea>、<script>、<style> 的内容和标签内部（属性值）原样保留；
+- 开始标签带 data-minify="off"、行内样式为 white-space: pre / pre-wrap / pre-line / break-spaces，
+  或 class 中含 HTML_MINIFY_PRESERVE_CLASSES 所列类名的元素，整个子树原样保留。
+
+样式表中才声明 white-space: pre 的元素（如用 <div class="poem"> 排版的诗歌、代码块）从 HTML 中看不出来，
+其中的换行和缩进会被合并；开启压缩前需要给这些元素加上 data-minify="off"，或把类名加入
+HTML_MINIFY_PRESERVE_CLASSES。因此压缩默认关闭。
+
+站点没有整页缓存，压缩结果按渲染结果的摘要缓存：同一页面内容不变时只压缩一次，
+之后每次渲染只多一次摘要计算。
+
+环境变量：
+    HTML_MINIFY=false           开启压缩
+    HTML_MINIFY_CACHE_SIZE=256  缓存的页面数
+    HTML_MINIFY_PRESERVE_CLASSES=poem,code-block
+                                内容原样保留的元素类名（逗号分隔）
+"""
+import hashlib
+import os
+import re
+
+from app.services.cache_service import LRUCache
+
+# 需要原样保留的元素、注释和其它标签
+_TOKEN = re.compile(
+    r'(?P<raw><(?P<tag>pre|code|textarea|script|style)\b[^>]*>.*?</(?P=tag)\s*>)'
+    r'|(?P<comment><!--.*?-->)'
+    r'|(?P<element><[^>]*>)',
+    re.I | re.S
+)
+_WHITESPACE = re.compile(r'\s+')
+_OPEN_TAG = re.compile(r'<([a-z][a-z0-9-]*)\b', re.I)
+_MINIFY_OFF = re.compile(r'\sdata-minify\s*=\s*["\']?off\b', re.I)
+_PRE_STYLE = re.compile(r'white-space\s*:\s*(?:pre|pre-wrap|pre-line|break-spaces)\b', re.I)
+_CLASS_ATTR = re.compile(r'\sclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+# 没有结束标签的元素
+_VOID_TAGS = frozenset({
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr',
+})
+# 太小的页面不值得压缩
+MIN_LENGTH = 512
+
+
+def _collapse(match) -> str:
+    return '\n' if '\n' in match.group(0) else ' '
+
+
+def _preserved(tag: str, preserve_classes: frozenset) -> bool:
+    """开始标签是否要求整个子树原样保留"""
+    if 'data-minify' in tag and _MINIFY_OFF.search(tag):
+        return True
+    if 'white-space' in tag and _PRE_STYLE.search(tag):
+        return True
+    if preserve_classes and 'class' in tag:
+        match = _CLASS_ATTR.search(tag)
+        if match and not preserve_classes.isdisjoint((match.group(1) or match.group(2) or match.group(3)).split()):
+            return True
+    return False
+
+
+def _element_end(html: str, name: str, position: int) -> int:
+    """从开始标签之后找到与之配对的结束标签（同名元素可以嵌套），返回结束位置；没有时返回 -1"""
+    pattern = re.compile(rf'<(/?){re.escape(name)}\b[^>]*>', re.I)
+    depth = 1
+    for match in pattern.finditer(html, position):
+        if match.group(1):
+            depth -= 1
+            if not depth:
+                return match.end()
+        elif not match.group(0).endswith('/>'):
+            depth += 1
+    return -1
+
+
+def minify_html(html: str, preserve_classes: frozenset = frozenset()) -> str:
+    """压缩 HTML 中无意义的空白并去掉注释（preserve_classes 为内容原样保留的元素类名）"""
+    parts = []
+    # 被删除的注释两侧的文本合并后再压缩空白
+    text = []
+    position = 0
+    match = _TOKEN.search(html)
+    while match is not None:
+        text.append(html[position:match.start()])
+        position = match.end()
+        comment = match.group('comment')
+        if comment is not None and not comment.startswith(('<!--[if', '<!--<![endif]')):
+            match = _TOKEN.search(html, position)
+            continue
+        parts.append(_WHITESPACE.sub(_collapse, ''.join(text)))
+        text = []
+        token = match.group(0)
+        element = match.group('element')
+        if element is not None and _preserved(element, preserve_classes):
+            name = _OPEN_TAG.match(element)
+            if name and name.group(1).lower() not in _VOID_TAGS and not element.endswith('/>'):
+                end = _element_end(html, name.group(1), position)
+                if end != -1:
+                    # 整个元素（含子元素）原样输出
+                    token = html[match.start():end]
+                    position = end
+        parts.append(token)
+        match = _TOKEN.search(html, position)
+    text.append(html[position:])
+    parts.append(_WHITESPACE.sub(_collapse, ''.join(text)))
+    return ''.join(parts)
+
+
+class HtmlMinifier:
+    """渲染后的 HTML 压缩，结果按内容摘要缓存"""
+
+    def __init__(self):
+        self.enabled = False
+        self.preserve_classes = frozenset()
+        self._cache = LRUCache(maxsize=256, ttl=0)
+        self.stats = {'minified': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def init_app(self, app):
+        self.enabled = os.getenv('HTML_MINIFY', 'false').lower() in ('1', 'true', 'yes', 'on')
+        self.preserve_classes = frozenset(
+            name.strip() for name in os.getenv('HTML_MINIFY_PRESERVE_CLASSES', '').split(',') if name.strip()
+        )
+        self._cache = LRUCache(maxsize=max(1, int(os.getenv('HTML_MINIFY_CACHE_SIZE', 256))), ttl=0)
+
+    def minify(self, html: str) -> str:
+        """开启时返回压缩后的 HTML；同一内容命中缓存时不再重复压缩"""
+        if not self.enabled or len(html) < MIN_LENGTH:
+            return html
+        key = hashlib.blake2b(html.encode('utf-8'), digest_size=16).digest()
+        result = self._cache.get(key)
+        if result is None:
+            result = minify_html(html, self.preserve_classes)
+            self._cache.set(key, result)
+            self.stats['minified'] += 1
+            self.stats['bytes_in'] += len(html)
+            self.stats['bytes_out'] += len(result)
+        return result
+
+
+# 创建全局 HTML 压缩实例
+html_minifier = HtmlMinifier()
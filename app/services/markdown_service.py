@@ -140,6 +140,30 @@ class MarkdownService:
         
         return text_only
     
+    def to_plain_text(self, text):
+        """
+        粗略去除Markdown语法，得到纯文本（不渲染HTML，适合建立索引和生成片段）
+
+        Args:
+            text (str): Markdown文本
+
+        Returns:
+            str: 纯文本
+        """
+        if not text:
+            return ''
+
+        plain = re.sub(r'```[^\n]*\n', '', text)  # 代码围栏标记（保留代码本身）
+        plain = plain.replace('```', '')
+        plain = re.sub(r'!\[([^\]]*)\]\([^)]*\)', r'\1', plain)  # 图片 -> 替代文本
+        plain = re.sub(r'\[([^\]]*)\]\([^)]*\)', r'\1', plain)  # 链接 -> 链接文本
+        plain = re.sub(r'<[^>]+>', '', plain)  # 内嵌HTML标签
+        plain = re.sub(r'^\s{0,3}(#{1,6}|>+|[-*+]|\d+\.)\s+', '', plain, flags=re.MULTILINE)  # 标题/引用/列表前缀
+        plain = re.sub(r'(\*\*|__|~~|==|\*|`)', '', plain)  # 强调、删除线、行内代码
+        plain = re.sub(r'\s+', ' ', plain)
+
+        return plain.strip()
+
     def get_toc(self, text):
         """
         获取目录
@@ -0,0 +1,303 @@
+"""
+拼音搜索与自动补全索引
+
+为已发布文章标题和标签名预计算全拼、首字母和原文键，常驻内存：
+输入 shenduxuexi、sdxx、xuexi 或 深度 都能找到「深度学习」。
+键保存在按字典序排序的数组中（扁平化的前缀树），前缀查询只需一次二分加顺序扫描。
+键数组和条目表组成只读快照：写入方在副本上修改后整体替换引用，查询无需加锁。
+
+其它 worker 的写入通过文章内容代标记 post_generation 感知：文章的保存、更新、删除由搜索服务更换标记，
+标签的新增、删除、改名在提交后由本模块更换标记（浏览量等计数变化不更换，不会引起重建）。
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from flask import current_app
+from pypinyin import Style, lazy_pinyin
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.post import Post, Tag, post_tags
+from app.services.cache_service import post_generation
+
+# 每个条目最多从前几个音节/字处生成后缀键，以及每个键的最大长度
+MAX_KEY_STARTS = 8
+MAX_KEY_LENGTH = 32
+# 一次前缀查询最多扫描的键数
+MAX_SCAN = 500
+# 跨 worker 检查数据是否变化的间隔（秒）
+SYNC_INTERVAL = 30
+# 这些标签列变化时索引需要更新
+TAG_INDEXED_COLUMNS = ('name', 'slug')
+
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+_PINYIN_QUERY_RE = re.compile(r'^[a-z]+$')
+
+
+def normalize_query(text: str) -> str:
+    """统一大小写并去掉空白和标点，便于与索引键比较"""
+    return ''.join(_WORD_RE.findall((text or '').lower()))
+
+
+def looks_like_pinyin(query: str) -> bool:
+    """查询是否可能是拼音（纯字母，且不短于两个字母）"""
+    normalized = normalize_query(query)
+    return len(normalized) >= 2 and bool(_PINYIN_QUERY_RE.match(normalized))
+
+
+def build_keys(text: str) -> Set[str]:
+    """为一段文本生成全拼、首字母和原文的后缀键"""
+    syllables = []
+    for part in lazy_pinyin((text or '').lower(), style=Style.NORMAL):
+        syllables.extend(_WORD_RE.findall(part))
+    if not syllables:
+        return set()
+
+    keys = set()
+    for start in range(min(len(syllables), MAX_KEY_STARTS)):
+        keys.add(''.join(syllables[start:])[:MAX_KEY_LENGTH])
+        keys.add(''.join(syllable[0] for syllable in syllables[start:])[:MAX_KEY_LENGTH])
+
+    compact = normalize_query(text)
+    for start in range(min(len(compact), MAX_KEY_STARTS)):
+        keys.add(compact[start:start + MAX_KEY_LENGTH])
+
+    keys.discard('')
+    return keys
+
+
+class PinyinIndex:
+    """内存中的拼音前缀索引，支持按文章/标签增量更新"""
+
+    def __init__(self):
+        self.app = None
+        # 只读快照 (有序的 [(键, 条目ID)], {条目ID: 条目信息})，写入时整体替换，读取方不加锁
+        self._index: Tuple[List[Tuple[str, str]], Dict[str, Dict]] = ([], {})
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """注册文章写入钩子，增量维护索引"""
+        self.app = app
+        app.pinyin_index = self
+
+        from app.services.plugin_manager import plugin_manager
+        plugin_manager.register_hook('after_post_save', self._on_post_changed)
+        plugin_manager.register_hook('after_post_update', self._on_post_changed)
+        plugin_manager.register_hook('after_post_delete', self._on_post_deleted)
+
+        # 标签不经过文章钩子修改（如直接改名）时同样更换代标记
+        event.listen(Session, 'after_flush', self._collect_tag_changes)
+        event.listen(Session, 'after_commit', self._bump_on_commit)
+        event.listen(Session, 'after_rollback', self._discard_tag_changes)
+
+    # -------- 数据加载 --------
+    @staticmethod
+    def _current_signature() -> str:
+        # 文章内容代标记：标题、状态、标签的任何修改都会更换，与长度无关；只改浏览量时不变
+        return post_generation.value
+
+    @staticmethod
+    def _collect_tag_changes(session, flush_context):
+        if session.info.get('_pinyin_tags_changed'):
+            return
+        for instance in list(session.new) + list(session.deleted):
+            if isinstance(instance, Tag):
+                session.info['_pinyin_tags_changed'] = True
+                return
+        for instance in session.dirty:
+            if isinstance(instance, Tag):
+                state = sa_inspect(instance)
+                if any(state.attrs[column].history.has_changes() for column in TAG_INDEXED_COLUMNS):
+                    session.info['_pinyin_tags_changed'] = True
+                    return
+
+    @staticmethod
+    def _bump_on_commit(session):
+        if session.info.pop('_pinyin_tags_changed', None):
+            post_generation.bump()
+
+    @staticmethod
+    def _discard_tag_changes(session):
+        session.info.pop('_pinyin_tags_changed', None)
+
+    @staticmethod
+    def _post_entry(post) -> Dict:
+        return {
+            'type': 'post',
+            'id': post.id,
+            'title': post.title,
+            'url': f'/post/{post.slug}',
+            'weight': post.view_count or 0,
+        }
+
+    @staticmethod
+    def _tag_entry(tag, post_count: int) -> Dict:
+        return {
+            'type': 'tag',
+            'id': tag.id,
+            'title': tag.name,
+            'url': f'/tag/{tag.slug}',
+            'weight': post_count,
+        }
+
+    def rebuild(self):
+        """全量重建索引，构建完成后整体替换"""
+        entries = {}
+        rows = (
+            db.session.query(Post.id, Post.title, Post.slug, Post.view_count)
+            .filter(Post.status == 'published').all()
+        )
+        for post in rows:
+            entries[f'post:{post.id}'] = self._post_entry(post)
+
+        tag_counts = dict(
+            db.session.query(post_tags.c.tag_id, db.func.count(Post.id))
+            .join(Post, Post.id == post_tags.c.post_id)
+            .filter(Post.status == 'published')
+            .group_by(post_tags.c.tag_id).all()
+        )
+        for tag in db.session.query(Tag.id, Tag.name, Tag.slug).all():
+            entries[f'tag:{tag.id}'] = self._tag_entry(tag, tag_counts.get(tag.id, 0))
+
+        keys = []
+        for entry_id, entry in entries.items():
+            entry['keys'] = build_keys(entry['title'])
+            keys.extend((key, entry_id) for key in entry['keys'])
+        keys.sort()
+
+        with self._lock:
+            self._index = (keys, entries)
+            self._signature = self._current_signature()
+            self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """首次使用时构建索引；之后定期比对数据签名，其它 worker 写入后自动重建"""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < SYNC_INTERVAL:
+            return
+        if self._signature is None or self._current_signature() != self._signature:
+            self.rebuild()
+        else:
+            self._checked_at = now
+
+    # -------- 增量更新 --------
+    def _apply(self, puts: Dict[str, Dict], removals: Iterable[str] = ()):
+        """
+        在副本上写入/删除条目，完成后一次赋值替换快照（调用方持有写锁）
+
+        正在进行的查询继续使用旧快照，不会看到插入或删除了一半的键数组。
+        """
+        keys, entries = self._index
+        entries = dict(entries)
+        changed = set(removals) | set(puts)
+        for entry_id in removals:
+            entries.pop(entry_id, None)
+        added = []
+        for entry_id, entry in puts.items():
+            entry['keys'] = build_keys(entry['title'])
+            entries[entry_id] = entry
+            added.extend((key, entry_id) for key in entry['keys'])
+        retained = (item for item in keys if item[1] not in changed)
+        self._index = (list(heapq.merge(retained, sorted(added))), entries)
+
+    def update_post(self, post):
+        """更新单篇文章及其标签的索引条目"""
+        if self._signature is None:
+            return  # 尚未构建，首次查询时会全量构建
+        entry_id = f'post:{post.id}'
+        puts = {f'tag:{tag.id}': self._tag_entry(tag, tag.get_post_count()) for tag in post.tags}
+        with self._lock:
+            if post.status == 'published':
+                puts[entry_id] = self._post_entry(post)
+                self._apply(puts)
+            else:
+                self._apply(puts, removals=(entry_id,))
+            self._signature = self._current_signature()
+
+    def remove_post(self, post_id: int):
+        """移除文章条目（标签计数在下次同步时修正）"""
+        if self._signature is None:
+            return
+        with self._lock:
+            self._apply({}, removals=(f'post:{post_id}',))
+            self._signature = self._current_signature()
+
+    # -------- 查询 --------
+    @staticmethod
+    def _match(keys: List[Tuple[str, str]], query: str) -> Set[str]:
+        prefix = normalize_query(query)
+        if not prefix:
+            return set()
+        position = bisect_left(keys, (prefix, ''))
+        matched = set()
+        end = min(len(keys), position + MAX_SCAN)
+        while position < end and keys[position][0].startswith(prefix):
+            matched.add(keys[position][1])
+            position += 1
+        return matched
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """前缀补全：先返回匹配的标签，再返回文章，各自按热度排序"""
+        self.ensure_fresh()
+        keys, entries = self._index
+        matched = [entries[entry_id] for entry_id in self._match(keys, query) if entry_id in entries]
+        tags = heapq.nlargest(3, (e for e in matched if e['type'] == 'tag'), key=lambda e: (e['weight'], e['id']))
+        posts = heapq.nlargest(limit, (e for e in matched if e['type'] == 'post'), key=lambda e: (e['weight'], e['id']))
+        suggestions = tags + posts
+        return [
+            {'type': entry['type'], 'id': entry['id'], 'title': entry['title'], 'url': entry['url']}
+            for entry in suggestions[:limit]
+        ]
+
+    def match_post_ids(self, query: str, tag_posts_limit: int = 200) -> List[int]:
+        """返回标题拼音匹配的文章，以及拼音匹配标签下的文章ID"""
+        self.ensure_fresh()
+        keys, entries = self._index
+        matched = [entries[entry_id] for entry_id in self._match(keys, query) if entry_id in entries]
+
+        post_ids = [e['id'] for e in sorted(
+            (e for e in matched if e['type'] == 'post'), key=lambda e: (-e['weight'], -e['id'])
+        )]
+        tag_ids = [e['id'] for e in matched if e['type'] == 'tag']
+        if tag_ids:
+            seen = set(post_ids)
+            rows = (
+                db.session.query(post_tags.c.post_id)
+                .join(Post, Post.id == post_tags.c.post_id)
+                .filter(post_tags.c.tag_id.in_(tag_ids), Post.status == 'published')
+                .order_by(Post.published_at.desc())
+                .limit(tag_posts_limit).all()
+            )
+            for row in rows:
+                if row.post_id not in seen:
+                    seen.add(row.post_id)
+                    post_ids.append(row.post_id)
+        return post_ids
+
+    # -------- 钩子 --------
+    def _on_post_changed(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            self.update_post(post)
+        except Exception as exc:
+            current_app.logger.error(f"更新文章 {post.id} 拼音索引失败: {exc}")
+
+    def _on_post_deleted(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            self.remove_post(post.id)
+        except Exception as exc:
+            current_app.logger.error(f"删除文章 {post.id} 拼音索引失败: {exc}")
+
+
+# 创建全局拼音索引实例
+pinyin_index = PinyinIndex()
@@ -1,24 +1,55 @@
 """
 插件管理器
 """
+import hashlib
+import json
 import os
 import sys
 import importlib
 import importlib.util
 import inspect
-from typing import Dict, List, Any, Callable
-from flask import current_app
+import threading
+from bisect import bisect_right
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from functools import partial
+from types import MappingProxyType
+from typing import Dict, List, Any, Callable, Tuple
+from flask import abort, current_app, g, has_app_context, has_request_context, request, url_for
+from flask.globals import request_ctx
+from markupsafe import escape
+from sqlalchemy import event
+from sqlalchemy.orm import Session
 from app import db
 from app.models.plugin import Plugin, PluginHook
+from app.services.cache_service import GenerationCounter, LRUCache
+from app.services.discovery_cache import discovery_cache
+from app.services.async_hooks import async_hook_runner
+from app.services.hook_guard import hook_guard
+from app.services.hook_profiler import hook_profiler
+from app.services.resource_hints import resource_hints
+from app.services.static_assets import static_assets
 from app.utils import path_utils
 
-def hook(hook_name: str, priority: int = 10):
-    """动作钩子装饰器"""
+_MISSING = object()
+
+# 静态资源的放置位置与主题模板插槽的对应关系（也可以直接写插槽名）
+ASSET_PLACEMENTS = {'head': 'head_assets', 'body': 'scripts_assets'}
+# 资源类型对应的预加载类型（Link: rel=preload; as=...）
+ASSET_PRELOAD_TYPES = {'css': 'style', 'js': 'script'}
+# 内联片段提取出的文件地址：/static/snippets/<插件>.<名称>.<内容哈希>.<js|css>，
+# 合并后的文件为 /static/snippets/bundle.<哈希1>-<哈希2>....<js|css>
+SNIPPET_URL_PREFIX = '/static/snippets/'
+SNIPPET_MIMETYPES = {'js': 'text/javascript', 'css': 'text/css'}
+
+def hook(hook_name: str, priority: int = 10, async_: bool = False):
+    """动作钩子装饰器（async_=True 时在后台线程中执行，见 register_hook 的 mode 参数）"""
     def decorator(func):
         func._hook_info = {
             'type': 'action',
             'name': hook_name,
-            'priority': priority
+            'priority': priority,
+            'mode': 'async' if async_ else 'sync'
         }
         return func
     return decorator
@@ -34,20 +65,185 @@ def filter(filter_name: str, priority: int = 10):
         return func
     return decorator
 
+def _normalize_cache_policy(cache, plugin_name: str = None) -> dict:
+    """
+    规范化模板钩子的缓存策略
+
+    cache 可以是整数（TTL 秒数），也可以是字典：
+        ttl: 有效期（秒），默认 300
+        vary_by: 区分缓存的请求维度，如 ['path', 'auth', 'args:page']，也可以是接受无参调用的函数
+        tags: 失效标签，调用 plugin_manager.invalidate_template_cache(tag) 即可清除
+        models: 模型类列表，这些模型的数据经会话提交发生变化时自动失效
+    插件的配置（set_config/remove_config）变化时，该插件的缓存也会自动失效。
+    """
+    if isinstance(cache, (int, float)):
+        cache = {'ttl': cache}
+    policy = {
+        'ttl': cache.get('ttl', 300),
+        'vary_by': tuple(cache.get('vary_by') or ()),
+        'tags': set(cache.get('tags') or ()),
+    }
+    if plugin_name:
+        policy['tags'].add(f'plugin:{plugin_name}')
+    for model in cache.get('models') or ():
+        policy['tags'].add(f'model:{model.__tablename__}')
+    policy['tags'] = tuple(sorted(policy['tags']))
+    return policy
+
+def _render_asset_tag(kind: str, url: str, attrs: dict) -> str:
+    """预先渲染资源标签；属性值为 True 时输出为布尔属性"""
+    parts = []
+    for name, value in attrs.items():
+        if value is True:
+            parts.append(f' {name}')
+        elif value not in (None, False):
+            parts.append(f' {name}="{escape(value)}"')
+    extra = ''.join(parts)
+    if kind == 'css':
+        return f'<link rel="stylesheet" href="{escape(url)}"{extra}>'
+    return f'<script src="{escape(url)}"{extra}></script>'
+
+def _vary_value(dimension):
+    """计算缓存键中单个请求维度的取值"""
+    if callable(dimension):
+        return dimension()
+    if not has_request_context():
+        return None
+    if dimension == 'path':
+        return request.path
+    if dimension == 'full_path':
+        return request.full_path
+    if dimension == 'endpoint':
+        return request.endpoint
+    if dimension in ('user', 'auth'):
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return None
+        return current_user.get_id() if dimension == 'user' else True
+    if dimension == 'lang':
+        return request.accept_languages.best
+    if dimension.startswith('args:'):
+        return request.args.get(dimension[5:])
+    if dimension.startswith('cookie:'):
+        return request.cookies.get(dimension[7:])
+    raise ValueError(f"未知的缓存维度: {dimension}")
+
+def _truncating(callback: Callable, accepted_args: int) -> Callable:
+    """只把前 accepted_args 个位置参数传给回调（调用方传入的参数多于回调可接受的数量时使用）"""
+    def truncated(*args, **kwargs):
+        return callback(*args[:accepted_args], **kwargs)
+    return truncated
+
+class TemplateHookOutputs(MutableMapping):
+    """
+    按需求值的模板钩子输出映射（模板上下文中的 plugin_hooks）
+
+    模板读取 plugin_hooks.xxx 时才执行对应的模板钩子，结果在本对象内缓存，
+    因此同一请求中每个模板钩子至多执行一次，模板没用到的钩子不会执行。
+    也可以像普通字典一样写入（如过滤器向 post_meta 追加内容）。
+    """
+
+    def __init__(self, manager: 'PluginManager'):
+        self._manager = manager
+        self._values = {}
+
+    def __getitem__(self, hook_name):
+        try:
+            return self._values[hook_name]
+        except KeyError:
+            value = self._values[hook_name] = self._manager.get_template_hooks(hook_name)
+            return value
+
+    def __setitem__(self, hook_name, value):
+        self._values[hook_name] = value
+
+    def __delitem__(self, hook_name):
+        del self._values[hook_name]
+
+    def __contains__(self, hook_name):
+        return hook_name in self._values or bool(self._manager.has_template_hooks(hook_name))
+
+    def _names(self):
+        names = dict.fromkeys(self._values)
+        names.update(dict.fromkeys(self._manager.template_hook_names()))
+        return names
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f'<TemplateHookOutputs evaluated={list(self._values)}>'
+
 class PluginManager:
     """插件管理器"""
     
     def __init__(self):
         self.app = None
-        self.hooks = {}  # 钩子注册表 {hook_name: [hook_info, ...]}
-        self.plugins = {}  # 已加载的插件 {plugin_name: plugin_instance}
-        self.plugin_modules = {}  # 插件模块 {plugin_name: module}
+        # 运行时注册表均为只读快照：写入方在副本上修改，完成后整体替换引用（见 _mutate_registry），
+        # 读取方（请求线程）无需加锁，也不会遍历到修改了一半的数据
+        self.hooks = MappingProxyType({})  # 钩子注册表 {hook_name: (hook_info, ...)}
+        # 预编译的分发表 {(hook_type, hook_name): ((callback, accepted_args, plugin_name, breaker_key), ...)}，
+        # 元组已按优先级排好序，注册变化时整体作废，调用时按需重建
+        self._dispatch = {}
+        # 按调用参数个数预绑定的分发表，分发循环直接使用：
+        # 动作、过滤器为 {hook_name: {参数个数: ((callable, plugin_name, breaker_key), ...)}}；
+        # 模板钩子没有参数，为 {hook_name: ((callable, plugin_name, breaker_key), ...)}
+        self._actions = {}
+        self._filters = {}
+        self._template_hooks = {}
+        self._dispatch_version = 0
+        # 有动作钩子、过滤器的名称，没有钩子的名称在分发时直接返回
+        self._action_names = frozenset()
+        self._filter_names = frozenset()
+        # 声明了缓存策略的模板钩子输出（跨请求共享），以及各失效标签的代标记
+        self._template_cache = LRUCache(maxsize=1024)
+        self._cache_tags = {}
+        self._watched_tables = set()
+        # 插件模板：共享 Jinja 环境、各插件的模板加载器、字符串模板的编译缓存
+        self._template_env = None
+        self._template_loaders = {}
+        self._compiled_templates = LRUCache(maxsize=128, ttl=0)
+        # 插件配置缓存 {plugin_name: dict}，其它 worker 修改配置后通过版本标记感知
+        self._configs = {}
+        self._config_version = GenerationCounter('plugin_config')
+        self._config_stamp = None
+        # 静态资源注册表 {url: asset}（按 URL 去重），各插槽按优先级排好序的资源元组，
+        # 以及按"插槽 + 本页生效的资源"缓存的预渲染标签
+        self._assets = {}
+        self._asset_slots = {}
+        self._asset_html = LRUCache(maxsize=256, ttl=0)
+        # 内联片段 {内容哈希: {'kind', 'content'}}，内容不变则地址不变；插件卸载后仍保留，旧页面引用的地址继续可用
+        self._snippets = {}
+        self.bundle_snippets = False
+        self.plugins = MappingProxyType({})  # 已加载的插件 {plugin_name: plugin_instance}
+        self.plugin_modules = MappingProxyType({})  # 插件模块 {plugin_name: module}
+        # 按清单延迟加载、尚未导入的插件 {plugin_name: {'path', 'prefixes', 'blueprints'}}
+        self._lazy_plugins = MappingProxyType({})
+        self.lazy_load = True
+        self._registry_lock = threading.RLock()
+        self._registry_txn = None  # 正在进行的修改（持有锁的线程独占）
         self._last_active_plugin_ids = None  # 缓存活动插件ID集合
+        # 后台增量重载：重载线程在注册表副本上加载插件，完成后整体替换
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self._reload_requested = False
         
     def init_app(self, app):
         """初始化应用"""
         self.app = app
         app.plugin_manager = self
+        hook_profiler.init_app(app)
+        hook_guard.init_app(app)
+        async_hook_runner.init_app(app)
+        self.lazy_load = os.getenv('PLUGIN_LAZY_LOAD', 'true').lower() in ('1', 'true', 'yes', 'on')
+        self.bundle_snippets = os.getenv('PLUGIN_BUNDLE_SNIPPETS', 'false').lower() in ('1', 'true', 'yes', 'on')
+        app.add_url_rule(f'{SNIPPET_URL_PREFIX}<filename>', 'plugin_snippet', self.send_snippet)
         
         # 在应用上下文中初始化插件
         with app.app_context():
@@ -58,6 +254,17 @@ class PluginManager:
         @app.before_request
         def _sync_plugin_state():
             self.ensure_synced()
+        
+        # 延迟加载的插件：首次访问其蓝图路径或生成其 URL 时导入
+        @app.before_request
+        def _load_lazy_routes():
+            self._load_lazy_route()
+        app.url_build_error_handlers.append(self._build_lazy_url)
+        
+        # 模型数据变化时让依赖它的模板钩子缓存失效
+        event.listen(Session, 'after_flush', self._collect_changed_tables)
+        event.listen(Session, 'after_commit', self._invalidate_changed_tables)
+        event.listen(Session, 'after_rollback', self._discard_changed_tables)
     
     def discover_plugins(self):
         """发现插件，注册到数据库（不激活、不加载）"""
@@ -67,54 +274,294 @@ class PluginManager:
             os.makedirs(plugins_dir)
             return
 
-        for plugin_name in os.listdir(plugins_dir):
-            plugin_path = os.path.join(plugins_dir, plugin_name)
-
-            if not os.path.isdir(plugin_path):
-                continue
-
-            if Plugin.query.filter_by(name=plugin_name).first():
-                continue
-
-            config_file = os.path.join(plugin_path, 'plugin.json')
-            if not os.path.exists(config_file):
-                continue
+        # 一次查询取得已注册的插件名，只读取新目录的 plugin.json（解析结果按 mtime/大小缓存）
+        known = {name for name, in db.session.query(Plugin.name).all()}
+        found = discovery_cache.scan(plugins_dir, 'plugin.json', skip=known)
+        discovery_cache.save()
+        if not found:
+            return
 
-            try:
-                self._register_plugin(plugin_name, plugin_path)
+        # 新插件在同一个事务中写入
+        try:
+            db.session.add_all([
+                self._build_plugin_record(plugin_name, plugin_path, config)
+                for plugin_name, (plugin_path, config) in found.items()
+            ])
+            db.session.commit()
+            for plugin_name in found:
                 current_app.logger.info(f"找到新插件 {plugin_name} ，已自动注册到数据库")
-            except Exception as exc:
-                current_app.logger.error(f"自动注册插件 {plugin_name} 失败: {exc}")
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"自动注册插件 {', '.join(found)} 失败: {exc}")
 
     def reload_runtime_state(self):
         """Unload all in-memory plugin state and reload currently active plugins."""
-        # 清理钩子和已加载插件，避免重复注册
-        self.hooks.clear()
-        self.plugins.clear()
-        self.plugin_modules.clear()
-        self._last_active_plugin_ids = None
+        with self._mutate_registry() as registry:
+            # 清理钩子和已加载插件，避免重复注册
+            self._clear_plugin_hooks()
+            registry['plugins'].clear()
+            registry['plugin_modules'].clear()
+            registry['lazy'].clear()
+            self._last_active_plugin_ids = None
 
-        # 重新加载激活的插件列表
-        self.load_active_plugins()
+            # 重新加载激活的插件列表
+            self.load_active_plugins()
 
     def ensure_synced(self):
-        """确保内存中的插件状态与数据库一致（用于多 worker 同步）"""
+        """
+        确保内存中的插件状态与数据库一致（用于多 worker 同步）
+
+        只比对活动插件 ID 集合；发生变化时在后台线程中增量重载，
+        当前请求继续使用原有钩子表，不承担导入插件的耗时。重载完成前到达的请求只会再请求一轮重载
+        （已加载的插件会被跳过）。
+        """
         try:
-            # 获取当前数据库中活动插件的 ID 集合
-            active_plugins = Plugin.query.filter_by(is_active=True).all()
-            current_ids = frozenset(p.id for p in active_plugins)
-            
-            # 如果活动插件列表变化了，则重新加载
-            if current_ids != self._last_active_plugin_ids:
-                self.hooks.clear()
-                self.plugins.clear()
-                self.plugin_modules.clear()
-                self.load_active_plugins()
-                self._last_active_plugin_ids = current_ids
+            current_ids = frozenset(
+                plugin_id for plugin_id, in db.session.query(Plugin.id).filter_by(is_active=True).all()
+            )
         except Exception:
             # 在数据库未初始化等异常情况下忽略
-            pass
+            return
+        if current_ids != self._last_active_plugin_ids:
+            # 集合由重载成功后的 sync_active_plugins 记录，重载失败时下一个请求会再次触发
+            self._schedule_reload()
+
+    def _schedule_reload(self):
+        """请求一次后台增量重载；重载进行中再次请求时，结束后会再执行一轮"""
+        with self._reload_lock:
+            self._reload_requested = True
+            if self._reload_thread is not None:
+                return
+            self._reload_thread = threading.Thread(
+                target=self._reload_worker, name='plugin-reload', daemon=True
+            )
+            self._reload_thread.start()
+
+    def _reload_worker(self):
+        while True:
+            with self._reload_lock:
+                if not self._reload_requested:
+                    self._reload_thread = None
+                    return
+                self._reload_requested = False
+            with self.app.app_context():
+                try:
+                    self.sync_active_plugins()
+                except Exception as e:
+                    current_app.logger.error(f"增量重载插件失败: {e}")
+                finally:
+                    db.session.remove()
+
+    def wait_for_reload(self, timeout: float = None):
+        """等待后台重载完成（命令行和测试中使用）"""
+        thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    @contextmanager
+    def _mutate_registry(self):
+        """
+        修改运行时注册表（hooks、plugins、plugin_modules 以及延迟加载的插件）
+
+        在可变副本上修改，退出时把三者换成新的只读快照（单次引用赋值）；
+        同一线程内嵌套调用共用同一份副本，因此加载多个插件只发布一次。
+        其它线程的写入会等待当前修改完成，读取方始终看到完整的旧快照或新快照。
+        """
+        with self._registry_lock:
+            registry = self._registry_txn
+            if registry is not None:
+                yield registry
+                return
+            registry = self._registry_txn = {
+                'hooks': {hook_name: list(hook_list) for hook_name, hook_list in self.hooks.items()},
+                'plugins': dict(self.plugins),
+                'plugin_modules': dict(self.plugin_modules),
+                'lazy': dict(self._lazy_plugins),
+            }
+            try:
+                yield registry
+            finally:
+                self._registry_txn = None
+                self.hooks = MappingProxyType({
+                    hook_name: tuple(hook_list) for hook_name, hook_list in registry['hooks'].items() if hook_list
+                })
+                self.plugins = MappingProxyType(registry['plugins'])
+                self.plugin_modules = MappingProxyType(registry['plugin_modules'])
+                self._lazy_plugins = MappingProxyType(registry['lazy'])
+                self._invalidate_dispatch()
+
+    @staticmethod
+    def _drop_plugin_hooks(registry: dict, plugin_names):
+        for hook_name, hook_list in registry['hooks'].items():
+            registry['hooks'][hook_name] = [
+                hook for hook in hook_list if hook.get('plugin_name') not in plugin_names
+            ]
+
+    def sync_active_plugins(self):
+        """
+        按插件名比对差异：只加载新激活的插件、卸载已停用的插件，未变化的插件及其模块保持不动
+
+        比对和加载都在注册表锁内进行，与管理后台的激活、停用互斥；全部完成后才记录已同步的活动插件 ID 集合。
+        """
+        active_plugins = Plugin.query.filter_by(is_active=True).all()
+        active_names = {plugin.name for plugin in active_plugins}
+
+        with self._mutate_registry() as registry:
+            loaded = {**registry['plugins'], **registry['lazy']}
+            removed = [name for name in loaded if name not in active_names]
+            added = [plugin for plugin in active_plugins if plugin.name not in loaded]
+            if removed:
+                self._drop_plugin_hooks(registry, removed)
+                for name in removed:
+                    registry['plugins'].pop(name, None)
+                    registry['plugin_modules'].pop(name, None)
+                    registry['lazy'].pop(name, None)
+            for plugin in added:
+                try:
+                    self._load_plugin(plugin)
+                except Exception as e:
+                    current_app.logger.error(f"加载插件 {plugin.name} 失败: {e}")
+
+        for name in removed:
+            self._remove_assets(lambda asset, name=name: asset['plugin_name'] == name)
+            hook_guard.reset(name)
+            current_app.logger.info(f"插件 {name} 已停用，已从内存中卸载")
+
+        self._last_active_plugin_ids = frozenset(plugin.id for plugin in active_plugins)
     
+    def _clear_plugin_hooks(self):
+        """清理插件注册的钩子，保留核心服务（无插件名）注册的钩子"""
+        with self._mutate_registry() as registry:
+            for hook_name, hook_list in registry['hooks'].items():
+                registry['hooks'][hook_name] = [hook for hook in hook_list if not hook.get('plugin_name')]
+        self._remove_assets(lambda asset: asset['plugin_name'])
+        self._template_cache.clear()
+
+    @property
+    def registry_version(self) -> int:
+        """注册表（钩子、插件、静态资源）每发布一次新快照递增，依赖插件集合的缓存据此判断是否过期"""
+        return self._dispatch_version
+
+    def _invalidate_dispatch(self):
+        """钩子注册发生变化，作废全部分发表（下次调用时重建）；总在注册表锁内调用"""
+        self._dispatch_version += 1
+        self._dispatch = {}
+        self._actions = {}
+        self._filters = {}
+        self._template_hooks = {}
+        types = {hook_name: {hook_info.get('type', 'action') for hook_info in hook_list}
+                 for hook_name, hook_list in self.hooks.items()}
+        self._action_names = frozenset(hook_name for hook_name, kinds in types.items() if 'action' in kinds)
+        self._filter_names = frozenset(hook_name for hook_name, kinds in types.items() if 'filter' in kinds)
+
+    def _add_hook(self, hook_name: str, hook_info: dict):
+        """按优先级插入钩子；同优先级保持注册顺序，无需整表重排"""
+        with self._mutate_registry() as registry:
+            hooks = registry['hooks'].setdefault(hook_name, [])
+            position = bisect_right([hook['priority'] for hook in hooks], hook_info['priority'])
+            hooks.insert(position, hook_info)
+
+    @contextmanager
+    def _dispatch_write(self, version: int):
+        """
+        写入分发表缓存：在注册表锁内检查构建开始时的版本，与 _invalidate_dispatch 互斥，
+        旧注册表构建出的分发表不会写进新版本的缓存。锁被占用（正在加载插件）时不等待，本次不缓存。
+        """
+        if not self._registry_lock.acquire(blocking=False):
+            yield False
+            return
+        try:
+            yield version == self._dispatch_version
+        finally:
+            self._registry_lock.release()
+
+    def _build_dispatch(self, hook_name: str, hook_type: str) -> Tuple:
+        """
+        构建 (钩子名, 类型) 的分发表：按优先级排序，参数个数已预先计算的不可变元组
+
+        每项的回调已绑定好需要的包装层（缓存、时限、异步），没有声明这些的钩子直接存放原始回调；
+        没有时限的插件钩子带上熔断键，有失败记录时由 hook_guard.guard 按熔断状态改写分发表。
+        """
+        version = self._dispatch_version
+        entries = []
+        if hook_type == 'template' and hook_name in self._asset_slots:
+            # 注册表中的静态资源作为该插槽的第一项输出
+            entries.append((partial(self.render_assets, hook_name), 0, 'assets', None))
+        for hook_info in self.hooks.get(hook_name, ()):
+            if hook_info.get('type', 'action') != hook_type:
+                continue
+            callback = hook_info['callback']
+            accepted_args = hook_info['accepted_args']
+            if hook_type == 'filter':
+                # 第一个参数是值，其余为附加参数
+                accepted_args = max(accepted_args - 1, 0)
+            elif hook_info.get('cache'):
+                callback = self._cached_template_callback(hook_name, hook_info)
+            breaker_key = None
+            if hook_info.get('plugin_name'):
+                # 插件钩子受熔断保护，核心服务的钩子不受影响；设置了时限的才需要包装（计时、线程池）
+                if hook_guard.budget(hook_info.get('timeout')) > 0:
+                    callback = hook_guard.wrap(
+                        callback, hook_info['plugin_name'], hook_name, hook_type, hook_info.get('timeout')
+                    )
+                else:
+                    breaker_key = (hook_info['plugin_name'], hook_name)
+            if hook_type == 'action' and hook_info.get('mode') == 'async':
+                # 异步钩子的成败在后台线程中才知道，熔断交给执行器处理，分发循环不再按入队结果记录
+                callback = async_hook_runner.wrap(callback, hook_info.get('plugin_name'), hook_name, breaker_key)
+                breaker_key = None
+            entries.append((callback, accepted_args, hook_info.get('plugin_name') or 'unknown', breaker_key))
+        table = tuple(entries)
+
+        # 构建期间注册表又发生变化时不写入，避免缓存过期的分发表
+        with self._dispatch_write(version) as current:
+            if current:
+                self._dispatch[hook_type, hook_name] = table
+        return table
+
+    def _bind_dispatch(self, hook_name: str, hook_type: str, nargs: int = 0) -> Tuple:
+        """
+        按本次调用的位置参数个数绑定分发表 ((callable, plugin_name, breaker_key), ...)
+
+        可接受的参数少于 nargs 的回调换成截断参数的版本，其余直接存放原回调，
+        分发循环原样传参，不再逐项切片。
+        """
+        version = self._dispatch_version
+        table = self._dispatch.get((hook_type, hook_name))
+        if table is None:
+            table = self._build_dispatch(hook_name, hook_type)
+        # 过滤器的第一个位置参数是值
+        offset = 1 if hook_type == 'filter' else 0
+        bound = tuple(
+            (callback if accepted_args >= nargs else _truncating(callback, accepted_args + offset),
+             plugin_name, breaker_key)
+            for callback, accepted_args, plugin_name, breaker_key in table
+        )
+        with self._dispatch_write(version) as current:
+            if current and hook_type == 'template':
+                self._template_hooks[hook_name] = bound
+            elif current:
+                tables = self._actions if hook_type == 'action' else self._filters
+                tables[hook_name] = {**tables.get(hook_name, {}), nargs: bound}
+        return bound
+
+    @staticmethod
+    def _build_plugin_record(plugin_name: str, plugin_path: str, config: dict) -> Plugin:
+        """根据 plugin.json 的内容创建插件记录（不提交）"""
+        return Plugin(
+            name=plugin_name,
+            display_name=config.get('display_name', plugin_name),
+            description=config.get('description', ''),
+            version=config.get('version', '1.0.0'),
+            author=config.get('author', ''),
+            author_website=config.get('author_website', ''),
+            license=config.get('license', ''),
+            min_noteblog_version=config.get('min_noteblog_version', ''),
+            max_noteblog_version=config.get('max_noteblog_version', ''),
+            install_path=plugin_path,
+            is_system=config.get('is_system', False)
+        )
+
     def _register_plugin(self, plugin_name: str, plugin_path: str):
         """注册插件到数据库"""
         # 检查插件是否已注册
@@ -123,31 +570,12 @@ class PluginManager:
             return
         
         # 读取插件配置文件
-        config_file = os.path.join(plugin_path, 'plugin.json')
-        if not os.path.exists(config_file):
+        config = discovery_cache.load(os.path.join(plugin_path, 'plugin.json'))
+        if config is None:
             return
         
         try:
-            import json
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
-            # 创建插件记录
-            plugin = Plugin(
-                name=plugin_name,
-                display_name=config.get('display_name', plugin_name),
-                description=config.get('description', ''),
-                version=config.get('version', '1.0.0'),
-                author=config.get('author', ''),
-                author_website=config.get('author_website', ''),
-                license=config.get('license', ''),
-                min_noteblog_version=config.get('min_noteblog_version', ''),
-                max_noteblog_version=config.get('max_noteblog_version', ''),
-                install_path=plugin_path,
-                is_system=config.get('is_system', False)
-            )
-            
-            db.session.add(plugin)
+            db.session.add(self._build_plugin_record(plugin_name, plugin_path, config))
             db.session.commit()
             
         except Exception as e:
@@ -158,87 +586,210 @@ class PluginManager:
         """加载激活的插件"""
         active_plugins = Plugin.query.filter_by(is_active=True).all()
         
+        # 一次查询载入全部插件配置，插件运行期间读取配置不再访问数据库
+        self._load_configs()
+        
+        # 全部插件加载完成后一次性发布注册表
+        with self._mutate_registry():
+            for plugin in active_plugins:
+                try:
+                    self._load_plugin(plugin)
+                except Exception as e:
+                    current_app.logger.error(f"加载插件 {plugin.name} 失败: {e}")
+        
         # 记录当前活动插件的 ID 集合
         self._last_active_plugin_ids = frozenset(p.id for p in active_plugins)
-        
-        for plugin in active_plugins:
-            try:
-                self._load_plugin(plugin)
-            except Exception as e:
-                current_app.logger.error(f"加载插件 {plugin.name} 失败: {e}")
     
-    def _load_plugin(self, plugin: Plugin):
-        """加载单个插件"""
+    def _load_plugin(self, plugin: Plugin) -> bool:
+        """
+        加载单个插件（清单中声明了 lazy 的插件只注册占位钩子，首次使用时再导入）
+
+        在注册表锁内执行，已加载（或已注册为延迟加载）的插件直接跳过：管理后台激活插件与后台重载线程
+        同时加载同一插件时，钩子、路由和资源不会注册两次。返回本次是否加载了插件。
+        """
         plugin_path = plugin.install_path
         
         # 确保插件路径存在
         if not os.path.exists(plugin_path):
             current_app.logger.error(f"插件路径不存在: {plugin_path}")
-            return
+            return False
         
-        # 导入插件模块
-        module_name = plugin.name
-        try:
-            # 使用插件目录作为包路径进行导入
-            # 这样可以正确处理相对导入
-            plugins_dir = path_utils.project_path('plugins')
-            if plugins_dir not in sys.path:
-                sys.path.insert(0, plugins_dir)
+        with self._mutate_registry() as registry:
+            if plugin.name in registry['plugins'] or plugin.name in registry['lazy']:
+                return False
+            
+            if self.lazy_load:
+                manifest = discovery_cache.load(os.path.join(plugin_path, 'plugin.json')) or {}
+                if isinstance(manifest.get('lazy'), dict):
+                    self._register_lazy_plugin(plugin.name, plugin_path, manifest['lazy'])
+                    return True
             
+            return self._import_plugin(plugin.name, plugin_path)
+    
+    def _import_plugin(self, plugin_name: str, plugin_path: str) -> bool:
+        """
+        导入插件模块、实例化插件类并注册钩子和蓝图，返回是否成功
+
+        整个导入在注册表锁内进行，插件已加载时直接返回，同一插件的模块不会被执行两次。
+        """
+        with self._mutate_registry() as registry:
+            if plugin_name in registry['plugins']:
+                return False
             # 导入插件模块
-            spec = importlib.util.spec_from_file_location(
-                module_name, 
-                os.path.join(plugin_path, '__init__.py')
-            )
+            module_name = plugin_name
+            try:
+                # 使用插件目录作为包路径进行导入
+                # 这样可以正确处理相对导入
+                plugins_dir = path_utils.project_path('plugins')
+                if plugins_dir not in sys.path:
+                    sys.path.insert(0, plugins_dir)
+
+                # 导入插件模块
+                spec = importlib.util.spec_from_file_location(
+                    module_name, 
+                    os.path.join(plugin_path, '__init__.py')
+                )
+                if spec is None:
+                    current_app.logger.error(f"无法为插件 {plugin_name} 创建模块规范")
+                    return False
+
+                module = importlib.util.module_from_spec(spec)
+
+                # 设置模块的 __package__ 属性以支持相对导入
+                module.__package__ = module_name
+
+                spec.loader.exec_module(module)
+
+                # 查找插件类
+                plugin_class = None
+                for name, obj in inspect.getmembers(module):
+                    if (inspect.isclass(obj) and 
+                        hasattr(obj, '__module__') and 
+                        obj.__module__ == module_name and
+                        name != 'PluginBase'):
+                        plugin_class = obj
+                        break
+
+                if plugin_class:
+                    # 实例化插件，钩子注册完成后与模块一起发布
+                    plugin_instance = plugin_class()
+                    registry['plugin_modules'][plugin_name] = module
+                    registry['plugins'][plugin_name] = plugin_instance
+
+                    # 自动注册通过装饰器定义的钩子
+                    self._register_decorated_hooks(plugin_instance)
+
+                    # 调用插件的 register_hooks 方法（如果存在）
+                    if hasattr(plugin_instance, 'register_hooks') and callable(plugin_instance.register_hooks):
+                        try:
+                            plugin_instance.register_hooks()
+                            current_app.logger.info(f"插件 {plugin_name} 钩子注册成功")
+                        except Exception as hook_error:
+                            current_app.logger.error(f"插件 {plugin_name} 注册钩子失败: {hook_error}")
+
+                    # 注册插件的蓝图
+                    self._register_plugin_blueprints(module, plugin_name)
+
+                    current_app.logger.info(f"插件 {plugin_name} 加载成功")
+                    return True
+                current_app.logger.warning(f"插件 {plugin_name} 中未找到插件类")
+                return False
+
+            except Exception as e:
+                current_app.logger.error(f"导入插件 {plugin_name} 失败: {e}")
+                import traceback
+                current_app.logger.error(f"详细错误信息: {traceback.format_exc()}")
+                return False
+
+    # -------- 延迟加载 --------
+    def _register_lazy_plugin(self, plugin_name: str, plugin_path: str, lazy: dict):
+        """
+        按清单的 lazy 声明注册占位钩子，不导入插件模块
+
+        lazy 中可声明 hooks、filters、template_hooks（钩子名，或含 name/priority/accepted_args 的字典）
+        以及 blueprints（含 name 和 url_prefix）。占位钩子第一次被调用、请求路径落在声明的前缀下、
+        或生成该蓝图的 URL 时导入插件，之后由插件自己注册的钩子替换占位钩子。
+        """
+        blueprints = [bp for bp in lazy.get('blueprints') or () if isinstance(bp, dict)]
+        spec = {
+            'path': plugin_path,
+            'prefixes': tuple(bp['url_prefix'].rstrip('/') for bp in blueprints if bp.get('url_prefix')),
+            'blueprints': tuple(bp['name'] for bp in blueprints if bp.get('name')),
+        }
+        count = 0
+        with self._mutate_registry() as registry:
+            registry['lazy'][plugin_name] = spec
+            for hook_type, key in (('action', 'hooks'), ('filter', 'filters'), ('template', 'template_hooks')):
+                for declared in lazy.get(key) or ():
+                    if isinstance(declared, str):
+                        declared = {'name': declared}
+                    hook_name = declared['name']
+                    self._add_hook(hook_name, {
+                        'callback': self._lazy_callback(plugin_name, hook_name, hook_type, declared.get('callback')),
+                        'priority': declared.get('priority', 10),
+                        'accepted_args': 0 if hook_type == 'template' else declared.get('accepted_args', 1),
+                        'plugin_name': plugin_name,
+                        'type': hook_type,
+                        'lazy': True,
+                    })
+                    count += 1
+        current_app.logger.info(f"插件 {plugin_name} 已按清单延迟加载（{count} 个占位钩子，首次使用时导入）")
+
+    def _lazy_callback(self, plugin_name: str, hook_name: str, hook_type: str, callback_name: str = None) -> Callable:
+        """占位钩子：导入插件后把本次调用转交给插件为该钩子注册的真实回调"""
+        def lazy_callback(*args, **kwargs):
+            self._materialize(plugin_name)
+            if plugin_name in self.plugins:
+                table = self._build_dispatch(hook_name, hook_type)
+                entries = [(callback, extra_args) for callback, extra_args, name, _ in table if name == plugin_name]
+            else:
+                # 导入失败，或在尚未发布的注册表修改中被调用：本次不执行
+                entries = ()
+            if hook_type == 'filter':
+                value, rest = args[0], args[1:]
+                for callback, extra_args in entries:
+                    value = callback(value, *rest[:extra_args], **kwargs)
+                return value
+            if hook_type == 'template':
+                return ''.join(str(result) for result in (callback() for callback, _ in entries) if result)
+            for callback, accepted_args in entries:
+                callback(*args[:accepted_args], **kwargs)
+        lazy_callback.__name__ = callback_name or hook_name
+        return lazy_callback
+
+    def _materialize(self, plugin_name: str) -> bool:
+        """导入延迟加载的插件（并发调用时只导入一次），返回本次是否执行了导入"""
+        if plugin_name not in self._lazy_plugins:
+            return False
+        with self._mutate_registry() as registry:
+            spec = registry['lazy'].pop(plugin_name, None)
             if spec is None:
-                current_app.logger.error(f"无法为插件 {plugin.name} 创建模块规范")
+                # 其它线程已完成导入
+                return False
+            self._drop_plugin_hooks(registry, (plugin_name,))
+            current_app.logger.info(f"插件 {plugin_name} 首次使用，导入模块")
+            self._import_plugin(plugin_name, spec['path'])
+        return True
+
+    def _load_lazy_route(self):
+        """请求未匹配到路由且路径落在延迟加载插件的蓝图前缀下时，导入插件并重新匹配"""
+        if not self._lazy_plugins or request.url_rule is not None:
+            return
+        path = request.path
+        for plugin_name, spec in self._lazy_plugins.items():
+            if any(path == prefix or path.startswith(prefix + '/') for prefix in spec['prefixes']):
+                if self._materialize(plugin_name):
+                    request.routing_exception = None
+                    request_ctx.match_request()
                 return
-                
-            module = importlib.util.module_from_spec(spec)
-            
-            # 设置模块的 __package__ 属性以支持相对导入
-            module.__package__ = module_name
-            
-            spec.loader.exec_module(module)
-            self.plugin_modules[plugin.name] = module
-            
-            # 查找插件类
-            plugin_class = None
-            for name, obj in inspect.getmembers(module):
-                if (inspect.isclass(obj) and 
-                    hasattr(obj, '__module__') and 
-                    obj.__module__ == module_name and
-                    name != 'PluginBase'):
-                    plugin_class = obj
-                    break
-            
-            if plugin_class:
-                # 实例化插件
-                plugin_instance = plugin_class()
-                self.plugins[plugin.name] = plugin_instance
-                
-                # 自动注册通过装饰器定义的钩子
-                self._register_decorated_hooks(plugin_instance)
-                
-                # 调用插件的 register_hooks 方法（如果存在）
-                if hasattr(plugin_instance, 'register_hooks') and callable(plugin_instance.register_hooks):
-                    try:
-                        plugin_instance.register_hooks()
-                        current_app.logger.info(f"插件 {plugin.name} 钩子注册成功")
-                    except Exception as hook_error:
-                        current_app.logger.error(f"插件 {plugin.name} 注册钩子失败: {hook_error}")
-                
-                # 注册插件的蓝图
-                self._register_plugin_blueprints(module, plugin.name)
-                
-                current_app.logger.info(f"插件 {plugin.name} 加载成功")
-            else:
-                current_app.logger.warning(f"插件 {plugin.name} 中未找到插件类")
-                
-        except Exception as e:
-            current_app.logger.error(f"导入插件 {plugin.name} 失败: {e}")
-            import traceback
-            current_app.logger.error(f"详细错误信息: {traceback.format_exc()}")
+
+    def _build_lazy_url(self, error, endpoint: str, values: dict):
+        """url_for 找不到端点时：端点属于延迟加载插件的蓝图则导入插件后重新生成"""
+        blueprint = endpoint.rpartition('.')[0]
+        for plugin_name, spec in self._lazy_plugins.items():
+            if blueprint in spec['blueprints'] and self._materialize(plugin_name):
+                return url_for(endpoint, **values)
+        return None
 
     def _register_decorated_hooks(self, plugin_instance):
         """自动注册插件实例中通过装饰器定义的钩子"""
@@ -255,7 +806,8 @@ class PluginManager:
                 accepted_args = len(sig.parameters)
                 
                 if hook_type == 'action':
-                    self.register_hook(hook_name, method, priority, accepted_args, plugin_name)
+                    self.register_hook(hook_name, method, priority, accepted_args, plugin_name,
+                                       mode=info.get('mode', 'sync'))
                 elif hook_type == 'filter':
                     self.register_filter(hook_name, method, priority, accepted_args, plugin_name)
     
@@ -330,45 +882,29 @@ class PluginManager:
     
     def register_hook(self, hook_name: str, callback: Callable, 
                      priority: int = 10, accepted_args: int = 1, 
-                     plugin_name: str = None):
-        """注册钩子"""
-        if hook_name not in self.hooks:
-            self.hooks[hook_name] = []
+                     plugin_name: str = None, mode: str = 'sync'):
+        """
+        注册钩子（只在内存中注册，数据库记录由 sync_hook_records 在激活时同步）
         
+        Args:
+            mode: 'sync' 在触发处同步执行；'async' 放入后台队列执行，不阻塞请求
+                  （参数为快照，回调中读取的模型实例来自工作线程自己的会话）
+        """
         hook_info = {
             'callback': callback,
             'priority': priority,
             'accepted_args': accepted_args,
-            'plugin_name': plugin_name
+            'plugin_name': plugin_name,
+            'type': 'action',
+            'mode': mode
         }
         
-        self.hooks[hook_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[hook_name].sort(key=lambda x: x['priority'])
-        
-        # 如果有插件名，保存到数据库
-        if plugin_name:
-            plugin = Plugin.query.filter_by(name=plugin_name).first()
-            if plugin:
-                hook = PluginHook(
-                    plugin_id=plugin.id,
-                    hook_name=hook_name,
-                    hook_type='action',  # 默认为 action 类型
-                    callback_function=callback.__name__,
-                    priority=priority,
-                    accepted_args=accepted_args
-                )
-                db.session.add(hook)
-                db.session.commit()
+        self._add_hook(hook_name, hook_info)
     
     def register_filter(self, filter_name: str, callback: Callable,
                        priority: int = 10, accepted_args: int = 1,
                        plugin_name: str = None):
         """注册过滤器"""
-        if filter_name not in self.hooks:
-            self.hooks[filter_name] = []
-        
         hook_info = {
             'callback': callback,
             'priority': priority,
@@ -377,32 +913,19 @@ class PluginManager:
             'type': 'filter'
         }
         
-        self.hooks[filter_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[filter_name].sort(key=lambda x: x['priority'])
-        
-        # 保存到数据库
-        if plugin_name:
-            plugin = Plugin.query.filter_by(name=plugin_name).first()
-            if plugin:
-                hook = PluginHook(
-                    plugin_id=plugin.id,
-                    hook_name=filter_name,
-                    hook_type='filter',
-                    callback_function=callback.__name__,
-                    priority=priority,
-                    accepted_args=accepted_args
-                )
-                db.session.add(hook)
-                db.session.commit()
+        self._add_hook(filter_name, hook_info)
     
     def register_template_hook(self, hook_name: str, callback: Callable,
-                              priority: int = 10, plugin_name: str = None):
-        """注册模板钩子"""
-        if hook_name not in self.hooks:
-            self.hooks[hook_name] = []
+                              priority: int = 10, plugin_name: str = None,
+                              cache=None, timeout: float = None):
+        """
+        注册模板钩子
         
+        Args:
+            cache: 可选的缓存策略（TTL 秒数或字典，见 _normalize_cache_policy）。
+                   声明后钩子输出在进程内跨请求缓存，到期、插件配置变化或相关模型变化时重新生成
+            timeout: 时间预算（秒），超时本次输出为空；默认使用 PLUGIN_HOOK_TIMEOUT，0 表示不限制
+        """
         hook_info = {
             'callback': callback,
             'priority': priority,
@@ -410,103 +933,500 @@ class PluginManager:
             'plugin_name': plugin_name,
             'type': 'template'
         }
+        if timeout is not None:
+            hook_info['timeout'] = timeout
+        if cache:
+            hook_info['cache'] = _normalize_cache_policy(cache, plugin_name)
+            self._watched_tables.update(
+                tag[6:] for tag in hook_info['cache']['tags'] if tag.startswith('model:')
+            )
         
-        self.hooks[hook_name].append(hook_info)
-        
-        # 按优先级排序
-        self.hooks[hook_name].sort(key=lambda x: x['priority'])
-        
-        # 保存到数据库
-        if plugin_name:
-            plugin = Plugin.query.filter_by(name=plugin_name).first()
-            if plugin:
-                hook = PluginHook(
-                    plugin_id=plugin.id,
-                    hook_name=hook_name,
-                    hook_type='template',
-                    callback_function=callback.__name__,
-                    priority=priority,
-                    accepted_args=0
+        self._add_hook(hook_name, hook_info)
+    
+    def sync_hook_records(self, plugin_name: str) -> bool:
+        """
+        将插件当前在内存中注册的钩子同步到 plugin_hooks 表
+
+        只在安装/激活插件时调用：与已有记录比对，删除多余的、插入缺少的，
+        在同一个事务中完成；没有变化时不写数据库。
+        """
+        plugin = Plugin.query.filter_by(name=plugin_name).first()
+        if not plugin:
+            return False
+
+        wanted = {}
+        for hook_name, hook_list in self.hooks.items():
+            for hook_info in hook_list:
+                if hook_info.get('plugin_name') != plugin_name:
+                    continue
+                callback = hook_info['callback']
+                key = (
+                    hook_name,
+                    hook_info.get('type', 'action'),
+                    getattr(callback, '__name__', type(callback).__name__),
+                    hook_info['priority'],
+                    hook_info['accepted_args'],
                 )
-                db.session.add(hook)
-                db.session.commit()
+                wanted[key] = wanted.get(key, 0) + 1
+
+        stale_ids = []
+        for record in PluginHook.query.filter_by(plugin_id=plugin.id).all():
+            key = (record.hook_name, record.hook_type, record.callback_function,
+                   record.priority, record.accepted_args)
+            if wanted.get(key):
+                wanted[key] -= 1
+            else:
+                stale_ids.append(record.id)
+        missing = [
+            {'plugin_id': plugin.id, 'hook_name': hook_name, 'hook_type': hook_type,
+             'callback_function': callback_name, 'priority': priority, 'accepted_args': accepted_args}
+            for (hook_name, hook_type, callback_name, priority, accepted_args), count in wanted.items()
+            for _ in range(count)
+        ]
+        if not stale_ids and not missing:
+            return True
+
+        try:
+            if stale_ids:
+                PluginHook.query.filter(PluginHook.id.in_(stale_ids)).delete(synchronize_session=False)
+            if missing:
+                db.session.bulk_insert_mappings(PluginHook, missing)
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"同步插件 {plugin_name} 的钩子记录失败: {e}")
+            return False
     
     def do_action(self, hook_name: str, *args, **kwargs):
         """执行动作钩子"""
-        if hook_name in self.hooks:
-            for hook_info in self.hooks[hook_name]:
-                try:
-                    callback = hook_info['callback']
-                    accepted_args = hook_info['accepted_args']
-                    
-                    # 限制参数数量
-                    if len(args) > accepted_args:
-                        args = args[:accepted_args]
-                    
-                    callback(*args, **kwargs)
-                except Exception as e:
-                    plugin_name = hook_info.get('plugin_name', 'unknown')
-                    current_app.logger.error(f"执行钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+        if hook_name not in self._action_names:
+            return
+        tables = self._actions.get(hook_name)
+        table = tables.get(len(args)) if tables else None
+        if table is None:
+            table = self._bind_dispatch(hook_name, 'action', len(args))
+        if hook_profiler.enabled and hook_profiler.sampling():
+            table = hook_profiler.instrument(table, hook_name, 'action')
+        if hook_guard.states:
+            table = hook_guard.guard(table, 'action')
+        for callback, plugin_name, breaker_key in table:
+            try:
+                callback(*args, **kwargs)
+            except Exception as e:
+                if breaker_key:
+                    hook_guard.record_failure(breaker_key, 'action', f'异常: {e}')
+                current_app.logger.error(f"执行钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
     
     def apply_filters(self, filter_name: str, value: Any, *args, **kwargs):
         """应用过滤器"""
-        if filter_name in self.hooks:
-            for hook_info in self.hooks[filter_name]:
-                if hook_info.get('type') == 'filter':
-                    try:
-                        callback = hook_info['callback']
-                        accepted_args = hook_info['accepted_args']
-                        
-                        # 限制参数数量，第一个参数是值
-                        filter_args = [value] + list(args[:accepted_args-1])
-                        value = callback(*filter_args, **kwargs)
-                    except Exception as e:
-                        plugin_name = hook_info.get('plugin_name', 'unknown')
-                        current_app.logger.error(f"应用过滤器 {filter_name} (插件: {plugin_name}) 失败: {e}")
+        if filter_name not in self._filter_names:
+            return value
+        tables = self._filters.get(filter_name)
+        table = tables.get(len(args)) if tables else None
+        if table is None:
+            table = self._bind_dispatch(filter_name, 'filter', len(args))
+        if hook_profiler.enabled and hook_profiler.sampling():
+            table = hook_profiler.instrument(table, filter_name, 'filter')
+        if hook_guard.states:
+            # 熔断中的过滤器被跳过，值原样传给下一个过滤器
+            table = hook_guard.guard(table, 'filter')
+        for callback, plugin_name, breaker_key in table:
+            try:
+                value = callback(value, *args, **kwargs)
+            except Exception as e:
+                if breaker_key:
+                    hook_guard.record_failure(breaker_key, 'filter', f'异常: {e}')
+                current_app.logger.error(f"应用过滤器 {filter_name} (插件: {plugin_name}) 失败: {e}")
         
         return value
     
     def get_template_hooks(self, hook_name: str):
         """获取模板钩子"""
+        table = self._template_hooks.get(hook_name)
+        if not table:
+            if table is not None:
+                return []
+            table = self._bind_dispatch(hook_name, 'template')
+            if not table:
+                return []
+        if hook_profiler.enabled and hook_profiler.sampling():
+            table = hook_profiler.instrument(table, hook_name, 'template')
+        if hook_guard.states:
+            # 熔断中的模板钩子输出该钩子在本页最近一次成功的结果
+            table = hook_guard.guard(table, 'template')
         hooks = []
-        if hook_name in self.hooks:
-            for hook_info in self.hooks[hook_name]:
-                if hook_info.get('type') == 'template':
-                    try:
-                        callback = hook_info['callback']
-                        result = callback()
-                        if result:
-                            hooks.append(result)
-                    except Exception as e:
-                        plugin_name = hook_info.get('plugin_name', 'unknown')
-                        current_app.logger.error(f"获取模板钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
+        for callback, plugin_name, breaker_key in table:
+            try:
+                result = callback()
+                if result:
+                    hooks.append(result)
+            except Exception as e:
+                if breaker_key:
+                    hook_guard.record_failure(breaker_key, 'template', f'异常: {e}')
+                current_app.logger.error(f"获取模板钩子 {hook_name} (插件: {plugin_name}) 失败: {e}")
         
         return hooks
     
+    # -------- 模板钩子输出缓存 --------
+    def _cache_tag_counter(self, tag: str) -> GenerationCounter:
+        counter = self._cache_tags.get(tag)
+        if counter is None:
+            counter = self._cache_tags.setdefault(tag, GenerationCounter(f'template_hook.{tag}'))
+        return counter
+
+    def _cached_template_callback(self, hook_name: str, hook_info: dict) -> Callable:
+        """把声明了缓存策略的模板钩子包装为先查缓存的回调"""
+        callback = hook_info['callback']
+        policy = hook_info['cache']
+        base_key = (hook_name, hook_info.get('plugin_name'), getattr(callback, '__qualname__', repr(callback)))
+
+        def cached_callback():
+            key = base_key + (
+                tuple(_vary_value(dimension) for dimension in policy['vary_by']),
+                tuple(self._cache_tag_counter(tag).value for tag in policy['tags']),
+            )
+            result = self._template_cache.get(key, _MISSING)
+            if result is _MISSING:
+                result = callback()
+                self._template_cache.set(key, result, ttl=policy['ttl'])
+            return result
+
+        return cached_callback
+
+    def invalidate_template_cache(self, *tags: str):
+        """使带有指定标签的模板钩子缓存失效（通过代标记通知所有 worker）"""
+        for tag in tags:
+            self._cache_tag_counter(tag).bump()
+
+    def _collect_changed_tables(self, session, flush_context):
+        if not self._watched_tables:
+            return
+        changed = session.info.setdefault('_template_cache_tables', set())
+        for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+            table_name = getattr(instance, '__tablename__', None)
+            if table_name in self._watched_tables:
+                changed.add(table_name)
+
+    def _invalidate_changed_tables(self, session):
+        changed = session.info.pop('_template_cache_tables', None)
+        if changed:
+            self.invalidate_template_cache(*(f'model:{table_name}' for table_name in changed))
+
+    def _discard_changed_tables(self, session):
+        session.info.pop('_template_cache_tables', None)
+
+    def has_template_hooks(self, hook_name: str) -> bool:
+        """是否有已注册的模板钩子或静态资源（不执行钩子）"""
+        if hook_name in self._asset_slots:
+            return True
+        return any(hook_info.get('type') == 'template' for hook_info in self.hooks.get(hook_name, ()))
+
+    def template_hook_names(self) -> List[str]:
+        """已注册模板钩子的名称"""
+        names = dict.fromkeys(self._asset_slots)
+        names.update(dict.fromkeys(name for name in list(self.hooks) if self.has_template_hooks(name)))
+        return list(names)
+
+    def get_request_template_hooks(self) -> TemplateHookOutputs:
+        """获取当前请求共享的按需求值模板钩子映射，同一请求内多次调用返回同一对象"""
+        if not has_app_context():
+            return TemplateHookOutputs(self)
+        outputs = g.get('_plugin_template_hooks')
+        if outputs is None:
+            outputs = g._plugin_template_hooks = TemplateHookOutputs(self)
+        return outputs
+
+    # -------- 静态资源注册表 --------
+    def register_css(self, url: str, plugin_name: str = None, priority: int = 10,
+                     placement: str = 'head', endpoints=None, when: Callable = None, **attrs):
+        """注册样式表，见 register_asset"""
+        self.register_asset('css', url, plugin_name, priority, placement, endpoints, when, **attrs)
+
+    def register_js(self, url: str, plugin_name: str = None, priority: int = 10,
+                    placement: str = 'body', endpoints=None, when: Callable = None, **attrs):
+        """注册脚本，见 register_asset（defer=True / async_=True 输出对应属性）"""
+        if 'async_' in attrs:
+            attrs['async'] = attrs.pop('async_')
+        self.register_asset('js', url, plugin_name, priority, placement, endpoints, when, **attrs)
+
+    def register_asset(self, kind: str, url: str, plugin_name: str = None, priority: int = 10,
+                       placement: str = 'head', endpoints=None, when: Callable = None, **attrs):
+        """
+        注册静态资源（在 register_hooks 中声明一次即可，重复注册同一 URL 只会更新原条目）
+
+        Args:
+            kind: 'css' 或 'js'
+            placement: 'head'、'body' 或主题模板插槽名
+            endpoints: 只在这些端点（如 'main.post_detail'）的页面输出，默认所有页面
+            when: 无参函数，返回假值时本次请求不输出（如插件配置中关闭了功能）
+            attrs: 附加到标签上的属性
+        """
+        href = static_assets.url(url)
+        self._add_asset({
+            'kind': kind,
+            'url': url,
+            'plugin_name': plugin_name,
+            'priority': priority,
+            'slot': ASSET_PLACEMENTS.get(placement, placement),
+            'endpoints': frozenset(endpoints) if endpoints else None,
+            'when': when,
+            'href': href,
+            'tag': _render_asset_tag(kind, href, attrs),
+        })
+
+    def register_inline_asset(self, kind: str, name: str, content: str, plugin_name: str = None,
+                              priority: int = 10, placement: str = None, endpoints=None,
+                              when: Callable = None, **attrs):
+        """
+        注册内联片段（不含 <script>/<style> 标签的 JS 或 CSS 源码）
+
+        片段不再逐页内联到 HTML 中，而是提取为地址带内容哈希的文件，页面通过 <script defer> /
+        <link> 引用，浏览器可以长期缓存。开启 PLUGIN_BUNDLE_SNIPPETS 时，同一页面、同一插槽中的
+        多个片段合并为一个文件。其余参数同 register_asset。
+        """
+        data = content.strip().encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        key = f"{plugin_name or 'core'}.{name}"
+        url = f"{SNIPPET_URL_PREFIX}{key}.{digest}.{kind}"
+        if kind == 'js':
+            attrs.setdefault('defer', True)
+        with self._registry_lock:
+            if digest not in self._snippets:
+                self._snippets = {**self._snippets, digest: {'kind': kind, 'content': data}}
+            # 同名片段内容变化后地址随之变化，替换旧条目
+            self._remove_assets(lambda asset: asset.get('snippet_key') == key and asset['url'] != url)
+            self._add_asset({
+                'kind': kind,
+                'url': url,
+                'plugin_name': plugin_name,
+                'priority': priority,
+                'slot': ASSET_PLACEMENTS.get(placement or ('head' if kind == 'css' else 'body'), placement),
+                'endpoints': frozenset(endpoints) if endpoints else None,
+                'when': when,
+                'href': url,
+                'tag': _render_asset_tag(kind, url, attrs),
+                'snippet': digest,
+                'snippet_key': key,
+            })
+
+    def _add_asset(self, asset: dict):
+        """按 URL 写入资源注册表（已有同一 URL 时替换，保留原注册顺序）"""
+        url = asset['url']
+        with self._registry_lock:
+            previous = self._assets.get(url)
+            asset['order'] = previous['order'] if previous else len(self._assets)
+            assets = dict(self._assets)
+            assets[url] = asset
+            self._set_assets(assets)
+
+    def _remove_assets(self, predicate: Callable):
+        """移除满足条件的资源"""
+        with self._registry_lock:
+            if any(predicate(asset) for asset in self._assets.values()):
+                self._set_assets({url: asset for url, asset in self._assets.items() if not predicate(asset)})
+
+    def _set_assets(self, assets: dict):
+        """替换资源注册表，重新生成各插槽的有序资源元组"""
+        slots = {}
+        for asset in sorted(assets.values(), key=lambda asset: (asset['priority'], asset['order'])):
+            slots.setdefault(asset['slot'], []).append(asset)
+        self._assets = assets
+        self._asset_slots = {slot: tuple(items) for slot, items in slots.items()}
+        self._asset_html.clear()
+        self._invalidate_dispatch()
+
+    def render_assets(self, slot: str) -> str:
+        """输出插槽中本页生效的资源标签（同一组资源只拼接一次）"""
+        assets = self._asset_slots.get(slot, ())
+        endpoint = request.endpoint if has_request_context() else None
+        active = []
+        for asset in assets:
+            if asset['endpoints'] is not None and endpoint not in asset['endpoints']:
+                continue
+            if asset['when'] is not None:
+                try:
+                    if not asset['when']():
+                        continue
+                except Exception as e:
+                    current_app.logger.error(f"判断资源 {asset['url']} 是否输出失败: {e}")
+                    continue
+            active.append(asset['url'])
+        if not active:
+            return ''
+        key = (slot, tuple(active))
+        cached = self._asset_html.get(key)
+        if cached is None:
+            tags = self._asset_tags(active)
+            cached = ('\n'.join(tag for _, _, tag in tags), tuple((kind, href) for kind, href, _ in tags))
+            self._asset_html.set(key, cached)
+        html, links = cached
+        for kind, href in links:
+            resource_hints.add(href, ASSET_PRELOAD_TYPES[kind])
+        return html
+
+    def _asset_tags(self, urls: List[str]) -> List[tuple]:
+        """资源标签 [(类型, 地址, 标签)]；开启合并时同类片段合并为一个文件，放在第一个片段的位置"""
+        if not self.bundle_snippets:
+            return [self._asset_tag_entry(self._assets[url]) for url in urls]
+        tags, bundles = [], {}
+        for url in urls:
+            asset = self._assets[url]
+            if not asset.get('snippet'):
+                tags.append(asset)
+            elif asset['kind'] in bundles:
+                bundles[asset['kind']].append(asset)
+            else:
+                bundles[asset['kind']] = [asset]
+                tags.append(bundles[asset['kind']])
+        result = []
+        for tag in tags:
+            if isinstance(tag, dict):
+                result.append(self._asset_tag_entry(tag))
+            elif len(tag) == 1:
+                result.append(self._asset_tag_entry(tag[0]))
+            else:
+                kind = tag[0]['kind']
+                digests = '-'.join(asset['snippet'] for asset in tag)
+                # 地址中带上片段所属插件，其它 worker 据此只导入这些延迟加载插件
+                owners = '+'.join(dict.fromkeys(asset['snippet_key'].partition('.')[0] for asset in tag))
+                url = f'{SNIPPET_URL_PREFIX}bundle.{owners}.{digests}.{kind}'
+                attrs = {'defer': True} if kind == 'js' else {}
+                result.append((kind, url, _render_asset_tag(kind, url, attrs)))
+        return result
+
+    @staticmethod
+    def _asset_tag_entry(asset: dict) -> tuple:
+        return asset['kind'], asset['href'], asset['tag']
+
+    def send_snippet(self, filename: str):
+        """提供内联片段提取出的文件（或合并文件），内容按哈希查找，永久缓存"""
+        stem, _, kind = filename.rpartition('.')
+        digests = stem.rpartition('.')[2].split('-')
+        if kind not in SNIPPET_MIMETYPES or not all(digests):
+            abort(404)
+        if any(digest not in self._snippets for digest in digests):
+            # 可能来自本进程尚未导入的延迟加载插件：只导入文件名中标明的插件
+            # （单个片段为 <插件>.<名称>.<哈希>，合并文件为 bundle.<插件+插件>.<哈希-哈希>）
+            prefix, _, rest = stem.partition('.')
+            owners = rest.partition('.')[0].split('+') if prefix == 'bundle' else (prefix,)
+            for plugin_name in owners:
+                if plugin_name in self._lazy_plugins:
+                    self._materialize(plugin_name)
+        snippets = [self._snippets.get(digest) for digest in digests]
+        if any(snippet is None or snippet['kind'] != kind for snippet in snippets):
+            abort(404)
+        separator = b'\n;\n' if kind == 'js' else b'\n'
+        data = separator.join(snippet['content'] for snippet in snippets)
+        return static_assets.send_virtual(filename, data, SNIPPET_MIMETYPES[kind], stem.rpartition('.')[2])
+
+    # -------- 插件配置 --------
+    def _load_configs(self):
+        """一次查询载入全部插件的配置"""
+        stamp = self._config_version.value
+        configs = {}
+        try:
+            for name, config_data in db.session.query(Plugin.name, Plugin.config_data).all():
+                try:
+                    configs[name] = json.loads(config_data) if config_data else {}
+                except (TypeError, ValueError):
+                    configs[name] = {}
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"加载插件配置失败: {e}")
+            return
+        self._configs = configs
+        self._config_stamp = stamp
+
+    def get_plugin_config(self, plugin_name: str):
+        """读取插件配置（内存缓存，配置版本变化时重新载入），插件不存在时返回 None"""
+        if self._config_version.value != self._config_stamp:
+            self._load_configs()
+        return self._configs.get(plugin_name)
+
+    def set_plugin_config(self, plugin_name: str, config: dict) -> bool:
+        """保存插件配置：写入数据库并同步更新缓存，通知其它 worker 和模板钩子缓存"""
+        # 先校验并复制，避免写入数据库后才出错，导致数据库与缓存不一致
+        if not isinstance(config, Mapping):
+            current_app.logger.warning(f"插件 {plugin_name} 的配置必须是字典，收到 {type(config).__name__}")
+            return False
+        plugin = Plugin.query.filter_by(name=plugin_name).first()
+        if not plugin:
+            return False
+        cached = dict(config)
+        try:
+            plugin.set_config(cached)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"保存插件 {plugin_name} 配置失败: {e}")
+            return False
+        self._configs = {**self._configs, plugin_name: cached}
+        self._config_stamp = self._config_version.bump()
+        self.invalidate_template_cache(f'plugin:{plugin_name}')
+        return True
+
+    # -------- 插件模板 --------
+    def _get_template_env(self):
+        """
+        插件模板共享的 Jinja 环境
+
+        文件模板按 "插件名/模板路径" 命名空间从各插件的 templates/ 目录加载，编译结果由 Jinja 缓存；
+        调试模式下（或 TEMPLATES_AUTO_RELOAD）按文件修改时间自动重新加载。
+        """
+        if self._template_env is None:
+            from jinja2 import Environment, PrefixLoader
+            app = self.app or current_app
+            auto_reload = bool(app.config.get('TEMPLATES_AUTO_RELOAD') or app.debug)
+            self._template_loaders = {}
+            self._template_env = Environment(
+                loader=PrefixLoader(self._template_loaders, delimiter='/'),
+                auto_reload=auto_reload,
+                cache_size=400
+            )
+        return self._template_env
+
+    def _plugin_template_context(self, plugin_name: str, context: dict = None) -> dict:
+        """添加 Flask 模板函数和插件静态路径"""
+        from flask import url_for, request
+        flask_context = {
+            'url_for': url_for,
+            'request': request,
+            'config': current_app.config,
+            'static_url': f"/static/plugins/{plugin_name}",
+            'asset_url': static_assets.url
+        }
+        return {**flask_context, **(context or {})}
+
+    def render_plugin_file(self, plugin_name: str, template_name: str, context: dict = None):
+        """渲染插件 templates/ 目录下的模板文件（编译结果缓存，无需每次读取文件）"""
+        try:
+            env = self._get_template_env()
+            if plugin_name not in self._template_loaders:
+                from jinja2 import FileSystemLoader
+                module = self.plugin_modules.get(plugin_name)
+                if module is not None and getattr(module, '__file__', None):
+                    plugin_path = os.path.dirname(module.__file__)
+                else:
+                    plugin_path = os.path.join(path_utils.project_path('plugins'), plugin_name)
+                self._template_loaders[plugin_name] = FileSystemLoader(
+                    os.path.join(plugin_path, 'templates'), encoding='utf-8'
+                )
+            template = env.get_template(f'{plugin_name}/{template_name}')
+            return template.render(**self._plugin_template_context(plugin_name, context))
+        except Exception as e:
+            current_app.logger.error(f"渲染插件 {plugin_name} 模板 {template_name} 失败: {e}")
+            return f"模板渲染错误: {str(e)}"
+
     def render_plugin_template(self, plugin_name: str, template_content: str, context: dict = None):
-        """渲染插件模板，提供Flask模板上下文"""
-        if context is None:
-            context = {}
-        
+        """渲染插件模板字符串，提供Flask模板上下文（按内容哈希缓存编译结果）"""
         try:
-            from flask import url_for, request
-            from jinja2 import Template
-            
-            # 创建模板并添加Flask上下文
-            template = Template(template_content)
-            
-            # 添加Flask模板函数到上下文
-            flask_context = {
-                'url_for': url_for,
-                'request': request,
-                'config': current_app.config,
-                'static_url': f"/static/plugins/{plugin_name}"
-            }
+            digest = hashlib.sha1(template_content.encode('utf-8')).hexdigest()
+            template = self._compiled_templates.get(digest)
+            if template is None:
+                template = self._get_template_env().from_string(template_content)
+                self._compiled_templates.set(digest, template)
             
-            # 合并上下文
-            template_context = {**flask_context, **context}
-            
-            return template.render(**template_context)
+            return template.render(**self._plugin_template_context(plugin_name, context))
             
         except Exception as e:
             current_app.logger.error(f"渲染插件模板失败: {e}")
@@ -587,6 +1507,7 @@ class PluginManager:
             plugin = Plugin.query.filter_by(name=plugin_name).first()
         plugin.activate()
         self._load_plugin(plugin)
+        self.sync_hook_records(plugin_name)
         return True
     
     def deactivate_plugin(self, plugin_name: str):
@@ -595,20 +1516,14 @@ class PluginManager:
         if plugin:
             plugin.deactivate()
             
-            # 从内存中卸载插件
-            if plugin_name in self.plugins:
-                del self.plugins[plugin_name]
-            
-            if plugin_name in self.plugin_modules:
-                del self.plugin_modules[plugin_name]
-            
-            # 移除插件的钩子
-            hooks_to_remove = []
-            for hook_name, hook_list in self.hooks.items():
-                self.hooks[hook_name] = [
-                    hook for hook in hook_list 
-                    if hook.get('plugin_name') != plugin_name
-                ]
+            # 从内存中卸载插件并移除其钩子
+            with self._mutate_registry() as registry:
+                registry['plugins'].pop(plugin_name, None)
+                registry['plugin_modules'].pop(plugin_name, None)
+                registry['lazy'].pop(plugin_name, None)
+                self._drop_plugin_hooks(registry, (plugin_name,))
+            self._remove_assets(lambda asset: asset['plugin_name'] == plugin_name)
+            hook_guard.reset(plugin_name)
             
             return True
         return False
@@ -631,7 +1546,8 @@ class PluginManager:
         return [plugin.to_dict() for plugin in plugins]
     
     def get_plugin(self, plugin_name: str):
-        """获取插件实例"""
+        """获取插件实例（延迟加载的插件在此时导入）"""
+        self._materialize(plugin_name)
         return self.plugins.get(plugin_name)
 
 # 创建全局插件管理器实例
@@ -669,37 +1585,46 @@ class PluginBase:
         """获取已注册的过滤器列表"""
         return self._registered_filters
     
+    def register_css(self, url, **kwargs):
+        """声明插件的样式表（在 register_hooks 中调用）"""
+        plugin_manager.register_css(url, plugin_name=self.name, **kwargs)
+    
+    def register_js(self, url, **kwargs):
+        """声明插件的脚本（在 register_hooks 中调用）"""
+        plugin_manager.register_js(url, plugin_name=self.name, **kwargs)
+    
+    def register_inline_js(self, name, content, **kwargs):
+        """声明插件的内联脚本片段（提取为可缓存的文件，以 defer 方式引用）"""
+        plugin_manager.register_inline_asset('js', name, content, plugin_name=self.name, **kwargs)
+    
+    def register_inline_css(self, name, content, **kwargs):
+        """声明插件的内联样式片段（提取为可缓存的文件）"""
+        plugin_manager.register_inline_asset('css', name, content, plugin_name=self.name, **kwargs)
+    
     def get_config(self, key=None, default=None):
-        """获取插件配置"""
-        from app.models.plugin import Plugin
-        plugin = Plugin.query.filter_by(name=self.name).first()
-        if plugin:
-            config = plugin.get_config()
-            if key is not None:
-                return config.get(key, default)
-            return config
-        return default if key is not None else {}
+        """获取插件配置（读取插件管理器中的缓存，不访问数据库）"""
+        config = plugin_manager.get_plugin_config(self.name)
+        if config is None:
+            return default if key is not None else {}
+        if key is not None:
+            return config.get(key, default)
+        # 返回副本，调用方修改后需通过 set_config 保存
+        return dict(config)
     
     def set_config(self, config_dict_or_key, value=None):
         """设置插件配置"""
-        from app.models.plugin import Plugin
-        plugin = Plugin.query.filter_by(name=self.name).first()
-        if plugin:
-            if value is not None:
-                # 设置单个配置项
-                config = plugin.get_config()
-                config[config_dict_or_key] = value
-                plugin.set_config(config)
-            else:
-                # 设置整个配置字典
-                plugin.set_config(config_dict_or_key)
+        if value is not None:
+            # 设置单个配置项
+            config = self.get_config()
+            config[config_dict_or_key] = value
+        else:
+            # 设置整个配置字典
+            config = config_dict_or_key
+        plugin_manager.set_plugin_config(self.name, config)
     
     def remove_config(self, key):
         """删除插件配置项"""
-        from app.models.plugin import Plugin
-        plugin = Plugin.query.filter_by(name=self.name).first()
-        if plugin:
-            config = plugin.get_config()
-            if key in config:
-                del config[key]
-                plugin.set_config(config)
+        config = self.get_config()
+        if key in config:
+            del config[key]
+            plugin_manager.set_plugin_config(self.name, config)
@@ -0,0 +1,305 @@
+"""
+相关文章服务
+
+对标题、标签和正文纯文本计算 TF-IDF 稀疏向量（复用搜索的 CJK 二元分词），
+用倒排表累加点积求余弦相似度，每篇文章的前 K 篇相似文章预先写入 related_posts 表。
+文章详情页只需一次按主键的查询即可取得相关文章。
+
+文章写入时增量刷新：post_terms 表保存每个词项的倒排（文章ID, 归一化权重），
+只读取该文章词项的倒排给它打分，文档频率也由这些倒排统计，代价与共享词项的文章数成正比，
+与文章总数无关。受影响的其它文章（能挤进前 K 名，或原列表包含它）直接合并新分数，
+只有它在对方满员列表中分数下降时才按同样方式重算对方的近邻。
+其余文章的权重沿用写入时的 IDF，可通过 `python run.py reindex` 全量重算。
+"""
+import heapq
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models.post import Post
+from app.models.related import PostTerm, PostVector, RelatedPost
+from app.services.search_index import document_terms
+
+# 每篇文章保留的相关文章数
+TOP_K = 6
+# 每个向量最多保留的词项数（按词频截断）
+MAX_VECTOR_TERMS = 80
+# 出现在超过该比例文章中的词项不参与相似度累加（类似停用词，且代价最高）
+MAX_DF_RATIO = 0.5
+
+
+def term_vector(post) -> Dict[str, int]:
+    """文章的截断词频向量"""
+    counts = document_terms(post)
+    return dict(heapq.nlargest(MAX_VECTOR_TERMS, counts.items(), key=lambda item: (item[1], item[0])))
+
+
+def max_doc_freq(total: int) -> int:
+    """参与相似度累加的词项的最大文档频率"""
+    return max(2, int(total * MAX_DF_RATIO)) if total >= 10 else total
+
+
+def tfidf_weights(terms: Dict[str, int], doc_freq: Dict[str, int], total: int) -> Dict[str, float]:
+    """词频向量 -> L2 归一化的 TF-IDF 权重"""
+    weights = {
+        term: (1 + math.log(tf)) * (math.log((1 + total) / (1 + doc_freq.get(term, 1))) + 1)
+        for term, tf in terms.items()
+    }
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {term: w / norm for term, w in weights.items()}
+
+
+def top_neighbours(scores: Iterable[Tuple[int, float]], k: int = TOP_K) -> List[Tuple[int, float]]:
+    return heapq.nlargest(k, scores, key=lambda item: (item[1], -item[0]))
+
+
+def _chunks(items: List, size: int = 500) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class SimilarityModel:
+    """由全部文章词频向量构建的 TF-IDF 模型，支持查询任意文章的近邻"""
+
+    def __init__(self, vectors: Dict[int, Dict[str, int]]):
+        total = len(vectors)
+        doc_freq = Counter()
+        for terms in vectors.values():
+            doc_freq.update(terms.keys())
+        max_df = max_doc_freq(total)
+
+        self.weights: Dict[int, Dict[str, float]] = {}
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for post_id, terms in vectors.items():
+            weights = tfidf_weights(terms, doc_freq, total)
+            self.weights[post_id] = weights
+            for term, weight in weights.items():
+                # 只有一篇文章包含的词项不会产生相似度
+                if 1 < doc_freq[term] <= max_df:
+                    self.postings[term].append((post_id, weight))
+
+    def scores(self, post_id: int) -> Dict[int, float]:
+        """与其它文章的余弦相似度（稀疏点积，只包含相似度大于 0 的文章）"""
+        scores = defaultdict(float)
+        for term, weight in self.weights.get(post_id, {}).items():
+            for other_id, other_weight in self.postings.get(term, ()):
+                if other_id != post_id:
+                    scores[other_id] += weight * other_weight
+        return scores
+
+    def neighbours(self, post_id: int, k: int = TOP_K) -> List[Tuple[int, float]]:
+        return top_neighbours(self.scores(post_id).items(), k)
+
+
+class RelatedPostsService:
+    """相关文章的预计算、增量刷新与查询"""
+
+    def __init__(self):
+        self.app = None
+        self._ready = False
+
+    def init_app(self, app):
+        """注册文章写入钩子，增量刷新相关文章"""
+        self.app = app
+        app.related_posts_service = self
+
+        from app.services.plugin_manager import plugin_manager
+        plugin_manager.register_hook('after_post_save', self._on_post_changed)
+        plugin_manager.register_hook('after_post_update', self._on_post_changed)
+        plugin_manager.register_hook('after_post_delete', self._on_post_deleted)
+
+    def _ensure_ready(self):
+        """确保表和索引存在；尚未计算（或缺少词项倒排）而已有已发布文章时全量计算一次"""
+        if self._ready:
+            return
+        for model in (PostVector, PostTerm, RelatedPost):
+            model.__table__.create(bind=db.engine, checkfirst=True)
+            # 表已存在时 create 不会补建后来新增的索引
+            for index in model.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+        if PostTerm.query.first() is None and Post.query.filter_by(status='published').first() is not None:
+            self.rebuild()
+        self._ready = True
+
+    @staticmethod
+    def _write_neighbours(post_id: int, neighbours: List[Tuple[int, float]]):
+        RelatedPost.query.filter_by(post_id=post_id).delete()
+        db.session.add_all([
+            RelatedPost(post_id, related_id, score=round(score, 6), rank=rank)
+            for rank, (related_id, score) in enumerate(neighbours)
+        ])
+
+    def rebuild(self) -> int:
+        """为全部已发布文章重算向量、词项倒排和相关文章"""
+        PostVector.query.delete()
+        PostTerm.query.delete()
+        RelatedPost.query.delete()
+
+        vectors = {}
+        for post in Post.query.filter_by(status='published').all():
+            vectors[post.id] = term_vector(post)
+            db.session.add(PostVector(post.id, json.dumps(vectors[post.id], ensure_ascii=False)))
+
+        model = SimilarityModel(vectors)
+        rows = []
+        for post_id in vectors:
+            rows.extend(PostTerm(term, post_id, weight) for term, weight in model.weights[post_id].items())
+            rows.extend(
+                RelatedPost(post_id, related_id, score=round(score, 6), rank=rank)
+                for rank, (related_id, score) in enumerate(model.neighbours(post_id))
+            )
+        db.session.bulk_save_objects(rows)
+        db.session.commit()
+        return len(vectors)
+
+    # -------- 增量计算 --------
+    @staticmethod
+    def _doc_freqs(terms: List[str]) -> Dict[str, int]:
+        """由词项倒排统计文档频率（按主键前缀的索引查询）"""
+        doc_freq = {}
+        for chunk in _chunks(terms):
+            doc_freq.update(
+                db.session.query(PostTerm.term, func.count())
+                .filter(PostTerm.term.in_(chunk)).group_by(PostTerm.term).all()
+            )
+        return doc_freq
+
+    def _score(self, post_id: int, weights: Dict[str, float], total: int,
+               doc_freq: Optional[Dict[str, int]] = None) -> Dict[int, float]:
+        """只读取 post_id 各词项的倒排，计算它与共享词项的其它文章的余弦相似度"""
+        if doc_freq is None:
+            doc_freq = self._doc_freqs(list(weights))
+        max_df = max_doc_freq(total)
+        # 只有一篇文章包含的词项不会产生相似度，过于常见的词项不参与累加
+        terms = [term for term in weights if 1 < doc_freq.get(term, 0) <= max_df]
+        scores = defaultdict(float)
+        for chunk in _chunks(terms):
+            rows = (
+                db.session.query(PostTerm.term, PostTerm.post_id, PostTerm.weight)
+                .filter(PostTerm.term.in_(chunk), PostTerm.post_id != post_id).all()
+            )
+            for term, other_id, other_weight in rows:
+                scores[other_id] += weights[term] * other_weight
+        return scores
+
+    def _recompute(self, post_id: int, total: int) -> List[Tuple[int, float]]:
+        """用存储的权重重算一篇文章的近邻"""
+        weights = dict(
+            db.session.query(PostTerm.term, PostTerm.weight).filter(PostTerm.post_id == post_id).all()
+        )
+        return top_neighbours(self._score(post_id, weights, total).items())
+
+    def _refresh_affected(self, post_id: int, scores: Dict[int, float], total: int):
+        """
+        更新受 post_id 变化影响的其它文章的近邻列表
+
+        新分数能进入对方前 K 名的直接合并；原列表包含 post_id 而分数下降（或已删除）、
+        且列表已满时，排在第 K 名之后的文章可能补上来，此时才重算对方的近邻。
+        """
+        current: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        referencing = {row.post_id for row in RelatedPost.query.filter_by(related_id=post_id).all()}
+        candidates = list(set(scores) | referencing)
+        for chunk in _chunks(candidates):
+            for row in RelatedPost.query.filter(RelatedPost.post_id.in_(chunk)).all():
+                current[row.post_id].append((row.related_id, row.score))
+
+        for other_id in candidates:
+            neighbours = current.get(other_id, [])
+            previous = dict(neighbours).get(post_id)
+            others = [(related_id, score) for related_id, score in neighbours if related_id != post_id]
+            score = scores.get(other_id, 0.0)
+            if previous is not None and score < previous and len(neighbours) >= TOP_K:
+                self._write_neighbours(other_id, self._recompute(other_id, total))
+                continue
+            lowest = min((s for _, s in neighbours), default=0.0)
+            if previous is None and len(neighbours) >= TOP_K and score <= lowest:
+                continue
+            merged = top_neighbours(others + ([(post_id, score)] if score > 0 else []))
+            if merged != neighbours:
+                self._write_neighbours(other_id, merged)
+
+    def update_post(self, post):
+        """文章新建或更新后增量刷新"""
+        self._ensure_ready()
+        vector = PostVector.query.get(post.id)
+        if post.status != 'published':
+            if vector is not None:
+                self.remove_post(post.id)
+            return
+
+        terms = term_vector(post)
+        encoded = json.dumps(terms, ensure_ascii=False)
+        if vector is not None and vector.term_freqs == encoded:
+            return
+        if vector is None:
+            db.session.add(PostVector(post.id, encoded))
+        else:
+            vector.term_freqs = encoded
+        PostTerm.query.filter_by(post_id=post.id).delete()
+        db.session.flush()
+
+        total = PostVector.query.count()
+        # 其它文章中的文档频率加上本文
+        doc_freq = {term: count + 1 for term, count in self._doc_freqs(list(terms)).items()}
+        weights = tfidf_weights(terms, doc_freq, total)
+        db.session.add_all([PostTerm(term, post.id, weight) for term, weight in weights.items()])
+
+        scores = self._score(post.id, weights, total, doc_freq)
+        self._write_neighbours(post.id, top_neighbours(scores.items()))
+        self._refresh_affected(post.id, scores, total)
+        db.session.commit()
+
+    def remove_post(self, post_id: int):
+        """文章删除或撤回后移除，并更新原本引用它的文章"""
+        self._ensure_ready()
+        PostVector.query.filter_by(post_id=post_id).delete()
+        PostTerm.query.filter_by(post_id=post_id).delete()
+        RelatedPost.query.filter_by(post_id=post_id).delete()
+        db.session.flush()
+
+        self._refresh_affected(post_id, {}, PostVector.query.count())
+        RelatedPost.query.filter_by(related_id=post_id).delete()
+        db.session.commit()
+
+    def get_related(self, post_id: int, limit: int = TOP_K) -> List[Post]:
+        """读取预计算的相关文章（一次联表查询）"""
+        try:
+            self._ensure_ready()
+            return (
+                Post.query.join(RelatedPost, RelatedPost.related_id == Post.id)
+                .filter(RelatedPost.post_id == post_id, Post.status == 'published')
+                .order_by(RelatedPost.rank)
+                .limit(limit).all()
+            )
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"获取文章 {post_id} 的相关文章失败: {exc}")
+            return []
+
+    # -------- 钩子 --------
+    def _on_post_changed(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            self.update_post(post)
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"刷新文章 {post.id} 的相关文章失败: {exc}")
+
+    def _on_post_deleted(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            self.remove_post(post.id)
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"移除文章 {post.id} 的相关文章失败: {exc}")
+
+
+# 创建全局相关文章服务实例
+related_posts_service = RelatedPostsService()
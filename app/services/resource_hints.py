@@ -0,0 +1,125 @@
+"""
+预加载提示：Link: rel=preload 响应头与 103 Early Hints
+
+页面依赖的样式、字体和脚本要等浏览器解析到对应标签后才开始下载。渲染过程中，
+主题管理器（从模板继承链和 theme.json 中提取的关键资源）和插件管理器（本页输出的插件资源）
+通过 add() 记录本页用到的资源，HTML 响应返回时统一输出为 Link 头：
+
+    Link: </themes/default/static/css/style.3f2a9c1b0d.css>; rel=preload; as=style,
+          <https://fastly.jsdelivr.net>; rel=preconnect
+
+- 同源资源输出 rel=preload（样式、字体在前，脚本在后，最多 PRELOAD_MAX_LINKS 条）；
+- 跨域资源只输出 rel=preconnect，避免 crossorigin 属性与页面中的标签不一致导致重复下载；
+- 开启 EARLY_HINTS 时，每个端点最近一次的 Link 头会在下一次请求进入视图之前以 103 Early Hints 发出。
+  WSGI 没有标准的 1xx 接口，只有服务器在 environ 中提供 wsgi.early_hints(headers) 时才会发送；
+  其它情况下由前面的 CDN/代理（如 Cloudflare Early Hints）根据缓存的 Link 头生成。
+
+环境变量：
+    PRELOAD_HINTS=true        在 HTML 响应上输出 Link 预加载头
+    PRELOAD_MAX_LINKS=12      每个响应最多输出的 rel=preload 条目数
+    EARLY_HINTS=false         服务器支持时发送 103 Early Hints
+"""
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from flask import current_app, g, has_app_context, request
+
+# 输出顺序：阻塞渲染的样式和字体在前
+_AS_ORDER = {'style': 0, 'font': 1, 'image': 2, 'script': 3}
+_FONT_TYPES = {'.woff2': 'font/woff2', '.woff': 'font/woff', '.ttf': 'font/ttf', '.otf': 'font/otf'}
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+def _origin(href: str) -> Optional[str]:
+    """跨域地址的源（scheme://host），同源地址返回 None"""
+    if href.startswith('//'):
+        href = 'https:' + href
+    parts = urlsplit(href)
+    if parts.scheme in ('http', 'https') and parts.netloc:
+        return f'{parts.scheme}://{parts.netloc}'
+    return None
+
+
+class ResourceHints:
+    """收集本次请求的关键资源，输出 Link 预加载头和 103 Early Hints"""
+
+    def __init__(self):
+        self.enabled = True
+        self.early_hints = False
+        self.max_links = 12
+        # {端点: 最近一次的 Link 头}，用于 103 Early Hints
+        self._endpoint_links: Dict[str, str] = {}
+
+    def init_app(self, app):
+        self.enabled = _flag('PRELOAD_HINTS', 'true')
+        self.early_hints = _flag('EARLY_HINTS', 'false')
+        self.max_links = max(0, int(os.getenv('PRELOAD_MAX_LINKS', 12)))
+        if not self.enabled:
+            return
+        if self.early_hints:
+            app.before_request(self._send_early_hints)
+        app.after_request(self._add_link_header)
+
+    def add(self, href: str, as_: str):
+        """记录本页用到的资源（as_: style / font / image / script），同一地址只记录一次"""
+        if not self.enabled or not href or not has_app_context():
+            return
+        hints = g.get('_resource_hints')
+        if hints is None:
+            hints = g._resource_hints = {}
+        hints.setdefault(href, as_)
+
+    def link_header(self, hints: Dict[str, str]) -> str:
+        """把 {地址: 类型} 转成 Link 头的值"""
+        preloads, origins = [], {}
+        for href, as_ in hints.items():
+            origin = _origin(href)
+            if origin is not None:
+                origins.setdefault(origin, None)
+            else:
+                preloads.append((href, as_))
+        preloads.sort(key=lambda item: _AS_ORDER.get(item[1], len(_AS_ORDER)))
+
+        links = []
+        for href, as_ in preloads[:self.max_links]:
+            link = f'<{href}>; rel=preload; as={as_}'
+            if as_ == 'font':
+                # 字体总是以 CORS 方式请求，预加载必须带 crossorigin 才能命中
+                font_type = _FONT_TYPES.get(os.path.splitext(href.split('?', 1)[0])[1].lower())
+                link += f'; type={font_type}; crossorigin' if font_type else '; crossorigin'
+            links.append(link)
+        links.extend(f'<{origin}>; rel=preconnect' for origin in origins)
+        return ', '.join(links)
+
+    def _add_link_header(self, response):
+        hints = g.pop('_resource_hints', None)
+        if not hints or response.status_code != 200 or response.mimetype != 'text/html':
+            return response
+        header = self.link_header(hints)
+        if not header:
+            return response
+        existing = response.headers.get('Link')
+        response.headers['Link'] = f'{existing}, {header}' if existing else header
+        if self.early_hints and request.method == 'GET' and request.endpoint:
+            self._endpoint_links[request.endpoint] = header
+        return response
+
+    def _send_early_hints(self):
+        send = request.environ.get('wsgi.early_hints')
+        if not callable(send) or request.method != 'GET':
+            return
+        header = self._endpoint_links.get(request.endpoint)
+        if not header:
+            return
+        try:
+            send([('Link', header)])
+        except Exception as e:
+            current_app.logger.warning(f"发送 103 Early Hints 失败: {e}")
+
+
+# 创建全局预加载提示实例
+resource_hints = ResourceHints()
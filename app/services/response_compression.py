@@ -0,0 +1,180 @@
+"""
+动态响应压缩（WSGI 中间件）
+
+没有 nginx 在前面时（如 Vercel），HTML 页面和 /api/posts 的 JSON 都以原文返回。
+CompressionMiddleware 包在 Flask 应用外层，按 Accept-Encoding 协商 br / gzip：
+
+- 只压缩允许的 MIME 类型、不小于 COMPRESS_MIN_SIZE 的响应；已带 Content-Encoding
+  （预压缩的静态文件、插件片段）、Cache-Control: no-transform、204/206/304 的响应原样返回；
+- 可压缩的响应都带 Vary: Accept-Encoding；压缩后的强 ETag 改为弱 ETag（与 nginx 相同），
+  If-None-Match 按弱比较，压缩与未压缩的版本都能得到 304；
+- 长度已知的响应整体压缩，结果按 (内容摘要, 编码) 缓存，内容相同的页面、片段和 JSON 不再重复压缩；
+- 没有 Content-Length 的流式响应（生成器）逐块压缩并立即刷新，不等待整个响应，也不缓存；
+  超过 STREAM_THRESHOLD 的大响应同样按流式处理。
+
+环境变量：
+    COMPRESS_RESPONSES=true     开启
+    COMPRESS_MIN_SIZE=500       小于该字节数的响应不压缩
+    COMPRESS_MIMETYPES=...      允许压缩的 MIME 类型（逗号分隔），默认见 DEFAULT_MIMETYPES
+    COMPRESS_GZIP_LEVEL=6       gzip 压缩级别
+    COMPRESS_BROTLI_QUALITY=5   brotli 压缩质量（动态内容不宜过高）
+    COMPRESS_CACHE_SIZE=256     缓存的压缩结果条数
+"""
+import gzip
+import hashlib
+import os
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+from app.services.cache_service import LRUCache
+from app.services.static_assets import brotli, negotiate
+
+DEFAULT_MIMETYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'text/markdown',
+    'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'image/svg+xml',
+)
+# 超过该长度的响应不整体读入内存，按流式压缩
+STREAM_THRESHOLD = 1024 * 1024
+_SKIP_STATUSES = {204, 206, 304}
+
+
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+class CompressionMiddleware:
+    """按 Accept-Encoding 压缩响应体的 WSGI 中间件"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.enabled = _flag('COMPRESS_RESPONSES', 'true')
+        self.min_size = max(0, int(os.getenv('COMPRESS_MIN_SIZE', 500)))
+        mimetypes = os.getenv('COMPRESS_MIMETYPES')
+        self.mimetypes = frozenset(
+            item.strip().lower() for item in mimetypes.split(',') if item.strip()
+        ) if mimetypes else frozenset(DEFAULT_MIMETYPES)
+        self.gzip_level = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+        self.brotli_quality = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self._cache = LRUCache(maxsize=max(1, int(os.getenv('COMPRESS_CACHE_SIZE', 256))), ttl=0)
+        self.stats = {'compressed': 0, 'streamed': 0, 'cache_hits': 0}
+
+    def __call__(self, environ, start_response):
+        if not self.enabled:
+            return self.wsgi_app(environ, start_response)
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            # 兼容旧式的 write() 调用
+            return written.append
+
+        app_iter = self.wsgi_app(environ, capture)
+        iterator = iter(app_iter)
+        if 'status' not in captured:
+            # 有的应用在第一次迭代时才调用 start_response
+            for chunk in iterator:
+                written.append(chunk)
+                break
+
+        status, headers = captured['status'], Headers(captured['headers'])
+        if not self._compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return ClosingIterator(self._chain(written, iterator), getattr(app_iter, 'close', None))
+
+        self._add_vary(headers)
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate(self.encodings, parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING')))
+        length = headers.get('Content-Length', type=int)
+        if encoding is None or (length is not None and length < self.min_size):
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return ClosingIterator(self._chain(written, iterator), getattr(app_iter, 'close', None))
+
+        self._weaken_etag(headers)
+        if length is None or length > STREAM_THRESHOLD:
+            # 流式响应：逐块压缩，每块后刷新，客户端可以立即收到已生成的部分
+            del headers['Content-Length']
+            headers['Content-Encoding'] = encoding
+            self.stats['streamed'] += 1
+            start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+            return ClosingIterator(self._stream(self._chain(written, iterator), encoding),
+                                   getattr(app_iter, 'close', None))
+
+        try:
+            body = b''.join(self._chain(written, iterator))
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        compressed = self._compress(body, encoding)
+        if len(compressed) < len(body):
+            headers['Content-Encoding'] = encoding
+            body = compressed
+        headers['Content-Length'] = str(len(body))
+        start_response(status, headers.to_wsgi_list(), captured['exc_info'])
+        return [body]
+
+    def _compressible(self, status: str, headers: Headers) -> bool:
+        code = int(status.split(None, 1)[0])
+        if code < 200 or code in _SKIP_STATUSES or 'Content-Encoding' in headers:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', '').lower():
+            return False
+        mimetype = headers.get('Content-Type', '').split(';', 1)[0].strip().lower()
+        return mimetype in self.mimetypes
+
+    @staticmethod
+    def _add_vary(headers: Headers):
+        values = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+        if '*' not in values and 'accept-encoding' not in {value.lower() for value in values}:
+            headers['Vary'] = ', '.join(values + ['Accept-Encoding'])
+
+    @staticmethod
+    def _weaken_etag(headers: Headers):
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers['ETag'] = f'W/{etag}'
+
+    @staticmethod
+    def _chain(written, iterator):
+        yield from written
+        yield from iterator
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        """整体压缩，结果按内容摘要缓存"""
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self._cache.get(key)
+        if compressed is not None:
+            self.stats['cache_hits'] += 1
+            return compressed
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        self._cache.set(key, compressed)
+        self.stats['compressed'] += 1
+        return compressed
+
+    def _stream(self, chunks, encoding: str):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                if chunk:
+                    data = compressor.process(chunk) + compressor.flush()
+                    if data:
+                        yield data
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            for chunk in chunks:
+                if chunk:
+                    yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
@@ -0,0 +1,327 @@
+"""
+内置倒排索引
+
+纯 Python 实现，索引数据保存在普通数据库表中，无需任何数据库扩展：
+- 分词：中日韩文字按二元组（bigram）切分，拉丁字母/数字按单词切分
+- 倒排表：每个词项一行，文章ID差分后与词频一起以变长整数编码
+- 排序：BM25
+- 并发：倒排行带版本号，两篇文章同时改写同一词项时后提交的一方回滚并重试，不会丢失倒排
+"""
+import json
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect as sa_inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models.post import Post
+from app.models.search import SearchDocument, SearchTerm
+from app.services.markdown_service import markdown_service
+
+# 平假名/片假名、CJK 扩展A、CJK 统一汉字、韩文音节、CJK 兼容汉字
+_CJK_RANGES = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_CJK_RUN_RE = re.compile(f'[{_CJK_RANGES}]+')
+_TOKEN_RE = re.compile(f'[{_CJK_RANGES}]+|[^\\W_{_CJK_RANGES}]+')
+
+MAX_TERM_LENGTH = 64
+# 标题、标签在词频上的加权倍数
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+# 前缀扩展时最多展开的词项数
+MAX_PREFIX_EXPANSION = 50
+# 与其它写入冲突时的最大重试次数
+MAX_WRITE_RETRIES = 5
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """把文本切分为索引词项：CJK 连续文字生成二元组，其它按单词切分"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(_normalize(text)):
+        run = match.group(0)
+        if _CJK_RUN_RE.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) <= MAX_TERM_LENGTH:
+            tokens.append(run)
+    return tokens
+
+
+def query_groups(query: str) -> List[Tuple[str, bool]]:
+    """
+    把查询拆成必须全部命中的词项组
+
+    Returns:
+        [(词项, 是否前缀匹配), ...]，单个汉字和最后一个拉丁单词按前缀匹配
+    """
+    groups = []
+    matches = list(_TOKEN_RE.finditer(_normalize(query)))
+    for index, match in enumerate(matches):
+        run = match.group(0)
+        is_last = index == len(matches) - 1
+        if _CJK_RUN_RE.fullmatch(run):
+            if len(run) == 1:
+                groups.append((run, True))
+            else:
+                groups.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+        elif len(run) <= MAX_TERM_LENGTH:
+            groups.append((run, is_last and len(run) >= 2))
+    # 去重并保持顺序
+    seen = set()
+    unique = []
+    for group in groups:
+        if group not in seen:
+            seen.add(group)
+            unique.append(group)
+    return unique[:32]
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def encode_postings(postings: Dict[int, int]) -> bytes:
+    """编码倒排表：按文章ID排序后写入 (ID 差值, 词频) 变长整数对"""
+    buffer = bytearray()
+    previous = 0
+    for doc_id in sorted(postings):
+        _write_varint(buffer, doc_id - previous)
+        _write_varint(buffer, postings[doc_id])
+        previous = doc_id
+    return bytes(buffer)
+
+
+def decode_postings(data: Optional[bytes]) -> Dict[int, int]:
+    """解码倒排表，返回 {文章ID: 词频}"""
+    postings = {}
+    if not data:
+        return postings
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    doc_id = 0
+    for i in range(0, len(values) - 1, 2):
+        doc_id += values[i]
+        postings[doc_id] = values[i + 1]
+    return postings
+
+
+def document_terms(post) -> Counter:
+    """计算文章的词频向量（标题与标签加权）"""
+    counts = Counter()
+    for token in tokenize(post.title or ''):
+        counts[token] += TITLE_WEIGHT
+    for tag in getattr(post, 'tags', None) or []:
+        for token in tokenize(tag.name or ''):
+            counts[token] += TAG_WEIGHT
+    body = f"{markdown_service.to_plain_text(post.excerpt)} {markdown_service.to_plain_text(post.content)}"
+    counts.update(tokenize(body))
+    return counts
+
+
+def _chunks(items: List, size: int = 500) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class InvertedIndex:
+    """基于数据库表的倒排索引，支持单篇文章增量更新和 BM25 检索"""
+
+    k1 = 1.2
+    b = 0.75
+
+    def ensure_tables(self):
+        """确保索引表存在；索引为空而已有已发布文章时补建索引"""
+        for model in (SearchTerm, SearchDocument):
+            model.__table__.create(bind=db.engine, checkfirst=True)
+        columns = {column['name'] for column in sa_inspect(db.engine).get_columns(SearchTerm.__tablename__)}
+        if 'version' not in columns:
+            # 旧版本建立的表没有版本号列
+            with db.engine.begin() as connection:
+                connection.execute(text(
+                    f"ALTER TABLE {SearchTerm.__tablename__} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"
+                ))
+        if SearchDocument.query.first() is None and Post.query.filter_by(status='published').first() is not None:
+            self.rebuild()
+            db.session.commit()
+
+    def _load_terms(self, terms: Iterable[str]) -> Dict[str, SearchTerm]:
+        rows = {}
+        for chunk in _chunks(sorted(set(terms))):
+            for row in SearchTerm.query.filter(SearchTerm.term.in_(chunk)).all():
+                rows[row.term] = row
+        return rows
+
+    def index_post(self, post):
+        """增量更新单篇文章：只改写新旧词项并集对应的倒排行"""
+        new_terms = dict(document_terms(post)) if post.status == 'published' else {}
+        self._write_document(post.id, new_terms)
+
+    def remove_post(self, post_id: int):
+        """从索引中移除文章"""
+        self._write_document(post_id, {})
+
+    def _write_document(self, post_id: int, new_terms: Dict[str, int]):
+        """
+        把文章的词频写入倒排表（不提交事务，由调用方提交）
+
+        倒排行是读出、修改、写回的，两篇文章同时写入同一词项（中文二元组很常见）时，
+        后写的一方会覆盖先写的倒排。行在读出后被其它事务改写过时 flush 抛出 StaleDataError，
+        新词项被同时插入时抛出 IntegrityError，两种情况都只回滚到本次写入前的保存点后重新读取再写，
+        会话中调用方尚未提交的修改不受影响。
+        """
+        for attempt in range(MAX_WRITE_RETRIES):
+            try:
+                with db.session.begin_nested():
+                    if db.engine.dialect.name == 'sqlite':
+                        # SQLite 的保存点开启延迟事务：先读后写时，另一方提交后本事务无法再升级为写事务，
+                        # 回滚到保存点也读不到新版本。先取得写锁，同时写入的一方在此排队，读到的即最新倒排
+                        db.session.execute(text(f"UPDATE {SearchTerm.__tablename__} SET version = version WHERE 0"))
+                    self._apply_document(post_id, new_terms)
+                return
+            except (StaleDataError, IntegrityError):
+                if attempt == MAX_WRITE_RETRIES - 1:
+                    raise
+
+    def _apply_document(self, post_id: int, new_terms: Dict[str, int]):
+        document = SearchDocument.query.get(post_id)
+        old_terms = json.loads(document.term_freqs) if document else {}
+        if old_terms == new_terms:
+            return
+
+        rows = self._load_terms(set(old_terms) | set(new_terms))
+        for term in set(old_terms) | set(new_terms):
+            row = rows.get(term)
+            postings = decode_postings(row.postings) if row else {}
+            if term in new_terms:
+                postings[post_id] = new_terms[term]
+            else:
+                postings.pop(post_id, None)
+
+            if not postings:
+                if row is not None:
+                    db.session.delete(row)
+                continue
+            if row is None:
+                row = SearchTerm(term)
+                db.session.add(row)
+            row.postings = encode_postings(postings)
+            row.doc_freq = len(postings)
+
+        if new_terms:
+            if document is None:
+                document = SearchDocument(post_id)
+                db.session.add(document)
+            document.length = sum(new_terms.values())
+            document.term_freqs = json.dumps(new_terms, ensure_ascii=False)
+        elif document is not None:
+            db.session.delete(document)
+        # 在释放保存点之前写出，版本冲突在这里抛出
+        db.session.flush()
+
+    def rebuild(self) -> int:
+        """在内存中为全部已发布文章建立索引后一次性写入（不提交事务，由调用方提交）"""
+        SearchTerm.query.delete()
+        SearchDocument.query.delete()
+
+        inverted: Dict[str, Dict[int, int]] = {}
+        count = 0
+        for post in Post.query.filter_by(status='published').all():
+            terms = document_terms(post)
+            for term, freq in terms.items():
+                inverted.setdefault(term, {})[post.id] = freq
+            db.session.add(SearchDocument(
+                post.id,
+                length=sum(terms.values()),
+                term_freqs=json.dumps(dict(terms), ensure_ascii=False)
+            ))
+            count += 1
+
+        db.session.bulk_save_objects([
+            SearchTerm(term, postings=encode_postings(postings), doc_freq=len(postings))
+            for term, postings in inverted.items()
+        ])
+        return count
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        rows = (
+            db.session.query(SearchTerm.term)
+            .filter(SearchTerm.term.like(f'{prefix}%'))
+            .order_by(SearchTerm.doc_freq.desc())
+            .limit(MAX_PREFIX_EXPANSION)
+            .all()
+        )
+        return [row.term for row in rows]
+
+    def search(self, query: str, offset: int, limit: int) -> Tuple[List[int], int]:
+        """检索并按 BM25 排序，返回 (当前页文章ID列表, 命中总数)"""
+        groups = query_groups(query)
+        if not groups:
+            return [], 0
+
+        group_terms = []
+        for term, is_prefix in groups:
+            group_terms.append(self._expand_prefix(term) if is_prefix else [term])
+        rows = self._load_terms(term for terms in group_terms for term in terms)
+
+        # 每组内取并集，组与组之间取交集
+        candidates = None
+        group_postings = []
+        for terms in group_terms:
+            postings_by_term = {term: decode_postings(rows[term].postings) for term in terms if term in rows}
+            matched = set()
+            for postings in postings_by_term.values():
+                matched.update(postings)
+            candidates = matched if candidates is None else candidates & matched
+            group_postings.append(postings_by_term)
+            if not candidates:
+                return [], 0
+
+        total_docs, total_length = db.session.query(
+            db.func.count(SearchDocument.post_id), db.func.sum(SearchDocument.length)
+        ).one()
+        total_docs = total_docs or 1
+        avg_length = (total_length or 0) / total_docs or 1.0
+
+        lengths = {}
+        for chunk in _chunks(sorted(candidates)):
+            for post_id, length in (
+                db.session.query(SearchDocument.post_id, SearchDocument.length)
+                .filter(SearchDocument.post_id.in_(chunk)).all()
+            ):
+                lengths[post_id] = length
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for postings_by_term in group_postings:
+            for postings in postings_by_term.values():
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for post_id in candidates.intersection(postings):
+                    tf = postings[post_id]
+                    norm = self.k1 * (1 - self.b + self.b * lengths.get(post_id, avg_length) / avg_length)
+                    scores[post_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores, key=lambda post_id: (-scores[post_id], -post_id))
+        return ranked[offset:offset + limit], len(ranked)
+
+
+# 创建全局倒排索引实例
+inverted_index = InvertedIndex()
@@ -0,0 +1,630 @@
+"""
+全文搜索服务
+
+按数据库方言选择搜索后端：
+- SQLite: FTS5 虚拟表（trigram 分词，支持中文子串；由文章保存/删除钩子同步）
+- MySQL: posts 表上的 FULLTEXT 索引（ngram 解析器，由数据库维护）
+- PostgreSQL: tsvector 表达式 GIN 索引（由数据库维护）
+- builtin: 内置倒排索引（CJK 二元分词 + BM25，适合中文内容，所有数据库可用）
+其它情况回退到 LIKE 查询。可通过环境变量 SEARCH_BACKEND 强制指定后端。
+"""
+import math
+import os
+import re
+import unicodedata
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+from app import db
+from app.models.post import Post
+from app.models.search import PostPlainText
+from app.services.cache_service import LRUCache, post_generation
+from app.services.markdown_service import markdown_service
+from app.services.pinyin_index import looks_like_pinyin, pinyin_index
+
+# 片段高亮使用的占位符，先由数据库/后端生成，再在转义后替换为 <mark>
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# 选择片段窗口时最多考察的命中位置数
+MAX_SNIPPET_MATCHES = 64
+
+
+def extract_terms(query: str) -> List[str]:
+    """把用户输入拆成搜索词（去掉运算符等特殊字符）"""
+    return [term.lower() for term in _TOKEN_RE.findall(query or '')][:16]
+
+
+def render_snippet(raw: Optional[str]) -> Optional[Markup]:
+    """将带占位符的原始片段转为安全的 HTML"""
+    if not raw:
+        return None
+    html = str(escape(raw))
+    html = html.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return Markup(html)
+
+
+def make_snippet(plain_text: str, terms: List[str], width: int = 120) -> Optional[str]:
+    """在纯文本中截取命中词最多的片段，并用占位符标记命中词"""
+    if not plain_text:
+        return None
+
+    terms = [term for term in terms if term]
+    pattern = None
+    start = 0
+    if terms:
+        pattern = re.compile('|'.join(re.escape(term) for term in sorted(set(terms), key=len, reverse=True)), re.IGNORECASE)
+        matches = [(m.start(), m.group(0).lower()) for m in islice(pattern.finditer(plain_text), MAX_SNIPPET_MATCHES)]
+        if matches:
+            # 以每个命中位置为窗口起点，选覆盖不同命中词最多的一个（相同时取靠前的）
+            best_position, best_score = matches[0][0], 0
+            for index, (position, _) in enumerate(matches):
+                covered = {term for pos, term in matches[index:] if pos < position + width}
+                if len(covered) > best_score:
+                    best_position, best_score = position, len(covered)
+            start = max(0, best_position - width // 3)
+
+    end = min(len(plain_text), start + width)
+    fragment = plain_text[start:end]
+    if pattern is not None:
+        fragment = pattern.sub(lambda m: f'{_MARK_START}{m.group(0)}{_MARK_END}', fragment)
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if end < len(plain_text) else ''
+    return f'{prefix}{fragment}{suffix}'
+
+
+def highlight(text: str, query: str, width: int = 120) -> Markup:
+    """模板用：从纯文本中截取与查询最相关的片段并高亮，如 {{ post_text|highlight(query) }}"""
+    return render_snippet(make_snippet(text or '', extract_terms(query), width)) or Markup('')
+
+
+def normalize_query(query: str) -> str:
+    """用于缓存键的查询规范化：全角转半角、小写、合并空白"""
+    return ' '.join(unicodedata.normalize('NFKC', query or '').lower().split())
+
+
+class SearchResults:
+    """搜索结果分页对象，属性与 Flask-SQLAlchemy 的 Pagination 保持一致，便于主题复用"""
+
+    def __init__(self, items: List[Post], total: int, page: int, per_page: int,
+                 snippets: Optional[Dict[int, Markup]] = None, backend: str = ''):
+        self.items = items
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.snippets = snippets or {}
+        self.backend = backend
+
+    @property
+    def pages(self) -> int:
+        if self.per_page <= 0 or self.total == 0:
+            return 0
+        return int(math.ceil(self.total / self.per_page))
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def prev_num(self) -> Optional[int]:
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+    @property
+    def next_num(self) -> Optional[int]:
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=4, right_edge=2):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if (num <= left_edge
+                    or self.page - left_current - 1 < num < self.page + right_current
+                    or num > self.pages - right_edge):
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class SearchBackend:
+    """搜索后端基类，同时也是 LIKE 回退实现"""
+
+    name = 'like'
+    # 是否需要在文章写入时由应用同步索引
+    needs_sync = False
+
+    def ensure_index(self):
+        """创建后端所需的索引结构（幂等）"""
+
+    def index_post(self, post: Post):
+        """写入或更新单篇文章的索引（写入当前会话，由调用方提交）"""
+
+    def remove_post(self, post_id: int):
+        """从索引中移除文章（由调用方提交）"""
+
+    def rebuild(self) -> int:
+        """重建全部索引，返回已索引的文章数（由调用方提交）"""
+        return Post.query.filter_by(status='published').count()
+
+    def search(self, query: str, offset: int, limit: int) -> Tuple[List[Tuple[int, Optional[str]]], int]:
+        """返回 ([(post_id, 原始片段), ...], 总数)"""
+        terms = extract_terms(query) or [query]
+        conditions = []
+        for term in terms:
+            conditions.append(db.or_(
+                Post.title.contains(term),
+                Post.content.contains(term),
+                Post.excerpt.contains(term)
+            ))
+        base = Post.query.filter(Post.status == 'published', *conditions)
+        total = base.count()
+        rows = (
+            base.with_entities(Post.id)
+            .order_by(Post.published_at.desc())
+            .offset(offset).limit(limit).all()
+        )
+        return [(row.id, None) for row in rows], total
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """SQLite FTS5 后端，rowid 与 posts.id 对应，只收录已发布文章"""
+
+    name = 'sqlite_fts5'
+    needs_sync = True
+    table = 'post_search_fts'
+
+    # unicode61 只按空白和标点切词，整段中文会成为一个词，搜不到其中的子串；
+    # trigram 按三个字符切分，MATCH 即子串匹配（SQLite 3.34+）
+    tokenizer = 'trigram'
+    # trigram 无法匹配少于三个字符的词，这些词改为对索引表 LIKE 过滤（顺序扫描，见 search）
+    min_term_length = 3
+
+    @staticmethod
+    def trigram_supported() -> bool:
+        version = db.session.execute(text("SELECT sqlite_version()")).scalar() or '0'
+        return tuple(int(part) for part in version.split('.')[:2]) >= (3, 34)
+
+    def ensure_index(self):
+        if not self.trigram_supported():
+            raise RuntimeError("当前 SQLite 版本不支持 trigram 分词器（需要 3.34 及以上）")
+        row = db.session.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': self.table}
+        ).first()
+        if row and self.tokenizer in (row[0] or ''):
+            return
+        if row:
+            # 旧版本以 unicode61 分词建立的索引表，重建为 trigram
+            db.session.execute(text(f"DROP TABLE {self.table}"))
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE {self.table} "
+            f"USING fts5(title, excerpt, body, tokenize='{self.tokenizer}')"
+        ))
+        # 新建的索引表需要补齐已有文章（与建表在同一事务中提交）
+        self.rebuild()
+        db.session.commit()
+
+    def _insert(self, post):
+        db.session.execute(
+            text(f"INSERT INTO {self.table} (rowid, title, excerpt, body) VALUES (:id, :title, :excerpt, :body)"),
+            {
+                'id': post.id,
+                'title': post.title or '',
+                'excerpt': markdown_service.to_plain_text(post.excerpt),
+                'body': markdown_service.to_plain_text(post.content),
+            }
+        )
+
+    def index_post(self, post: Post):
+        db.session.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"), {'id': post.id})
+        if post.status == 'published':
+            self._insert(post)
+
+    def remove_post(self, post_id: int):
+        db.session.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"), {'id': post_id})
+
+    def rebuild(self) -> int:
+        db.session.execute(text(f"DELETE FROM {self.table}"))
+        count = 0
+        rows = (
+            db.session.query(Post.id, Post.title, Post.excerpt, Post.content)
+            .filter(Post.status == 'published')
+            .yield_per(200)
+        )
+        for post in rows:
+            self._insert(post)
+            count += 1
+        return count
+
+    @staticmethod
+    def _match_expression(terms: List[str]) -> str:
+        # trigram 下每个短语即子串匹配，词之间为 AND
+        return ' '.join(f'"{term}"' for term in terms)
+
+    # 只有短词时的相关度权重，与 bm25 的列权重一致（标题、摘要、正文）
+    short_term_weights = (('title', 10.0), ('excerpt', 3.0), ('body', 1.0))
+
+    def search(self, query, offset, limit):
+        terms = extract_terms(query)
+        if not terms:
+            return [], 0
+        long_terms = [term for term in terms if len(term) >= self.min_term_length]
+        short_terms = [term.lower() for term in terms if len(term) < self.min_term_length]
+
+        conditions = []
+        params = {'limit': limit, 'offset': offset}
+        if long_terms:
+            conditions.append(f"{self.table} MATCH :q")
+            params['q'] = self._match_expression(long_terms)
+        for index, term in enumerate(short_terms):
+            # 短词直接 LIKE 索引表里的纯文本列：与 MATCH 同源，不再回查 posts 表。
+            # trigram 对少于三个字符的模式无法走索引，这一步仍是对索引表的顺序扫描，
+            # 有长词时先由 MATCH 缩小候选集；大量一两个字的查询请改用 builtin 后端（二元分词）
+            conditions.append(
+                f"(title LIKE :t{index} ESCAPE '\\' OR excerpt LIKE :t{index} ESCAPE '\\' "
+                f"OR body LIKE :t{index} ESCAPE '\\')"
+            )
+            params[f't{index}'] = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params[f's{index}'] = term
+        where = ' AND '.join(conditions)
+
+        total = db.session.execute(
+            text(f"SELECT count(*) FROM {self.table} WHERE {where}"), params
+        ).scalar() or 0
+        if long_terms:
+            sql = (
+                f"SELECT rowid, snippet({self.table}, -1, char(2), char(3), '…', 24) "
+                f"FROM {self.table} WHERE {where} "
+                f"ORDER BY bm25({self.table}, 10.0, 3.0, 1.0) LIMIT :limit OFFSET :offset"
+            )
+        else:
+            # 只有短词时没有 MATCH，无法计算 bm25 和片段：按各列出现次数加权排序，片段由纯文本生成
+            sql = (
+                f"SELECT rowid, NULL FROM {self.table} WHERE {where} "
+                f"ORDER BY {self._short_term_score(len(short_terms))} DESC, rowid DESC "
+                "LIMIT :limit OFFSET :offset"
+            )
+        rows = db.session.execute(text(sql), params).all()
+        return [(row[0], row[1]) for row in rows], total
+
+    def _short_term_score(self, count: int) -> str:
+        """短词相关度表达式：各列中出现次数乘以列权重之和"""
+        parts = []
+        for index in range(count):
+            for column, weight in self.short_term_weights:
+                parts.append(
+                    f"{weight} * (length({column}) - length(replace(lower({column}), :s{index}, ''))) "
+                    f"/ length(:s{index})"
+                )
+        return '(' + ' + '.join(parts) + ')'
+
+
+class MySQLFulltextBackend(SearchBackend):
+    """MySQL FULLTEXT 后端（ngram 解析器以支持中文）"""
+
+    name = 'mysql_fulltext'
+    index_name = 'ft_posts_search'
+    match_clause = 'MATCH(title, excerpt, content) AGAINST (:q IN BOOLEAN MODE)'
+
+    def ensure_index(self):
+        exists = db.session.execute(text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'posts' AND index_name = :name"
+        ), {'name': self.index_name}).scalar()
+        if not exists:
+            db.session.execute(text(
+                f"CREATE FULLTEXT INDEX {self.index_name} ON posts (title, excerpt, content) WITH PARSER ngram"
+            ))
+        db.session.commit()
+
+    def search(self, query, offset, limit):
+        terms = extract_terms(query)
+        if not terms:
+            return [], 0
+        params = {'q': ' '.join(f'+{term}*' for term in terms), 'limit': limit, 'offset': offset}
+        total = db.session.execute(text(
+            f"SELECT COUNT(*) FROM posts WHERE status = 'published' AND {self.match_clause}"
+        ), params).scalar() or 0
+        rows = db.session.execute(text(
+            f"SELECT id, {self.match_clause} AS score FROM posts "
+            f"WHERE status = 'published' AND {self.match_clause} "
+            "ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        ), params).all()
+        return [(row[0], None) for row in rows], total
+
+
+class PostgresTsvectorBackend(SearchBackend):
+    """PostgreSQL tsvector 后端，使用与 GIN 表达式索引完全一致的文档表达式"""
+
+    name = 'postgres_tsvector'
+    index_name = 'ix_posts_search_tsv'
+    document = (
+        "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(excerpt, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(content, '')), 'D'))"
+    )
+    headline_options = f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=35, MinWords=15, MaxFragments=1'
+
+    def ensure_index(self):
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {self.index_name} ON posts USING GIN ({self.document})"
+        ))
+        db.session.commit()
+
+    def search(self, query, offset, limit):
+        terms = extract_terms(query)
+        if not terms:
+            return [], 0
+        params = {
+            'tsq': ' & '.join(f'{term}:*' for term in terms),
+            'opts': self.headline_options,
+            'limit': limit,
+            'offset': offset,
+        }
+        total = db.session.execute(text(
+            f"SELECT COUNT(*) FROM posts WHERE status = 'published' "
+            f"AND {self.document} @@ to_tsquery('simple', :tsq)"
+        ), params).scalar() or 0
+        rows = db.session.execute(text(
+            "SELECT id, ts_headline('simple', coalesce(excerpt, '') || ' ' || content, q, :opts) "
+            "FROM ("
+            f"  SELECT id, excerpt, content, q, ts_rank({self.document}, q) AS score "
+            "  FROM posts, to_tsquery('simple', :tsq) AS q "
+            f"  WHERE status = 'published' AND {self.document} @@ q "
+            "  ORDER BY score DESC LIMIT :limit OFFSET :offset"
+            ") AS hits ORDER BY score DESC"
+        ), params).all()
+        return [(row[0], row[1]) for row in rows], total
+
+
+class BuiltinIndexBackend(SearchBackend):
+    """内置倒排索引后端（CJK 二元分词 + BM25），适用于所有数据库"""
+
+    name = 'builtin'
+    needs_sync = True
+
+    def __init__(self):
+        from app.services.search_index import inverted_index
+        self.index = inverted_index
+
+    def ensure_index(self):
+        self.index.ensure_tables()
+
+    def index_post(self, post: Post):
+        self.index.index_post(post)
+
+    def remove_post(self, post_id: int):
+        self.index.remove_post(post_id)
+
+    def rebuild(self) -> int:
+        return self.index.rebuild()
+
+    def search(self, query, offset, limit):
+        post_ids, total = self.index.search(query, offset, limit)
+        return [(post_id, None) for post_id in post_ids], total
+
+
+_BACKENDS = {
+    'like': SearchBackend,
+    'builtin': BuiltinIndexBackend,
+    'sqlite_fts5': SQLiteFTS5Backend,
+    'mysql_fulltext': MySQLFulltextBackend,
+    'postgres_tsvector': PostgresTsvectorBackend,
+}
+
+_DIALECT_BACKENDS = {
+    'sqlite': 'sqlite_fts5',
+    'mysql': 'mysql_fulltext',
+    'postgresql': 'postgres_tsvector',
+}
+
+
+class SearchService:
+    """搜索服务：选择后端、维护索引并提供统一的分页结果"""
+
+    def __init__(self):
+        self.app = None
+        self._backend = None
+        self._tables_ready = False
+        # 键: (文章代标记, 规范化查询, 类型, 页码, 每页数量)；文章写入后代标记变化，旧条目自然过期
+        self._results = LRUCache(
+            maxsize=int(os.getenv('SEARCH_CACHE_SIZE', 512)),
+            ttl=int(os.getenv('SEARCH_CACHE_TTL', 300))
+        )
+
+    def init_app(self, app):
+        """初始化应用，注册文章写入钩子以同步索引"""
+        self.app = app
+        app.search_service = self
+
+        from app.services.plugin_manager import plugin_manager
+        plugin_manager.register_hook('after_post_save', self._on_post_changed)
+        plugin_manager.register_hook('after_post_update', self._on_post_changed)
+        plugin_manager.register_hook('after_post_delete', self._on_post_deleted)
+
+    @property
+    def backend(self) -> SearchBackend:
+        """按配置或数据库方言选择后端，首次使用时创建索引，失败则回退到 LIKE"""
+        if self._backend is not None:
+            return self._backend
+
+        name = (os.getenv('SEARCH_BACKEND') or 'auto').strip().lower()
+        if name == 'auto':
+            name = _DIALECT_BACKENDS.get(db.engine.dialect.name, 'like')
+            if name == 'sqlite_fts5' and not SQLiteFTS5Backend.trigram_supported():
+                # 没有 trigram 分词器的旧版 SQLite 无法切分中文，改用内置倒排索引
+                name = 'builtin'
+        backend_class = _BACKENDS.get(name, SearchBackend)
+
+        backend = backend_class()
+        try:
+            backend.ensure_index()
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"初始化搜索后端 {backend.name} 失败，回退到 LIKE 搜索: {exc}")
+            backend = SearchBackend()
+        self._backend = backend
+        return backend
+
+    def search(self, query: str, page: int = 1, per_page: int = 10) -> SearchResults:
+        """执行搜索，结果按相关度排序；相同查询在文章未变化期间直接使用缓存"""
+        page = max(1, page or 1)
+        per_page = max(1, per_page or 10)
+
+        cache_key = (post_generation.value, normalize_query(query), 'posts', page, per_page)
+        cached = self._results.get(cache_key)
+        if cached is None:
+            cached = self._run_search(query, page, per_page)
+            self._results.set(cache_key, cached)
+        post_ids, total, snippets, backend_name = cached
+
+        posts_by_id = {}
+        if post_ids:
+            posts_by_id = {post.id: post for post in Post.query.filter(Post.id.in_(post_ids)).all()}
+        items = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+        return SearchResults(
+            items, total, page, per_page,
+            snippets={post_id: Markup(html) for post_id, html in snippets.items()},
+            backend=backend_name
+        )
+
+    def _run_search(self, query: str, page: int, per_page: int) -> Tuple[List[int], int, Dict[int, str], str]:
+        """实际执行查询，返回可缓存的 (文章ID列表, 总数, {文章ID: 片段HTML}, 后端名)"""
+        offset = (page - 1) * per_page
+        backend = self.backend
+
+        try:
+            hits, total = backend.search(query, offset, per_page)
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"搜索后端 {backend.name} 查询失败，回退到 LIKE 搜索: {exc}")
+            backend = SearchBackend()
+            hits, total = backend.search(query, offset, per_page)
+
+        # 没有命中且输入像拼音时（如 shenduxuexi、sdxx），改用拼音索引匹配标题和标签
+        if total == 0 and looks_like_pinyin(query):
+            pinyin_ids = pinyin_index.match_post_ids(query)
+            total = len(pinyin_ids)
+            hits = [(post_id, None) for post_id in pinyin_ids[offset:offset + per_page]]
+
+        terms = extract_terms(query)
+        plain_texts = self.get_plain_texts([post_id for post_id, raw in hits if raw is None])
+        snippets = {}
+        for post_id, raw in hits:
+            if raw is None:
+                raw = make_snippet(plain_texts.get(post_id, ''), terms)
+            snippet = render_snippet(raw)
+            if snippet:
+                snippets[post_id] = str(snippet)
+
+        return [post_id for post_id, _ in hits], total, snippets, backend.name
+
+    # -------- 纯文本存储 --------
+    def _ensure_tables(self):
+        if not self._tables_ready:
+            PostPlainText.__table__.create(bind=db.engine, checkfirst=True)
+            self._tables_ready = True
+
+    @staticmethod
+    def _plain_text_of(post) -> str:
+        return markdown_service.to_plain_text(f"{post.excerpt or ''}\n{post.content or ''}")
+
+    def store_plain_text(self, post: Post):
+        """保存文章纯文本（不提交事务）"""
+        self._ensure_tables()
+        row = PostPlainText.query.get(post.id)
+        if row is None:
+            db.session.add(PostPlainText(post.id, self._plain_text_of(post)))
+        else:
+            row.plain_text = self._plain_text_of(post)
+
+    def get_plain_texts(self, post_ids: List[int]) -> Dict[int, str]:
+        """批量读取文章纯文本，缺失的（旧数据）当场生成并补存"""
+        if not post_ids:
+            return {}
+        self._ensure_tables()
+        texts = dict(
+            db.session.query(PostPlainText.post_id, PostPlainText.plain_text)
+            .filter(PostPlainText.post_id.in_(post_ids)).all()
+        )
+        missing = [post_id for post_id in post_ids if post_id not in texts]
+        if missing:
+            for post in Post.query.filter(Post.id.in_(missing)).all():
+                texts[post.id] = self._plain_text_of(post)
+                db.session.add(PostPlainText(post.id, texts[post.id]))
+            try:
+                db.session.commit()
+            except Exception as exc:
+                db.session.rollback()
+                current_app.logger.warning(f"保存文章纯文本失败: {exc}")
+        return texts
+
+    def index_post(self, post: Post):
+        """同步单篇文章的索引（仅对需要应用侧同步的后端生效）"""
+        backend = self.backend
+        if backend.needs_sync:
+            backend.index_post(post)
+
+    def remove_post(self, post_id: int):
+        """从索引中删除文章"""
+        backend = self.backend
+        if backend.needs_sync:
+            backend.remove_post(post_id)
+
+    def reindex(self) -> int:
+        """重建全部索引和纯文本"""
+        self._ensure_tables()
+        PostPlainText.query.delete()
+        rows = db.session.query(Post.id, Post.excerpt, Post.content).yield_per(200)
+        db.session.add_all([PostPlainText(row.id, self._plain_text_of(row)) for row in rows])
+        db.session.commit()
+
+        backend = self.backend
+        backend.ensure_index()
+        count = backend.rebuild()
+        db.session.commit()
+        post_generation.bump()
+        return count
+
+    def _on_post_changed(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            self.store_plain_text(post)
+            db.session.commit()
+            self.index_post(post)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"更新文章 {post.id} 搜索索引失败: {exc}")
+        post_generation.bump()
+
+    def _on_post_deleted(self, post=None, **kwargs):
+        if post is None or post.id is None:
+            return
+        try:
+            PostPlainText.query.filter_by(post_id=post.id).delete()
+            db.session.commit()
+            self.remove_post(post.id)
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            current_app.logger.error(f"删除文章 {post.id} 搜索索引失败: {exc}")
+        post_generation.bump()
+
+
+# 创建全局搜索服务实例
+search_service = SearchService()
@@ -0,0 +1,277 @@
+"""
+主题和插件静态资源的指纹化构建
+
+`python run.py build-assets` 扫描 themes/*/static 和 plugins/*/static，为每个文件写出带内容哈希的副本
+（style.css -> style.3f2a9c1b0d.css），对文本类文件额外写出预压缩的 .gz / .br 版本，并生成清单：
+
+    static_build/
+        manifest.json
+        themes/default/static/css/style.3f2a9c1b0d.css
+        themes/default/static/css/style.3f2a9c1b0d.css.gz
+        themes/default/static/css/style.3f2a9c1b0d.css.br
+        static/plugins/ads/css/ads.91c0e27d4a.css
+        ...
+
+输出目录与 URL 路径一一对应，nginx 可以直接以它为 root 提供文件（gzip_static / brotli_static）。
+
+- 模板中使用 asset_url('/themes/default/static/css/style.css') 得到带哈希的地址，未构建或不在清单中时原样返回；
+- theme_static / plugin_static 路由遇到带哈希的地址时，按 Accept-Encoding 返回最合适的预压缩版本，
+  并设置一年的 immutable 缓存；其它地址仍从源目录读取。
+
+环境变量：
+    STATIC_BUILD_DIR    构建输出目录，默认 <项目根目录>/static_build
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from flask import Response, request, send_file, send_from_directory
+
+from app.services.cache_service import LRUCache
+
+try:
+    import brotli
+except ImportError:  # 未安装时只生成 .gz
+    brotli = None
+
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+HASH_LENGTH = 10
+# 带哈希的文件内容不会变化，可以永久缓存
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# 值得预压缩的文件类型（图片、字体 woff/woff2 等本身已压缩）
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html',
+    '.ttf', '.otf', '.eot', '.ico',
+}
+# 按优先顺序协商的压缩格式及对应的文件后缀
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def precompress(data: bytes) -> Dict[str, bytes]:
+    """生成 gzip（以及已安装 Brotli 时的 br）压缩版本，只保留比原文小的"""
+    variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: content for encoding, content in variants.items() if len(content) < len(data)}
+
+
+def negotiate(encodings, accept=None) -> Optional[str]:
+    """按 br、gzip 的顺序选择客户端接受的压缩格式（accept 默认取当前请求的 Accept-Encoding）"""
+    if accept is None:
+        accept = request.accept_encodings
+    for encoding, _ in ENCODING_SUFFIXES:
+        if encoding in encodings and accept[encoding]:
+            return encoding
+    return None
+
+
+def _immutable(response, varies: bool):
+    if varies:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+class StaticAssetPipeline:
+    """静态资源清单：构建指纹化副本，并在运行时解析和提供它们"""
+
+    def __init__(self):
+        self.build_dir: Optional[str] = None
+        # 每次加载清单后递增，按带哈希地址缓存的数据据此判断是否过期
+        self.version = 0
+        # {源地址: 带哈希的地址}
+        self._assets: Dict[str, str] = {}
+        # {带哈希的地址: 可用的压缩格式列表}
+        self._files: Dict[str, list] = {}
+        # 内存中生成的资源（插件内联脚本等）的压缩结果 {地址: {编码: 内容}}
+        self._virtual = LRUCache(maxsize=256, ttl=0)
+
+    def init_app(self, app):
+        self.build_dir = self._default_build_dir(app)
+        self.load()
+        app.add_template_global(self.url, 'asset_url')
+
+    @staticmethod
+    def _default_build_dir(app) -> str:
+        build_dir = os.getenv('STATIC_BUILD_DIR')
+        if build_dir:
+            return os.path.abspath(build_dir)
+        return os.path.join(app.config.get('PROJECT_ROOT', os.getcwd()), 'static_build')
+
+    # -------- 运行时 --------
+    def load(self) -> bool:
+        """读取构建清单；没有构建过时所有地址原样返回"""
+        self.version += 1
+        manifest_path = os.path.join(self.build_dir, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            self._assets, self._files = {}, {}
+            return False
+        if manifest.get('version') != MANIFEST_VERSION:
+            self._assets, self._files = {}, {}
+            return False
+        self._assets = manifest.get('assets') or {}
+        self._files = manifest.get('files') or {}
+        return True
+
+    def url(self, path: str) -> str:
+        """源地址 -> 带哈希的地址（模板中的 asset_url）"""
+        if not self._assets or not path:
+            return path
+        return self._assets.get(path if path.startswith('/') else f'/{path}', path)
+
+    def send(self, static_dir: str, filename: str):
+        """
+        提供静态文件：带哈希的地址返回构建目录中的文件（优先预压缩版本，永久缓存），
+        其它地址从源目录读取
+        """
+        encodings = self._files.get(request.path)
+        if encodings is None:
+            return send_from_directory(static_dir, filename)
+
+        path = os.path.join(self.build_dir, request.path.lstrip('/'))
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        chosen = negotiate(encodings)
+        if chosen:
+            path += dict(ENCODING_SUFFIXES)[chosen]
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+        if chosen:
+            response.headers['Content-Encoding'] = chosen
+        return _immutable(response, bool(encodings))
+
+    def send_virtual(self, key: str, data: bytes, mimetype: str, etag: str):
+        """
+        提供内存中生成、地址带内容哈希的资源（插件内联脚本提取出的文件等），
+        与构建产物一样按 Accept-Encoding 返回压缩版本并永久缓存；压缩结果按地址缓存
+        """
+        variants = self._virtual.get(key)
+        if variants is None:
+            variants = precompress(data)
+            self._virtual.set(key, variants)
+        chosen = negotiate(variants)
+        response = Response(variants[chosen] if chosen else data, mimetype=mimetype)
+        if chosen:
+            response.headers['Content-Encoding'] = chosen
+        response.set_etag(f'{etag}-{chosen}' if chosen else etag)
+        response = _immutable(response, bool(variants))
+        return response.make_conditional(request)
+
+    # -------- 构建 --------
+    def build(self, output_dir: str = None, clean: bool = False) -> dict:
+        """
+        生成指纹化副本、预压缩版本和清单，返回统计信息
+
+        内容未变的文件哈希不变，不会重复写入；旧版本的文件默认保留在输出目录中，
+        滚动发布期间仍在使用旧页面的客户端可以继续取到（clean=True 时先清空输出目录）。
+        """
+        from app.utils import path_utils
+
+        build_dir = os.path.abspath(output_dir) if output_dir else self.build_dir
+        if clean and os.path.isdir(build_dir):
+            import shutil
+            shutil.rmtree(build_dir)
+        os.makedirs(build_dir, exist_ok=True)
+
+        previous = self._read_manifest(build_dir)
+        assets, files = {}, {}
+        stats = {'files': 0, 'written': 0, 'gzip': 0, 'brotli': 0, 'bytes': 0, 'compressed_bytes': 0}
+
+        sources = (
+            (path_utils.project_path('themes'), '/themes/{name}/static'),
+            (path_utils.project_path('plugins'), '/static/plugins/{name}'),
+        )
+        for root_dir, url_template in sources:
+            if not os.path.isdir(root_dir):
+                continue
+            for name in sorted(os.listdir(root_dir)):
+                static_dir = os.path.join(root_dir, name, 'static')
+                if not os.path.isdir(static_dir):
+                    continue
+                url_prefix = url_template.format(name=name)
+                for source_path, relative in self._walk(static_dir):
+                    source_url = f"{url_prefix}/{relative}"
+                    hashed_url, encodings = self._build_file(source_path, source_url, build_dir, stats)
+                    assets[source_url] = hashed_url
+                    files[hashed_url] = encodings
+
+        # 保留上一次构建中仍然存在的文件，旧页面引用的地址继续可用
+        for hashed_url, encodings in (previous.get('files') or {}).items():
+            if hashed_url not in files and os.path.exists(os.path.join(build_dir, hashed_url.lstrip('/'))):
+                files[hashed_url] = encodings
+
+        manifest_path = os.path.join(build_dir, MANIFEST_FILENAME)
+        tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'assets': assets, 'files': files},
+                      f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+        if build_dir == self.build_dir:
+            self.load()
+        stats['manifest'] = manifest_path
+        return stats
+
+    @staticmethod
+    def _read_manifest(build_dir: str) -> dict:
+        try:
+            with open(os.path.join(build_dir, MANIFEST_FILENAME), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _walk(static_dir: str):
+        """遍历静态目录，跳过隐藏文件和源目录中已有的压缩文件"""
+        for dirpath, dirnames, filenames in os.walk(static_dir):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for filename in sorted(filenames):
+                if filename.startswith('.') or filename.endswith(('.gz', '.br')):
+                    continue
+                source_path = os.path.join(dirpath, filename)
+                yield source_path, os.path.relpath(source_path, static_dir).replace(os.sep, '/')
+
+    @staticmethod
+    def _build_file(source_path: str, source_url: str, build_dir: str, stats: dict):
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        stem, ext = os.path.splitext(source_url)
+        hashed_url = f'{stem}.{digest}{ext}'
+        target = os.path.join(build_dir, hashed_url.lstrip('/'))
+        stats['files'] += 1
+        stats['bytes'] += len(data)
+
+        variants = [('', data)]
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+            # 压缩后没有变小的不提供
+            compressed = precompress(data)
+            variants.extend((suffix, compressed[encoding]) for encoding, suffix in ENCODING_SUFFIXES
+                            if encoding in compressed)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        encodings = []
+        for suffix, content in variants:
+            path = target + suffix
+            if suffix:
+                encodings.append('br' if suffix == '.br' else 'gzip')
+                stats['brotli' if suffix == '.br' else 'gzip'] += 1
+                stats['compressed_bytes'] += len(content)
+            if os.path.exists(path) and os.path.getsize(path) == len(content):
+                # 文件名含内容哈希，同名同大小即为同一内容
+                continue
+            with open(path, 'wb') as f:
+                f.write(content)
+            stats['written'] += 1
+        return hashed_url, encodings
+
+
+# 创建全局静态资源实例
+static_assets = StaticAssetPipeline()
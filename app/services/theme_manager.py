@@ -4,8 +4,12 @@ import importlib.util
 import inspect
 import json
 import os
+import posixpath
+import re
 import sys
+import threading
 import traceback
+from types import MappingProxyType
 from typing import Any, Dict, List, Optional
 
 from sqlalchemy.orm import object_session
@@ -13,8 +17,28 @@ from flask import current_app, render_template_string
 
 from app import db
 from app.models.theme import Theme, ThemeHook
+from app.services.discovery_cache import discovery_cache
+from app.services.html_minifier import html_minifier
+from app.services.resource_hints import resource_hints
+from app.services.static_assets import static_assets
 from app.utils import path_utils
 
+# 模板中的 {{ asset_url('...') }}（参数为字符串常量时可以静态解析）
+_ASSET_URL_CALL = re.compile(r"""\{\{-?\s*asset_url\(\s*['"]([^'"]+)['"]\s*\)\s*-?\}\}""")
+# 继承和包含的其它模板（模板名为字符串常量时）
+_TEMPLATE_REFERENCE = re.compile(r"""\{%-?\s*(?:extends|include|import|from)\s+['"]([^'"]+)['"]""")
+_HTML_COMMENT = re.compile(r'<!--.*?-->', re.S)
+_JINJA_COMMENT = re.compile(r'\{#.*?#\}', re.S)
+_RESOURCE_TAG = re.compile(r'<(link|script)\b([^>]*)>', re.I)
+_TAG_ATTRIBUTE = re.compile(r"""([a-zA-Z_:-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+_FONT_FACE = re.compile(r'@font-face\s*\{([^}]*)\}', re.I)
+_CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""")
+_PRELOAD_TYPES = {
+    '.css': 'style', '.js': 'script', '.mjs': 'script',
+    '.woff2': 'font', '.woff': 'font', '.ttf': 'font', '.otf': 'font',
+    '.webp': 'image', '.avif': 'image', '.png': 'image', '.jpg': 'image', '.jpeg': 'image', '.svg': 'image',
+}
+
 
 class ThemeManager:
     """主题管理器"""
@@ -23,11 +47,16 @@ class ThemeManager:
         self.app = None
         self._current_theme = None
         self._current_theme_id = None
-        self.theme_hooks = {}
+        # 只读快照：读取时不加锁，修改时重建后整体替换
+        self.theme_hooks = MappingProxyType({})
+        self._theme_hooks_lock = threading.RLock()
+        self._theme_hooks_staging = None
         self.theme_modules: Dict[str, Dict[str, Any]] = {}
         self._registered_theme_blueprints = set()
         self._registered_theme_routes = set()
         self._extension_candidates = ('extensions', 'backend', 'frontend')
+        # {(主题, 模板目录, 模板名): ((插件注册表版本, 静态资源清单版本), 预加载资源, 依赖文件的修改时间, 依赖文件)}
+        self._critical_assets: Dict[tuple, tuple] = {}
 
     @property
     def current_theme(self) -> Optional[Theme]:
@@ -71,7 +100,7 @@ class ThemeManager:
         self._current_theme = None
         self._current_theme_id = None
         self._last_active_theme_name = None
-        self.theme_hooks.clear()
+        self.theme_hooks = MappingProxyType({})
         self.load_current_theme()
 
     def ensure_synced(self):
@@ -84,7 +113,7 @@ class ThemeManager:
             if db_active_theme != self._last_active_theme_name:
                 self._current_theme = None
                 self._current_theme_id = None
-                self.theme_hooks.clear()
+                self.theme_hooks = MappingProxyType({})
                 self.load_current_theme()
                 self._last_active_theme_name = db_active_theme
         except Exception:
@@ -99,12 +128,51 @@ class ThemeManager:
             os.makedirs(themes_dir)
             return
 
-        for theme_name in os.listdir(themes_dir):
-            theme_path = os.path.join(themes_dir, theme_name)
+        # 一次查询取得已注册的主题名，只读取新目录的 theme.json（解析结果按 mtime/大小缓存）
+        known = {name for name, in db.session.query(Theme.name).all()}
+        found = discovery_cache.scan(themes_dir, 'theme.json', skip=known)
+        discovery_cache.save()
+        if not found:
+            return
+
+        # 新主题在同一个事务中写入
+        try:
+            db.session.add_all([
+                self._build_theme_record(theme_name, theme_path, config)
+                for theme_name, (theme_path, config) in found.items()
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"注册主题 {', '.join(found)} 失败: {e}")
 
-            # 检查是否为主题目录
-            if os.path.isdir(theme_path):
-                self._register_theme(theme_name, theme_path)
+    @staticmethod
+    def _build_theme_record(theme_name: str, theme_path: str, config: dict) -> Theme:
+        """根据 theme.json 的内容创建主题记录（不提交）"""
+        theme = Theme(
+            name=theme_name,
+            display_name=config.get('display_name', theme_name),
+            description=config.get('description', ''),
+            version=config.get('version', '1.0.0'),
+            author=config.get('author', ''),
+            author_website=config.get('author_website', ''),
+            license=config.get('license', ''),
+            min_noteblog_version=config.get('min_noteblog_version', ''),
+            max_noteblog_version=config.get('max_noteblog_version', ''),
+            install_path=theme_path,
+            is_system=config.get('is_system', False),
+            supports_widgets=config.get('supports_widgets', True),
+            supports_menus=config.get('supports_menus', True),
+            supports_customizer=config.get('supports_customizer', True),
+            supports_post_formats=config.get('supports_post_formats', False),
+            screenshot=config.get('screenshot', ''),
+            demo_url=config.get('demo_url', '')
+        )
+
+        # 设置配置模式
+        if 'config_schema' in config:
+            theme.set_config_schema(config['config_schema'])
+        return theme
 
     def _register_theme(self, theme_name: str, theme_path: str):
         """注册主题到数据库"""
@@ -114,40 +182,12 @@ class ThemeManager:
             return
 
         # 读取主题配置文件
-        config_file = os.path.join(theme_path, 'theme.json')
-        if not os.path.exists(config_file):
+        config = discovery_cache.load(os.path.join(theme_path, 'theme.json'))
+        if config is None:
             return
 
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-
-            # 创建主题记录
-            theme = Theme(
-                name=theme_name,
-                display_name=config.get('display_name', theme_name),
-                description=config.get('description', ''),
-                version=config.get('version', '1.0.0'),
-                author=config.get('author', ''),
-                author_website=config.get('author_website', ''),
-                license=config.get('license', ''),
-                min_noteblog_version=config.get('min_noteblog_version', ''),
-                max_noteblog_version=config.get('max_noteblog_version', ''),
-                install_path=theme_path,
-                is_system=config.get('is_system', False),
-                supports_widgets=config.get('supports_widgets', True),
-                supports_menus=config.get('supports_menus', True),
-                supports_customizer=config.get('supports_customizer', True),
-                supports_post_formats=config.get('supports_post_formats', False),
-                screenshot=config.get('screenshot', ''),
-                demo_url=config.get('demo_url', '')
-            )
-
-            # 设置配置模式
-            if 'config_schema' in config:
-                theme.set_config_schema(config['config_schema'])
-
-            db.session.add(theme)
+            db.session.add(self._build_theme_record(theme_name, theme_path, config))
             db.session.commit()
 
         except Exception as e:
@@ -183,37 +223,43 @@ class ThemeManager:
                 self._load_theme_extensions(default_theme)
 
     def _load_theme_hooks(self, theme: Theme):
-        """加载主题钩子"""
-        # 清空现有钩子
-        self.theme_hooks.clear()
-
-        # 从数据库加载钩子
-        hooks = ThemeHook.query.filter_by(theme_id=theme.id).all()
-        for hook in hooks:
-            if hook.hook_name not in self.theme_hooks:
-                self.theme_hooks[hook.hook_name] = []
-
-            self.theme_hooks[hook.hook_name].append({
-                'callback': hook.callback_function,
-                'priority': hook.priority,
-                'type': hook.hook_type
-            })
-
-        # 尝试加载主题的钩子文件
-        hooks_file = os.path.join(theme.install_path, 'hooks.py')
-        if os.path.exists(hooks_file):
+        """加载主题钩子（在暂存字典中构建，完成后一次性替换，渲染中的请求看到的始终是完整的一份）"""
+        with self._theme_hooks_lock:
+            staging = self._theme_hooks_staging = {}
             try:
-                spec = importlib.util.spec_from_file_location("theme_hooks", hooks_file)
-                hooks_module = importlib.util.module_from_spec(spec)
-                sys.modules["theme_hooks"] = hooks_module
-                spec.loader.exec_module(hooks_module)
+                # 从数据库加载钩子
+                hooks = ThemeHook.query.filter_by(theme_id=theme.id).all()
+                for hook in hooks:
+                    staging.setdefault(hook.hook_name, []).append({
+                        'callback': hook.callback_function,
+                        'priority': hook.priority,
+                        'type': hook.hook_type
+                    })
+
+                # 尝试加载主题的钩子文件
+                hooks_file = os.path.join(theme.install_path, 'hooks.py')
+                if os.path.exists(hooks_file):
+                    try:
+                        spec = importlib.util.spec_from_file_location("theme_hooks", hooks_file)
+                        hooks_module = importlib.util.module_from_spec(spec)
+                        sys.modules["theme_hooks"] = hooks_module
+                        spec.loader.exec_module(hooks_module)
 
-                # 注册钩子
-                if hasattr(hooks_module, 'register_hooks'):
-                    hooks_module.register_hooks(self)
+                        # 注册钩子（写入暂存字典）
+                        if hasattr(hooks_module, 'register_hooks'):
+                            hooks_module.register_hooks(self)
 
-            except Exception as e:
-                current_app.logger.error(f"加载主题钩子失败: {e}")
+                    except Exception as e:
+                        current_app.logger.error(f"加载主题钩子失败: {e}")
+            finally:
+                self._theme_hooks_staging = None
+                self._publish_theme_hooks(staging)
+
+    def _publish_theme_hooks(self, hooks: Dict[str, list]):
+        """把钩子字典发布为只读快照（每个钩子的列表转为元组）"""
+        self.theme_hooks = MappingProxyType({
+            name: tuple(entries) for name, entries in hooks.items() if entries
+        })
 
     def _load_theme_extensions(self, theme: Theme):
         """加载主题扩展，包括后端/前端模块以及声明式页面。"""
@@ -362,16 +408,9 @@ class ThemeManager:
 
     def _register_configured_pages(self, theme: Theme):
         """读取 theme.json 的 custom_pages 配置并注册路由。"""
-        config_path = os.path.join(theme.install_path, 'theme.json')
-        if not os.path.exists(config_path):
-            return
-
-        try:
-            with open(config_path, 'r', encoding='utf-8') as config_file:
-                config = json.load(config_file)
-        except Exception as exc:
-            if self.app:
-                self.app.logger.error(f"读取主题 {theme.name} 配置失败: {exc}")
+        # 与发现主题共用解析缓存，theme.json 未变化时不再重复读取
+        config = discovery_cache.load(os.path.join(theme.install_path, 'theme.json'))
+        if config is None:
             return
 
         pages = config.get('custom_pages') or []
@@ -455,17 +494,24 @@ class ThemeManager:
     def register_theme_hook(self, hook_name: str, callback: str,
                             hook_type: str = 'template', priority: int = 10):
         """注册主题钩子"""
-        if hook_name not in self.theme_hooks:
-            self.theme_hooks[hook_name] = []
-
-        self.theme_hooks[hook_name].append({
+        entry = {
             'callback': callback,
             'priority': priority,
             'type': hook_type
-        })
-
-        # 按优先级排序
-        self.theme_hooks[hook_name].sort(key=lambda x: x['priority'])
+        }
+        with self._theme_hooks_lock:
+            if self._theme_hooks_staging is not None:
+                # 加载主题钩子期间：写入暂存字典，加载结束时统一发布
+                entries = self._theme_hooks_staging.setdefault(hook_name, [])
+                entries.append(entry)
+                entries.sort(key=lambda x: x['priority'])
+            else:
+                hooks = {name: list(entries) for name, entries in self.theme_hooks.items()}
+                entries = hooks.setdefault(hook_name, [])
+                entries.append(entry)
+                # 按优先级排序
+                entries.sort(key=lambda x: x['priority'])
+                self._publish_theme_hooks(hooks)
 
         # 保存到数据库
         if self.current_theme:
@@ -526,13 +572,12 @@ class ThemeManager:
     def get_theme_hooks(self, hook_name: str):
         """获取主题钩子"""
         hooks = []
-        if hook_name in self.theme_hooks:
-            for hook_info in self.theme_hooks[hook_name]:
-                if hook_info.get('type') == 'template':
-                    try:
-                        hooks.append(hook_info['callback'])
-                    except Exception as e:
-                        current_app.logger.error(f"获取主题钩子 {hook_name} 失败: {e}")
+        for hook_info in self.theme_hooks.get(hook_name, ()):
+            if hook_info.get('type') == 'template':
+                try:
+                    hooks.append(hook_info['callback'])
+                except Exception as e:
+                    current_app.logger.error(f"获取主题钩子 {hook_name} 失败: {e}")
 
         return hooks
 
@@ -649,6 +694,7 @@ class ThemeManager:
 
             env.globals['get_theme_hooks'] = self.get_theme_hooks
             env.globals['get_theme_config'] = self.get_theme_config
+            env.globals['asset_url'] = static_assets.url
             env.globals['url_for'] = self._url_for_helper
 
             # 注册 localtime 过滤器（用于时间本地化显示）
@@ -663,6 +709,9 @@ class ThemeManager:
 
             env.filters['localtime'] = localtime_filter
 
+            from app.services.search_service import highlight
+            env.filters['highlight'] = highlight
+
             try:
                 from flask import get_flashed_messages, request, session, g
 
@@ -674,9 +723,13 @@ class ThemeManager:
             except Exception:
                 pass
 
+            if resource_hints.enabled:
+                for href, as_ in self.get_critical_assets(template_name, template_dir):
+                    resource_hints.add(href, as_)
+
             try:
                 template = env.get_template(template_name)
-                return template.render(**context)
+                return html_minifier.minify(template.render(**context))
             except Exception as e:
                 current_app.logger.error(f"渲染模板 {template_name} 失败: {e}")
                 return f"<h1>模板渲染错误</h1><p>{e}</p>"
@@ -731,9 +784,136 @@ class ThemeManager:
 
     def get_theme_static_url(self, static_file: str):
         """获取主题静态文件URL"""
-        if self.current_theme:
-            return f"/themes/{self.current_theme.name}/static/{static_file}"
-        return f"/themes/default/static/{static_file}"
+        theme_name = self.current_theme.name if self.current_theme else 'default'
+        return static_assets.url(f"/themes/{theme_name}/static/{static_file}")
+
+    def get_critical_assets(self, template_name: str, template_dir: str = None) -> tuple:
+        """
+        模板的关键资源 ((地址, 类型), ...)，用于输出预加载提示
+
+        包括 theme.json 中 preload 声明的资源、模板及其继承/包含的模板中引用的样式表和脚本，
+        以及主题样式表中 @font-face 引用的字体；样式表和脚本已换成清单中带哈希的地址。
+        结果按主题和模板缓存，插件注册表发布新快照或静态资源清单重新加载后重新生成，渲染时不访问文件；
+        调试模式（或 TEMPLATES_AUTO_RELOAD）下另外按依赖文件的修改时间判断模板是否改动。
+        """
+        from app.services.plugin_manager import plugin_manager
+
+        theme = self.current_theme
+        if theme is None:
+            return ()
+        if template_dir is None:
+            template_dir = os.path.join(theme.install_path, 'templates')
+        key = (theme.name, template_dir, template_name)
+        stamp = (plugin_manager.registry_version, static_assets.version)
+        cached = self._critical_assets.get(key)
+        if cached is not None and cached[0] == stamp:
+            if not (current_app.debug or current_app.config.get('TEMPLATES_AUTO_RELOAD')):
+                return cached[1]
+            if cached[2] == self._signature(cached[3]):
+                return cached[1]
+
+        files = [os.path.join(theme.install_path, 'theme.json')]
+        assets = dict(self._declared_preloads(theme, template_name))
+        for source in self._template_chain(template_dir, template_name, files):
+            for href, as_ in self._template_assets(source):
+                assets.setdefault(href, as_)
+        for href, as_ in list(assets.items()):
+            if as_ == 'style':
+                for font in self._stylesheet_fonts(theme, href, files):
+                    assets.setdefault(font, 'font')
+
+        # 字体由样式表中的相对地址引用，浏览器请求的是未加哈希的地址
+        result = tuple((href if as_ == 'font' else static_assets.url(href), as_) for href, as_ in assets.items())
+        self._critical_assets[key] = (stamp, result, self._signature(files), tuple(files))
+        return result
+
+    @staticmethod
+    def _signature(files) -> tuple:
+        signature = []
+        for path in files:
+            try:
+                signature.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    @staticmethod
+    def _declared_preloads(theme: Theme, template_name: str):
+        """theme.json 中的 preload：地址字符串，或 {"href", "as", "templates"}（只对这些模板生效）"""
+        config = discovery_cache.load(os.path.join(theme.install_path, 'theme.json')) or {}
+        for entry in config.get('preload') or ():
+            if isinstance(entry, str):
+                entry = {'href': entry}
+            elif not isinstance(entry, dict) or not entry.get('href'):
+                continue
+            templates = entry.get('templates')
+            if templates and template_name not in templates:
+                continue
+            href = entry['href']
+            as_ = entry.get('as') or _PRELOAD_TYPES.get(posixpath.splitext(href.split('?', 1)[0])[1].lower())
+            if as_:
+                yield href, as_
+
+    @staticmethod
+    def _template_chain(template_dir: str, template_name: str, files: list):
+        """依次返回模板及其继承、包含的模板源码（模板名为字符串常量的部分）"""
+        pending, seen = [template_name], set()
+        while pending:
+            name = pending.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            path = os.path.join(template_dir, *name.split('/'))
+            files.append(path)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    source = f.read()
+            except OSError:
+                continue
+            source = _JINJA_COMMENT.sub('', source)
+            pending.extend(_TEMPLATE_REFERENCE.findall(source))
+            yield source
+
+    @staticmethod
+    def _template_assets(source: str):
+        """模板源码中 <link rel="stylesheet"> 和 <script src> 引用的资源"""
+        source = _ASSET_URL_CALL.sub(lambda match: match.group(1), _HTML_COMMENT.sub('', source))
+        for tag, raw_attrs in _RESOURCE_TAG.findall(source):
+            attrs = {name.lower(): ''.join(values) for name, *values in _TAG_ATTRIBUTE.findall(raw_attrs)}
+            if tag.lower() == 'link':
+                href, as_ = attrs.get('href'), 'style'
+                if 'stylesheet' not in (attrs.get('rel') or '').lower().split():
+                    continue
+            else:
+                href, as_ = attrs.get('src'), 'script'
+                if attrs.get('type', '').lower() == 'module':
+                    continue
+            # 仍含模板表达式的地址无法静态确定
+            if href and '{' not in href and not href.startswith('data:'):
+                yield href, as_
+
+    @staticmethod
+    def _stylesheet_fonts(theme: Theme, href: str, files: list):
+        """主题样式表中 @font-face 引用的字体（每个字体取第一个地址，通常是 woff2）"""
+        prefix = f'/themes/{theme.name}/static/'
+        if not href.startswith(prefix):
+            return
+        path = os.path.join(theme.install_path, 'static', *href[len(prefix):].split('/'))
+        files.append(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                css = f.read()
+        except (OSError, UnicodeDecodeError):
+            return
+        for block in _FONT_FACE.findall(css):
+            urls = [url for url in _CSS_URL.findall(block) if not url.startswith('data:')]
+            if not urls:
+                continue
+            url = urls[0]
+            if url.startswith(('/', 'http://', 'https://')):
+                yield url
+            else:
+                yield posixpath.normpath(posixpath.join(posixpath.dirname(href), url))
 
     def get_theme_template_path(self, template_name: str):
         """获取主题模板路径"""
@@ -15,6 +15,9 @@ from app.models.plugin import Plugin
 from app.models.theme import Theme
 from app.models.setting import SettingManager
 from app.services.plugin_manager import plugin_manager
+from app.services.async_hooks import async_hook_runner
+from app.services.hook_guard import hook_guard
+from app.services.hook_profiler import hook_profiler
 from app.services.theme_manager import theme_manager
 from app.utils import path_utils
 from app.services.backup_service import (
@@ -794,10 +797,31 @@ def plugins():
     context = _get_base_context('插件管理')
     context.update({
         'plugins': all_plugins,
+        'hook_profile': hook_profiler.summary() if hook_profiler.enabled else None,
+        'hook_breakers': hook_guard.status(),
+        'async_hooks': async_hook_runner.metrics(),
     })
     
     return theme_manager.render_template('admin/plugins.html', **context)
 
+@bp.route('/api/plugins/profile')
+@login_required
+@admin_required
+def api_plugin_profile():
+    """API：插件钩子耗时统计（当前 worker）"""
+    data = hook_profiler.summary()
+    data['breakers'] = hook_guard.status()
+    data['async_hooks'] = async_hook_runner.metrics()
+    return jsonify({'success': True, 'data': data})
+
+@bp.route('/api/plugins/profile/reset', methods=['POST'])
+@login_required
+@admin_required
+def api_reset_plugin_profile():
+    """API：清空插件钩子耗时统计（当前 worker）"""
+    hook_profiler.reset()
+    return jsonify({'success': True, 'message': '统计已清空'})
+
 @bp.route('/plugins/<plugin_name>/activate', methods=['POST'])
 @login_required
 @admin_required
@@ -2,14 +2,17 @@
 API 视图
 """
 from datetime import datetime, timezone
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, abort, jsonify, request, session
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import User
 from app.models.post import Post, Category, Tag
 from app.models.comment import Comment
-from app.models.setting import SettingManager
+from app.models.setting import Setting, SettingManager
+from app.services.api_etags import api_etags
 from app.services.plugin_manager import plugin_manager
+from app.services.search_service import search_service
+from app.services.pinyin_index import pinyin_index
 
 bp = Blueprint('api', __name__)
 
@@ -36,6 +39,12 @@ def _coerce_int_or_none(value):
     except Exception:
         raise ValueError('invalid integer')
 
+
+def _aggregate(query, model, column=None):
+    """查询结果的 (行数, 最大 updated_at)，用于计算 ETag"""
+    column = column if column is not None else model.updated_at
+    return tuple(query.order_by(None).with_entities(db.func.count(model.id), db.func.max(column)).one())
+
 # 文章 API
 @bp.route('/posts')
 def api_posts():
@@ -55,6 +64,11 @@ def api_posts():
         tag = Tag.query.get(tag_id)
         if tag:
             query = query.filter(Post.tags.contains(tag))
+
+    etag = api_etags.etag(*_aggregate(query, Post))
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
     
     posts = query.order_by(Post.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
@@ -72,19 +86,28 @@ def api_posts():
         }
     }
     
-    return api_response(data=data)
+    return api_etags.apply(api_response(data=data), etag)
 
 @bp.route('/posts/<int:post_id>')
 def api_post(post_id):
     """获取单篇文章"""
-    post = Post.query.get_or_404(post_id)
+    # 先只取判断权限和计算 ETag 需要的列
+    row = db.session.query(Post.status, Post.author_id, Post.updated_at).filter_by(id=post_id).first()
+    if row is None:
+        abort(404)
     
     # 如果是未发布的文章，需要登录且是作者或管理员
-    if post.status != 'published':
-        if not current_user.is_authenticated or (not current_user.is_admin and post.author_id != current_user.id):
+    if row.status != 'published':
+        if not current_user.is_authenticated or (not current_user.is_admin and row.author_id != current_user.id):
             return api_response(message='无权访问', status=403)
+
+    etag = api_etags.etag(row.updated_at)
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
     
-    return api_response(data=post.to_dict())
+    post = Post.query.get_or_404(post_id)
+    return api_etags.apply(api_response(data=post.to_dict()), etag)
 
 @bp.route('/posts', methods=['POST'])
 @login_required
@@ -270,9 +293,15 @@ def api_toggle_post_like(post_id):
 @bp.route('/categories')
 def api_categories():
     """获取分类列表"""
-    categories = Category.query.filter_by(is_active=True).order_by(Category.sort_order, Category.name).all()
+    query = Category.query.filter_by(is_active=True)
+    etag = api_etags.etag(*_aggregate(query, Category))
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    categories = query.order_by(Category.sort_order, Category.name).all()
     data = [category.to_dict() for category in categories]
-    return api_response(data=data)
+    return api_etags.apply(api_response(data=data), etag)
 
 @bp.route('/categories', methods=['POST'])
 @login_required
@@ -313,9 +342,15 @@ def api_create_category():
 @bp.route('/tags')
 def api_tags():
     """获取标签列表"""
+    # 标签没有 updated_at，修改由内容代标记反映
+    etag = api_etags.etag(*_aggregate(Tag.query, Tag, Tag.created_at))
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     tags = Tag.query.order_by(Tag.name).all()
     data = [tag.to_dict() for tag in tags]
-    return api_response(data=data)
+    return api_etags.apply(api_response(data=data), etag)
 
 # 评论 API
 @bp.route('/comments')
@@ -328,6 +363,11 @@ def api_comments():
     query = Comment.query.filter_by(is_approved=True)
     if post_id:
         query = query.filter_by(post_id=post_id)
+
+    etag = api_etags.etag(*_aggregate(query, Comment))
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
     
     comments = query.order_by(Comment.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
@@ -345,7 +385,7 @@ def api_comments():
         }
     }
     
-    return api_response(data=data)
+    return api_etags.apply(api_response(data=data), etag)
 
 @bp.route('/comments', methods=['POST'])
 def api_create_comment():
@@ -538,8 +578,13 @@ def api_current_user():
 @bp.route('/settings')
 def api_settings():
     """获取公开设置"""
+    etag = api_etags.etag(*_aggregate(Setting.query.filter_by(is_public=True), Setting))
+    not_modified = api_etags.not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     settings = SettingManager.get_public()
-    return api_response(data=settings)
+    return api_etags.apply(api_response(data=settings), etag)
 
 @bp.route('/settings/all')
 @login_required
@@ -568,19 +613,17 @@ def api_search():
         return api_response(message='搜索关键词不能为空', status=400)
     
     if search_type == 'posts':
-        results = Post.query.filter(
-            Post.status=='published',
-            db.or_(
-                Post.title.contains(query),
-                Post.content.contains(query),
-                Post.excerpt.contains(query)
-            )
-        ).order_by(Post.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        results = search_service.search(query, page=page, per_page=per_page)
+        
+        items = []
+        for post in results.items:
+            item = post.to_dict(include_content=False)
+            snippet = results.snippets.get(post.id)
+            item['snippet'] = str(snippet) if snippet else None
+            items.append(item)
         
         data = {
-            'results': [post.to_dict(include_content=False) for post in results.items],
+            'results': items,
             'pagination': {
                 'page': results.page,
                 'per_page': results.per_page,
@@ -595,6 +638,17 @@ def api_search():
     
     return api_response(data=data)
 
+@bp.route('/search/suggest')
+def api_search_suggest():
+    """搜索自动补全（支持拼音全拼与首字母）"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    
+    if not query:
+        return api_response(data={'suggestions': []})
+    
+    return api_response(data={'suggestions': pinyin_index.suggest(query, limit=limit)})
+
 # 统计 API
 @bp.route('/stats')
 @login_required
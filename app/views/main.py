@@ -8,10 +8,32 @@ from app.models.post import Post, Category, Tag, post_tags
 from app.models.comment import Comment
 from app.models.setting import SettingManager
 from app.services.plugin_manager import plugin_manager
+from app.services.search_service import search_service
+from app.services.related_posts import related_posts_service
 from app.services.theme_manager import theme_manager
 
 bp = Blueprint('main', __name__)
 
+def build_base_context(title=None, **extra):
+    """
+    前台页面共用的模板上下文
+    
+    Args:
+        title: 页面标题，页面标题为"标题 - 站点名"；为空时使用站点名
+        **extra: 页面特有的上下文变量
+    
+    plugin_hooks 为当前请求共享的按需求值映射，模板用到的钩子才会执行且只执行一次
+    """
+    site_brand = SettingManager.get('site_title', 'Noteblog')
+    context = {
+        'site_title': site_brand,
+        'page_title': f"{title} - {site_brand}" if title else site_brand,
+        'current_user': current_user,
+        'plugin_hooks': plugin_manager.get_request_template_hooks()
+    }
+    context.update(extra)
+    return context
+
 @bp.route('/')
 def index():
     """首页"""
@@ -31,22 +53,12 @@ def index():
     plugin_manager.do_action('before_index_render', posts=posts)
     
     # 准备模板上下文
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'posts': posts,
-        'categories': categories,
-        'tags': tags,
-        'site_title': site_brand,
-        'page_title': site_brand,
-        'site_description': SettingManager.get('site_description', ''),
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        posts=posts,
+        categories=categories,
+        tags=tags,
+        site_description=SettingManager.get('site_description', '')
+    )
     
     # 应用过滤器
     context = plugin_manager.apply_filters('index_context', context)
@@ -98,22 +110,14 @@ def post_detail(slug):
     plugin_manager.do_action('before_post_render', post=post)
     
     # 准备模板上下文
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'post': post,
-        'comments': comments,
-        'prev_post': prev_post if prev_post and prev_post.slug else None,
-        'next_post': next_post if next_post and next_post.slug else None,
-        'site_title': site_brand,
-        'page_title': f"{post.title} - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        post.title,
+        post=post,
+        comments=comments,
+        prev_post=prev_post if prev_post and prev_post.slug else None,
+        next_post=next_post if next_post and next_post.slug else None,
+        related_posts=related_posts_service.get_related(post.id)
+    )
     
     # 应用过滤器
     context = plugin_manager.apply_filters('post_context', context, post)
@@ -137,20 +141,11 @@ def category(slug):
         page=page, per_page=per_page, error_out=False
     )
     
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'category': category,
-        'posts': posts,
-        'site_title': site_brand,
-        'page_title': f"{category.name} - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        category.name,
+        category=category,
+        posts=posts
+    )
     
     return theme_manager.render_template('category.html', **context)
 
@@ -168,20 +163,11 @@ def tag(slug):
     
     posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
     
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'tag': tag,
-        'posts': posts,
-        'site_title': site_brand,
-        'page_title': f"{tag.name} - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        tag.name,
+        tag=tag,
+        posts=posts
+    )
     
     return theme_manager.render_template('tag.html', **context)
 
@@ -195,39 +181,23 @@ def search():
     posts = None
     results = []
     total = 0
+    snippets = {}
     
     if query:
-        # 简单的搜索实现
-        posts_query = Post.query.filter(
-            Post.status=='published',
-            db.or_(
-                Post.title.contains(query),
-                Post.content.contains(query),
-                Post.excerpt.contains(query)
-            )
-        ).order_by(Post.published_at.desc())
-        
-        posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
+        posts = search_service.search(query, page=page, per_page=per_page)
         results = posts.items
         total = posts.total
+        snippets = posts.snippets
     
-    site_brand = SettingManager.get('site_title', 'Noteblog')
     title_prefix = f"搜索: {query}" if query else '搜索'
-    context = {
-        'query': query,
-        'posts': posts,
-        'results': results,
-        'total': total,
-        'site_title': site_brand,
-        'page_title': f"{title_prefix} - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        title_prefix,
+        query=query,
+        posts=posts,
+        results=results,
+        total=total,
+        snippets=snippets
+    )
     
     return theme_manager.render_template('search.html', **context)
 
@@ -316,23 +286,14 @@ def archives():
             archives[year] = []
         archives[year].append(post)
     
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'archives': archives,
-        'total_posts': total_posts,
-        'total_categories': total_categories,
-        'total_tags': total_tags,
-        'total_words': total_words,
-        'site_title': site_brand,
-        'page_title': f"归档 - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        '归档',
+        archives=archives,
+        total_posts=total_posts,
+        total_categories=total_categories,
+        total_tags=total_tags,
+        total_words=total_words
+    )
     
     return theme_manager.render_template('archives.html', **context)
 
@@ -341,19 +302,10 @@ def archives():
 def categories_list():
     """分类列表页面"""
     categories = Category.query.filter_by(is_active=True).all()
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'categories': categories,
-        'site_title': site_brand,
-        'page_title': f"分类 - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        '分类',
+        categories=categories
+    )
     return theme_manager.render_template('categories.html', **context)
 
 
@@ -372,19 +324,10 @@ def tags_list():
 
     for tag in tags:
         tag.post_count = tag_counts.get(tag.id, 0)
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'tags': tags,
-        'site_title': site_brand,
-        'page_title': f"标签 - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        '标签',
+        tags=tags
+    )
     return theme_manager.render_template('tags.html', **context)
 
 @bp.route('/page/<slug>')
@@ -395,19 +338,10 @@ def page(slug):
     # 增加浏览量
     page.increment_view()
     
-    site_brand = SettingManager.get('site_title', 'Noteblog')
-    context = {
-        'page': page,
-        'site_title': site_brand,
-        'page_title': f"{page.title} - {site_brand}",
-        'current_user': current_user,
-        'plugin_hooks': {
-            'content_top': plugin_manager.get_template_hooks('content_top'),
-            'sidebar_bottom': plugin_manager.get_template_hooks('sidebar_bottom'),
-            'head_assets': plugin_manager.get_template_hooks('head_assets'),
-            'scripts_assets': plugin_manager.get_template_hooks('scripts_assets')
-        }
-    }
+    context = build_base_context(
+        page.title,
+        page=page
+    )
     
     return theme_manager.render_template('page.html', **context)
 
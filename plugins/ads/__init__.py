@@ -2,7 +2,6 @@
 广告插件
 支持侧边栏广告位和Google AdSense验证
 """
-import os
 from flask import current_app, render_template, Blueprint, request, jsonify
 from app.services.plugin_manager import PluginBase
 from .models import AdSlot
@@ -53,20 +52,15 @@ class AdsPlugin(PluginBase):
         if not slots:
             return ""
 
-        template_path = os.path.join(os.path.dirname(__file__), 'templates', 'sidebar.html')
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-
         context = {
             'ads': {
                 'slots': slots
             }
         }
 
-        html_content = current_app.plugin_manager.render_plugin_template(
-            self.name, template_content, context
+        html_content = current_app.plugin_manager.render_plugin_file(
+            self.name, 'sidebar.html', context
         )
-        self._register_assets()
         return html_content
 
     def render_adsense_script(self):
@@ -82,29 +76,24 @@ class AdsPlugin(PluginBase):
             f'?client={client_id}" crossorigin="anonymous"></script>'
         )
 
-    def _register_assets(self):
-        if hasattr(current_app, 'plugin_manager'):
-            current_app.plugin_manager.register_template_hook(
-                'head_assets',
-                lambda: '<link rel="stylesheet" href="/static/plugins/ads/css/ads.css">',
-                priority=10,
-                plugin_name=self.name
-            )
-
     def register_hooks(self):
         if hasattr(current_app, 'plugin_manager'):
+            # 广告位只在后台编辑时变化：输出跨请求缓存，配置或 AdSlot 数据变化时自动失效
             current_app.plugin_manager.register_template_hook(
                 'sidebar_bottom',
                 self.render_sidebar_widget,
                 priority=20,
-                plugin_name=self.name
+                plugin_name=self.name,
+                cache={'ttl': 3600, 'models': [AdSlot]}
             )
             current_app.plugin_manager.register_template_hook(
                 'head_assets',
                 self.render_adsense_script,
                 priority=5,
-                plugin_name=self.name
+                plugin_name=self.name,
+                cache={'ttl': 3600}
             )
+            self.register_css('/static/plugins/ads/css/ads.css')
 
 
 def create_plugin():
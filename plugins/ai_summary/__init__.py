@@ -69,6 +69,9 @@ class AISummaryPlugin(PluginBase):
                 accepted_args=3,
                 plugin_name=self.name
             )
+            # 摘要加载脚本提取为可缓存的文件，只在文章页引用（没有待生成的摘要时脚本不做任何事）
+            self.register_inline_js('pending-loader', self._pending_loader_script(),
+                                    endpoints=['main.post_detail'])
 
     # -------- 过滤器：注入摘要 --------
     def _inject_summary_to_post_context(self, context: Dict[str, Any], post: Post) -> Dict[str, Any]:
@@ -99,7 +102,6 @@ class AISummaryPlugin(PluginBase):
         has_summary = bool(summary)
         state = 'ready' if has_summary else 'pending'
         body = summary if has_summary else 'AI 摘要生成中，通常几秒内完成…'
-        script = '' if has_summary else self._pending_loader_script()
         return f'''
 <section class="ai-summary" data-ai-summary data-post-id="{post_id}" data-state="{state}" style="margin-top:1.5rem;padding:1rem;border:1px solid var(--plugin-border,#e5e7eb);border-radius:var(--plugin-radius,0.5rem);background:var(--plugin-bg-soft,#fafafa)">
     <div style="font-weight:600;margin-bottom:0.5rem;display:flex;align-items:center;gap:.4rem;color:var(--plugin-text,#374151)">
@@ -108,12 +110,11 @@ class AISummaryPlugin(PluginBase):
     <div data-ai-summary-body style="white-space:pre-wrap;line-height:1.7;color:var(--plugin-text,#374151)">{body}</div>
     <div style="margin-top:.5rem;color:var(--plugin-text-muted,#9ca3af);font-size:.85em">首访生成，后台可强制重算</div>
 </section>
-{script}
 '''
 
     def _pending_loader_script(self) -> str:
+        """待生成摘要的加载脚本（页面中 data-state="pending" 的摘要块由它请求接口填充）"""
         return '''
-<script>
 (function() {
     function fetchSummary(block) {
         if (!block || block.dataset.loading === '1') {
@@ -173,7 +174,6 @@ class AISummaryPlugin(PluginBase):
         initAISummaryBlocks();
     }
 })();
-</script>
 '''
 
     def _inject_admin_editor_hooks(self, hooks: Dict[str, Any], mode: str = 'create', post: Optional[Post] = None):
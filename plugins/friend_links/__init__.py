@@ -2,9 +2,9 @@
 友链插件
 在侧边栏显示友链
 """
-import os
 from flask import current_app, render_template, Blueprint, request, jsonify
 from app.services.plugin_manager import PluginBase
+from app.services.static_assets import static_assets
 from .models import FriendLink
 
 
@@ -99,11 +99,6 @@ class FriendLinksPlugin(PluginBase):
         if not config.get('show_in_sidebar', True):
             return ""
         
-        # 渲染友链模板
-        template_path = os.path.join(os.path.dirname(__file__), 'templates', 'sidebar.html')
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
         context = {
             'friend_links': {
                 'title': config.get('title', '友情链接'),
@@ -113,40 +108,18 @@ class FriendLinksPlugin(PluginBase):
             }
         }
         
-        # 使用插件管理器的模板渲染方法，提供Flask上下文
-        html_content = current_app.plugin_manager.render_plugin_template(
-            self.name, template_content, context
+        # 使用插件管理器的模板渲染方法（模板编译后缓存），提供Flask上下文
+        html_content = current_app.plugin_manager.render_plugin_file(
+            self.name, 'sidebar.html', context
         )
         
-        # 注册 JavaScript 和 CSS 加载钩子
-        self._register_assets()
-        
         return html_content
     
-    def _register_assets(self):
-        """注册资源文件（CSS 和 JavaScript）"""
-        # 注册 CSS 到 head 钩子
-        if hasattr(current_app, 'plugin_manager'):
-            current_app.plugin_manager.register_template_hook(
-                'head_assets',
-                lambda: f'<link rel="stylesheet" href="/static/plugins/friend_links/css/friend_links.css">',
-                priority=10,
-                plugin_name=self.name
-            )
-            
-            # 注册 JavaScript 到 scripts 钩子
-            current_app.plugin_manager.register_template_hook(
-                'scripts_assets',
-                self._get_script_content,
-                priority=10,
-                plugin_name=self.name
-            )
-    
     def _get_script_content(self):
-        """获取 JavaScript 内容"""
+        """获取 JavaScript 内容（作为内联片段注册，提取为可缓存的文件）"""
         # 等待 Vue 应用初始化完成后再加载友情链接功能
+        script_url = static_assets.url('/static/plugins/friend_links/js/friend_links.js')
         return '''
-<script>
 // 等待Vue应用初始化完成后再加载友情链接功能
 (function() {
     // 检查Vue应用是否已经挂载
@@ -169,7 +142,7 @@ class FriendLinksPlugin(PluginBase):
         
         const script = document.createElement('script');
         script.id = 'friend-links-script';
-        script.src = '/static/plugins/friend_links/js/friend_links.js';
+        script.src = '%s';
         script.onload = function() {
             // 脚本加载完成后初始化友情链接功能
             if (window.FriendLinks && typeof window.FriendLinks.init === 'function') {
@@ -189,19 +162,26 @@ class FriendLinksPlugin(PluginBase):
         waitForVueApp();
     }
 })();
-</script>
-        '''
+''' % script_url
     
     def register_hooks(self):
         """注册插件钩子"""
         # 注册侧边栏底部钩子
         if hasattr(current_app, 'plugin_manager'):
+            # 友链只在后台编辑时变化：输出跨请求缓存，配置或 FriendLink 数据变化时自动失效
             current_app.plugin_manager.register_template_hook(
                 'sidebar_bottom', 
                 self.render_sidebar_widget, 
                 priority=10, 
-                plugin_name=self.name
+                plugin_name=self.name,
+                cache={'ttl': 3600, 'models': [FriendLink]}
             )
+            
+            # 注册 CSS
+            self.register_css('/static/plugins/friend_links/css/friend_links.css')
+            
+            # 注册 JavaScript（页面以 <script defer> 引用，不再逐页内联）
+            self.register_inline_js('loader', self._get_script_content())
 
 
 # 插件入口点
@@ -42,7 +42,8 @@ class WeatherShowcasePlugin(PluginBase):
         if not hasattr(current_app, 'plugin_manager'):
             return
         pm = current_app.plugin_manager
-        pm.register_template_hook('head_assets', self._render_head_assets, priority=12, plugin_name=self.name)
+        self.register_css('/static/plugins/weather_showcase/css/weather_showcase.css', priority=12,
+                          when=lambda: self._safe_config()['enabled'])
         pm.register_template_hook('content_top', self._render_stage, priority=12, plugin_name=self.name)
         # 注册到 scripts_assets 和 body_end 以兼容所有主题
         pm.register_template_hook('scripts_assets', self._render_scripts, priority=12, plugin_name=self.name)
@@ -72,12 +73,6 @@ class WeatherShowcasePlugin(PluginBase):
         cfg['accent_color'] = (cfg.get('accent_color') or '#7dd3fc').strip()
         return cfg
 
-    def _render_head_assets(self) -> str:
-        cfg = self._safe_config()
-        if not cfg['enabled']:
-            return ''
-        return '<link rel="stylesheet" href="/static/plugins/weather_showcase/css/weather_showcase.css">'
-
     def _should_render_on_request(self, cfg: Dict[str, Any]) -> bool:
         try:
             path = request.path or ''
@@ -14,7 +14,8 @@ from app.models.setting import Setting
 
 # 如果命令是 init 或 full-init，则在创建 app 前临时设置环境变量以跳过插件/主题加载，
 # 避免在首次创建数据库表时访问尚不存在的插件/主题表导致错误。
-_INIT_COMMANDS = {'init', 'full-init'}
+# build-assets 只处理文件，不需要数据库，同样跳过（可在构建镜像时运行）。
+_INIT_COMMANDS = {'init', 'full-init', 'build-assets'}
 if len(sys.argv) > 1 and sys.argv[1] in _INIT_COMMANDS:
     os.environ.setdefault('SKIP_PLUGIN_INIT', '1')
 
@@ -202,6 +203,36 @@ def test():
         click.echo(result.stderr)
 
 
+@cli.command()
+def reindex():
+    """重建全文搜索索引和相关文章"""
+    from app.services.search_service import search_service
+    from app.services.related_posts import related_posts_service
+    with app.app_context():
+        count = search_service.reindex()
+        click.echo(f'✓ 搜索索引重建完成（后端: {search_service.backend.name}，文章数: {count}）')
+        count = related_posts_service.rebuild()
+        click.echo(f'✓ 相关文章重算完成（文章数: {count}）')
+
+
+def _build_static_assets(output=None, clean=False):
+    from app.services.static_assets import static_assets
+    with app.app_context():
+        stats = static_assets.build(output, clean=clean)
+    click.echo(
+        f"✓ 静态资源构建完成：{stats['files']} 个文件（新写入 {stats['written']} 个），"
+        f"gzip {stats['gzip']} 个，brotli {stats['brotli']} 个，清单 {stats['manifest']}"
+    )
+
+
+@cli.command('build-assets')
+@click.option('--output', default=None, help='输出目录（默认 STATIC_BUILD_DIR 或 <项目根目录>/static_build）')
+@click.option('--clean', is_flag=True, help='先清空输出目录（不保留旧版本文件）')
+def build_assets(output, clean):
+    """为主题和插件静态文件生成带内容哈希的副本、预压缩版本和清单"""
+    _build_static_assets(output, clean)
+
+
 @cli.command()
 def deploy():
     """部署应用"""
@@ -212,8 +243,8 @@ def deploy():
         upgrade()
         click.echo('✓ 数据库迁移完成')
     
-    # 收集静态文件（如果需要）
-    click.echo('✓ 静态文件收集完成')
+    # 生成指纹化的静态资源
+    _build_static_assets()
     
     click.echo('🚀 Noteblog部署完成！')
 
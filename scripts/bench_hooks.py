@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+钩子分发微基准：对比旧的"每次调用时按类型过滤、逐个截断参数"实现
+与预编译分发表实现的 do_action / apply_filters / get_template_hooks 耗时
+
+用法: python scripts/bench_hooks.py [插件数] [每个插件的钩子数]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.plugin_manager import PluginManager
+
+
+def legacy_do_action(hooks, hook_name, *args, **kwargs):
+    """旧实现（同一名称下的所有钩子都会执行，参数逐个截断）"""
+    if hook_name in hooks:
+        for hook_info in hooks[hook_name]:
+            callback = hook_info['callback']
+            accepted_args = hook_info['accepted_args']
+            if len(args) > accepted_args:
+                args = args[:accepted_args]
+            callback(*args, **kwargs)
+
+
+def legacy_apply_filters(hooks, filter_name, value, *args, **kwargs):
+    """旧实现（每次调用时按类型过滤）"""
+    if filter_name in hooks:
+        for hook_info in hooks[filter_name]:
+            if hook_info.get('type') == 'filter':
+                accepted_args = hook_info['accepted_args']
+                filter_args = [value] + list(args[:accepted_args - 1])
+                value = hook_info['callback'](*filter_args, **kwargs)
+    return value
+
+
+def legacy_get_template_hooks(hooks, hook_name):
+    results = []
+    if hook_name in hooks:
+        for hook_info in hooks[hook_name]:
+            if hook_info.get('type') == 'template':
+                result = hook_info['callback']()
+                if result:
+                    results.append(result)
+    return results
+
+
+def build_manager(plugin_count, hooks_per_plugin):
+    manager = PluginManager()
+
+    def action(post=None, **kwargs):
+        return None
+
+    def content_filter(value, post=None):
+        return value
+
+    def widget():
+        return '<div></div>'
+
+    # 与真实插件一样带上插件名（插件钩子受熔断保护）
+    for index in range(plugin_count):
+        plugin_name = f'plugin{index}'
+        for hook_index in range(hooks_per_plugin):
+            priority = (index * 7 + hook_index) % 20
+            manager.register_hook('after_request', action, priority, 1, plugin_name=plugin_name)
+            manager.register_filter('post_content', content_filter, priority, 2, plugin_name=plugin_name)
+            manager.register_template_hook('sidebar_bottom', widget, priority, plugin_name=plugin_name)
+    return manager
+
+
+def main():
+    plugin_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    hooks_per_plugin = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    number = 20000
+
+    manager = build_manager(plugin_count, hooks_per_plugin)
+    hooks = manager.hooks
+    print(f"插件数: {plugin_count}，每插件钩子数: {hooks_per_plugin}，每项调用 {number} 次")
+
+    cases = [
+        ('do_action', lambda: legacy_do_action(hooks, 'after_request', 'response'),
+         lambda: manager.do_action('after_request', 'response')),
+        ('apply_filters', lambda: legacy_apply_filters(hooks, 'post_content', 'html', 'post'),
+         lambda: manager.apply_filters('post_content', 'html', 'post')),
+        ('get_template_hooks', lambda: legacy_get_template_hooks(hooks, 'sidebar_bottom'),
+         lambda: manager.get_template_hooks('sidebar_bottom')),
+        ('do_action(无钩子)', lambda: legacy_do_action(hooks, 'missing'),
+         lambda: manager.do_action('missing')),
+    ]
+    for name, legacy, compiled in cases:
+        legacy_time = min(timeit.repeat(legacy, number=number, repeat=5)) / number * 1e6
+        compiled_time = min(timeit.repeat(compiled, number=number, repeat=5)) / number * 1e6
+        print(f"{name:<22} 旧实现 {legacy_time:8.2f} µs   分发表 {compiled_time:8.2f} µs   "
+              f"({legacy_time / compiled_time:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
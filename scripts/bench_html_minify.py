@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+主题页面 HTML 压缩基准：在临时数据库中生成示例文章，依次用各个自带主题渲染首页和归档页，
+对比压缩前后的大小（含 gzip 后）以及压缩耗时、缓存命中时的耗时
+
+用法: python scripts/bench_html_minify.py [文章数]
+"""
+import gzip
+import logging
+import os
+import sys
+import tempfile
+import timeit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+PAGES = ('/', '/archives')
+
+
+def setup_database(workdir, post_count):
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['FLASK_INSTANCE_PATH'] = os.path.join(workdir, 'instance')
+    os.environ['PROJECT_ROOT'] = PROJECT_ROOT
+    os.environ['HTML_MINIFY'] = 'false'
+    os.environ['SKIP_PLUGIN_INIT'] = '1'
+
+    from datetime import datetime, timedelta, timezone
+    from app import create_app, db
+    from app.models.post import Post
+    from app.models.setting import SettingManager
+    from app.models.user import User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        SettingManager.init_default_settings()
+        user = User('bench', 'bench@example.com', 'bench-password', is_admin=True, is_active=True)
+        db.session.add(user)
+        db.session.commit()
+        now = datetime.now(timezone.utc)
+        for index in range(post_count):
+            db.session.add(Post(
+                title=f'示例文章 {index}', slug=f'bench-{index}', author_id=user.id, status='published',
+                content=f'# 示例文章 {index}\n\n正文段落。\n\n```python\nprint({index})\n```\n',
+                published_at=now - timedelta(days=index)
+            ))
+        db.session.commit()
+    os.environ['SKIP_PLUGIN_INIT'] = '0'
+
+
+def render_pages(theme_name):
+    from app import create_app
+    from app.models.setting import SettingManager
+
+    app = create_app()
+    with app.app_context():
+        SettingManager.set('active_theme', theme_name)
+    app = create_app()
+    client = app.test_client()
+    return {path: client.get(path).get_data(as_text=True) for path in PAGES}
+
+
+def main():
+    post_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    logging.disable(logging.WARNING)
+
+    from app.services.html_minifier import HtmlMinifier, minify_html
+
+    with tempfile.TemporaryDirectory() as workdir:
+        setup_database(workdir, post_count)
+        themes = sorted(name for name in os.listdir(os.path.join(PROJECT_ROOT, 'themes'))
+                        if os.path.isfile(os.path.join(PROJECT_ROOT, 'themes', name, 'theme.json')))
+        print(f"文章数: {post_count}")
+        print(f"{'主题':<14}{'页面':<11}{'原始':>9}{'压缩后':>9}{'减少':>8}"
+              f"{'gzip原始':>10}{'gzip压缩后':>11}{'压缩耗时':>11}{'缓存命中':>10}")
+        total_in = total_out = 0
+        for theme_name in themes:
+            for path, html in render_pages(theme_name).items():
+                minified = minify_html(html)
+                number = 20
+                cost = min(timeit.repeat(lambda: minify_html(html), number=number, repeat=3)) / number * 1000
+                minifier = HtmlMinifier()
+                minifier.enabled = True
+                minifier.minify(html)
+                hit = min(timeit.repeat(lambda: minifier.minify(html), number=200, repeat=3)) / 200 * 1000
+                raw, small = len(html.encode('utf-8')), len(minified.encode('utf-8'))
+                total_in += raw
+                total_out += small
+                print(f"{theme_name:<14}{path:<11}{raw:>9}{small:>9}{(1 - small / raw) * 100:>7.1f}%"
+                      f"{len(gzip.compress(html.encode('utf-8'))):>10}"
+                      f"{len(gzip.compress(minified.encode('utf-8'))):>11}"
+                      f"{cost:>9.2f}ms{hit:>8.3f}ms")
+        print(f"合计 {total_in} -> {total_out} 字节（减少 {(1 - total_out / total_in) * 100:.1f}%）")
+
+
+if __name__ == '__main__':
+    main()